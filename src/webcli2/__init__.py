@@ -1 +1,14 @@
-from .action_handlers.action_handler import ActionHandler 
\ No newline at end of file
+from __future__ import annotations  # Enables forward declaration
+
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .action_handlers.action_handler import ActionHandler
+
+# Importing ActionHandler pulls in the data layer (sqlalchemy), we only do it when
+# someone asks for it, so "import webcli2.config" (e.g. by the CLI) stays cheap.
+def __getattr__(name:str) -> Any:
+    if name == "ActionHandler":
+        from .action_handlers.action_handler import ActionHandler
+        return ActionHandler
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,6 +1,6 @@
 from __future__ import annotations  # Enables forward declaration
 
-from typing import Any, Optional
+from typing import Any, Optional, Tuple
 from abc import ABC, abstractmethod
 from webcli2.core.data import User
 
@@ -8,11 +8,25 @@ class ActionHandler(ABC):
     require_shutdown: Optional[bool] = None
     service:Any = None
 
+    # value of request's "type" field this handler handles, service only asks this handler
+    # for requests of these types. Empty means service asks this handler for any request.
+    request_types: Tuple[str, ...] = ()
+
+    # value of request's "type" field whose handling depends on state kept in the process,
+    # e.g. %python% keeps an interpreter per user. When web server runs multiple workers,
+    # such requests of a user are always handled by the same worker.
+    sticky_request_types: Tuple[str, ...] = ()
+
     # can you handle this request?
     @abstractmethod
     def can_handle(self, request:Any) -> bool:
         pass # pragma: no cover
 
+    # If you can handle this request, returns the parsed request which will be passed to handle,
+    # otherwise returns None. Override it if you parse the request, so it only get parsed once.
+    def accept_request(self, request:Any) -> Optional[Any]:
+        return request if self.can_handle(request) else None
+
     def startup(self, service:Any):
         # service is actually a webcli.core.service.WebCLIService
         assert self.require_shutdown is None
@@ -31,6 +45,7 @@ class ActionHandler(ABC):
 
     @abstractmethod
     def handle(self, action_id:int, request:Any, user:User, action_handler_user_config:dict) -> bool:
+        # request is what accept_request returned
         ###################################################################################################
         # If return is True, it means the aciton is completed
         # If the return is False, it means the action is still pending, the action handler may queue
@@ -0,0 +1,128 @@
+from __future__ import annotations  # Enables forward declaration
+
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import Any, Optional, List
+import importlib
+import threading
+import time
+
+from webcli2.core.data import User
+from .action_handler import ActionHandler
+
+#############################################################################
+# Stand-in for an action handler which is imported, created and started
+# only when it is used the first time.
+# ---------------------------------------------------------------------------
+# Some action handlers import heavy packages (e.g. oci, openai) or talk to
+# remote services when created, we do not want to pay it when server starts
+# if nobody is using them.
+# request_types must be provided if you want the service to route requests
+# to it without loading it, so must sticky_request_types if the real action
+# handler has any, the service reads them before the handler is loaded.
+#############################################################################
+class UnparsedRequest:
+    """A request accepted by a LazyActionHandler before the real action handler is loaded.
+
+    The real action handler parses it in LazyActionHandler.handle.
+    """
+    request: Any
+
+    def __init__(self, request:Any):
+        self.request = request
+
+class LazyActionHandler(ActionHandler):
+    module_name: str
+    class_name: str
+    config: dict
+    lock: threading.Lock
+    action_handler: Optional[ActionHandler]     # the real action handler, once loaded
+
+    def __init__(
+        self,
+        *,
+        module_name:str,
+        class_name:str,
+        config:dict,
+        request_types:List[str],
+        sticky_request_types:List[str]=[]
+    ):
+        self.module_name = module_name
+        self.class_name = class_name
+        self.config = config
+        self.request_types = tuple(request_types)
+        self.sticky_request_types = tuple(sticky_request_types)
+        self.lock = threading.Lock()
+        self.action_handler = None
+
+    def __repr__(self):
+        return f"LazyActionHandler(module={self.module_name}, class={self.class_name}, loaded={self.action_handler is not None})"
+
+    def is_loaded(self) -> bool:
+        return self.action_handler is not None
+
+    def load(self) -> ActionHandler:
+        """Import, create and start the real action handler if not done yet.
+        """
+        log_prefix = "LazyActionHandler.load"
+        with self.lock:
+            if self.action_handler is not None:
+                return self.action_handler
+
+            start_time = time.time()
+            module = importlib.import_module(self.module_name)
+            klass = getattr(module, self.class_name)
+            action_handler = klass(**self.config)
+            if self.service is not None:
+                action_handler.startup(self.service)
+            self.action_handler = action_handler
+            logger.info(f"{log_prefix}: loaded action handler, module={self.module_name}, class={self.class_name}, duration={time.time() - start_time:.3f}s")
+            return action_handler
+
+    def startup(self, service:Any):
+        # remember the service so we can start the real action handler once loaded
+        super().startup(service)
+
+    def shutdown(self):
+        with self.lock:
+            if self.action_handler is not None:
+                self.action_handler.shutdown()
+
+    def can_handle(self, request:Any) -> bool:
+        return self.load().can_handle(request)
+
+    def accept_request(self, request:Any) -> Optional[Any]:
+        if self.action_handler is None and len(self.request_types) > 0:
+            # The service already routed the request to us by its type, we do not load the
+            # real action handler here since we are called in the web server's event loop,
+            # it is loaded in handle (in thread pool) and the raw request is parsed there.
+            return UnparsedRequest(request)
+        return self.load().accept_request(request)
+
+    def handle(self, action_id:int, request:Any, user:User, action_handler_user_config:dict) -> bool:
+        log_prefix = "LazyActionHandler.handle"
+        try:
+            action_handler = self.load()
+        except Exception:
+            logger.exception(f"{log_prefix}: failed to load action handler, module={self.module_name}, class={self.class_name}")
+            self._fail_action(action_id, user, f"Action handler {self.class_name} failed to load, please contact administrator")
+            return True
+
+        if isinstance(request, UnparsedRequest):
+            request = action_handler.accept_request(request.request)
+            if request is None:
+                # invalid request of a type it handles, e.g. spark-cli command without %pyspark%
+                self._fail_action(action_id, user, f"Action handler {self.class_name} cannot handle this request")
+                return True
+        return action_handler.handle(action_id, request, user, action_handler_user_config)
+
+    def _fail_action(self, action_id:int, user:User, message:str):
+        # the action is completed by the service since handle returns True
+        self.service.append_response_to_action(action_id, mime="text/plain", text_content=message, user=user)
+
+    def __getattr__(self, name:str) -> Any:
+        # other methods of the real action handler, e.g. called by other action handlers
+        if name in ("module_name", "class_name", "config", "lock", "action_handler"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
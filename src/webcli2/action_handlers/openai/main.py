@@ -10,8 +10,6 @@ from webcli2.config import WebCLIApplicationConfig, load_config
 from webcli2 import ActionHandler
 from webcli2.core.data import User
 
-from openai import OpenAI
-
 
 class OpenAIRequest(BaseModel):
     type: Literal["openai"]
@@ -20,6 +18,7 @@ class OpenAIRequest(BaseModel):
 
 class OpenAIActionHandler(ActionHandler):
     config: WebCLIApplicationConfig
+    request_types = ("openai", )
 
     def __init__(self):
         self.config = load_config()
@@ -40,11 +39,14 @@ class OpenAIActionHandler(ActionHandler):
         logger.debug(f"OpenAIActionHandler.can_handler: {'Yes' if r else 'No'}")
         return r
 
+    def accept_request(self, request:Any) -> Optional[OpenAIRequest]:
+        return self.parse_request(request)
+
     def handle(self, action_id:int, request:Any, user:User, action_handler_user_config:dict) -> bool:
         # TODO: in case of exception, absorb the error and surface the error in openai_response
         log_prefix = "OpenAIActionHandler.handle"
 
-        parsed_request = self.parse_request(request)
+        parsed_request = request if isinstance(request, OpenAIRequest) else self.parse_request(request)
         if parsed_request is None:
             # This should never happen, since we will only call handle if we are able to parse the request
             logger.error(f"{log_prefix}: Unable to parse request, this should not happen, please investigate, request={request}, action_id={action_id}")
@@ -69,6 +71,7 @@ OpenAI api_key must be provide, you can run
             logger.warning(f"OpenAIActionHandler.handle: unable to handle, client does not have OpenAI api_key, request={request}, action_id={action_id}")
             return True
         
+        from openai import OpenAI # it takes a while to import, only do it when needed
         client = OpenAI(api_key=api_key)
 
         completion = client.chat.completions.create(
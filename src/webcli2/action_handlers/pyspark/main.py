@@ -88,6 +88,8 @@ class SparkResponse(BaseModel):
     cli_package: CLIPackage
 
 class PySparkActionHandler(ActionHandler):
+    request_types = ("spark-cli", )
+
     oakcf: OciApiKeyClientFactory       # this factory can create many different type of oci clients
     stream_id: str                      # The OSS stream (actually a kafka topic)'s ocid
     kafka_consumer_group_name:str       # when polling message from kafka, this is the consumer group name
@@ -235,6 +237,9 @@ class PySparkActionHandler(ActionHandler):
         log_api_exit(logger, log_prefix)
         return r
 
+    def accept_request(self, request:Any) -> Optional[PySparkRequest]:
+        return self.parse_request(request, 0)
+
     def send_cli_package(self, cli_package:CLIPackage):
         #####################################################
         # send a CLIPackage to kafka so a spark driver can pick it up
@@ -261,7 +266,7 @@ class PySparkActionHandler(ActionHandler):
         log_api_enter(logger, log_prefix)
         # TODO: if we are not able to send message, we should complete the action, set error code
         try:
-            spark_request = self.parse_request(request, action_id)
+            spark_request = request if isinstance(request, PySparkRequest) else self.parse_request(request, action_id)
             assert spark_request is not None # since handle only called if can_handle returns True, so we MUST have a cli_package
             server_id = action_handler_user_config.get("server_id", "")
             cli_package = spark_request.get_cli_package(action_id, server_id)
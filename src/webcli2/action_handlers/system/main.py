@@ -19,6 +19,7 @@ from pydantic import BaseModel, ValidationError
 from webcli2 import ActionHandler
 from pydantic import ValidationError
 from webcli2.core.data import User
+from .render import ChunkRenderer, MIME_MARKDOWN, MIME_MERMAID
 
 class PythonTheradContext:
     user:User
@@ -94,6 +95,13 @@ class SystemActionHandlerRequest(BaseModel):
     args: str # string behind the verb(aka type)
 
 class SystemActionHandler(ActionHandler):
+    request_types = ("config", "mermaid", "html", "markdown", "python")
+    sticky_request_types = ("python", )     # python interpreter is per user, per process
+    chunk_renderer: Optional[ChunkRenderer] # set if markdown and mermaid are rendered on server side
+
+    def __init__(self, *, server_render:bool=False):
+        self.chunk_renderer = ChunkRenderer() if server_render else None
+
     def parse_request(self, request:Any) -> Optional[SystemActionHandlerRequest]:
         try:
             parsed_request = SystemActionHandlerRequest.model_validate(request)
@@ -119,6 +127,9 @@ class SystemActionHandler(ActionHandler):
         logger.debug(f"SystemActionHandler.can_handler: {'Yes' if r else 'No'}")
         return r
 
+    def accept_request(self, request:Any) -> Optional[SystemActionHandlerRequest]:
+        return self.parse_request(request)
+
     # The request is a dict, type field is already spark-cli
     # the "command" field is text
     # if frist line is %bash%, then rest is bash code
@@ -126,7 +137,7 @@ class SystemActionHandler(ActionHandler):
     def handle(self, action_id:int, request:Any, user:User, action_handler_user_config:dict) -> bool:
         log_prefix = "SystemActionHandler.handle"
 
-        parsed_request = self.parse_request(request)
+        parsed_request = request if isinstance(request, SystemActionHandlerRequest) else self.parse_request(request)
         if parsed_request is None:
             # This should never happen, since we will only call handle if we are able to parse the request
             logger.error(f"{log_prefix}: Unable to parse request, this should not happen, please investigate, request={request}, action_id={action_id}")
@@ -158,11 +169,17 @@ class SystemActionHandler(ActionHandler):
         logger.info(f"SystemActionHandler.handle_html: handled successfully, action_id={action_id}, user_id={user.id}")
         return True
 
+    def _render(self, mime:str, text_content:str) -> Optional[str]:
+        if self.chunk_renderer is None:
+            return None
+        return self.chunk_renderer.render(mime, text_content)
+
     def handle_markdown(self, action_id:int, parsed_request:SystemActionHandlerRequest, user:User, action_handler_user_config:dict) -> bool:
         self.service.append_response_to_action(
             action_id,
-            mime = "text/markdown",
+            mime = MIME_MARKDOWN,
             text_content = parsed_request.command_text,
+            rendered_content = self._render(MIME_MARKDOWN, parsed_request.command_text),
             user = user
         )
         logger.info(f"SystemActionHandler.handle_markdown: handled successfully, action_id={action_id}, user_id={user.id}")
@@ -171,8 +188,9 @@ class SystemActionHandler(ActionHandler):
     def handle_mermaid(self, action_id:int, parsed_request:SystemActionHandlerRequest, user:User, action_handler_user_config:dict) -> bool:
         self.service.append_response_to_action(
             action_id,
-            mime = "application/x-webcli-mermaid",
+            mime = MIME_MERMAID,
             text_content = parsed_request.command_text,
+            rendered_content = self._render(MIME_MERMAID, parsed_request.command_text),
             user = user
         )
         logger.info(f"SystemActionHandler.handle_mermaid: handled successfully, action_id={action_id}, user_id={user.id}")
@@ -0,0 +1,289 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import List, Optional, Tuple
+from collections import OrderedDict
+from html import escape
+from html.parser import HTMLParser
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+
+try:
+    from markdown_it import MarkdownIt  # optional, only needed for rendering markdown on server side
+except ImportError: # pragma: no cover
+    MarkdownIt = None
+
+MIME_MARKDOWN = "text/markdown"
+MIME_MERMAID = "application/x-webcli-mermaid"
+MERMAID_RENDER_TIMEOUT = 30     # in seconds
+
+def render_markdown(text:str) -> Optional[str]:
+    """Render markdown to HTML, returns None if markdown-it-py is not installed.
+    """
+    if MarkdownIt is None:
+        return None
+    # html=False: raw HTML in markdown is escaped, and links like javascript:xxx are not generated
+    return MarkdownIt("commonmark", {"html": False}).render(text)
+
+#############################################################################
+# SVG sanitizer
+# ---------------------------------------------------------------------------
+# Rendered mermaid SVG is put into the page as is (dangerouslySetInnerHTML),
+# so only allowlisted elements and attributes are kept: no script, no event
+# handler attributes (onload, onclick, ...), links only to safe URLs. Labels
+# are HTML inside <foreignObject>, a few HTML elements are allowed there.
+# An element that is not allowed is dropped with everything inside it.
+#
+# CSS comes from the user too (e.g. themeCSS in a mermaid %%{init}%%
+# directive). Mermaid scopes its CSS rules to the id of the diagram's <svg>,
+# we only keep rules like that, so the CSS cannot restyle the rest of the
+# page, and no value may load anything from outside the SVG (url(...) other
+# than url(#id), @import, etc.), in <style>, style or other attributes.
+#
+# The browser parses the result as HTML, which lowercases names the same way
+# HTMLParser does and fixes up the case of SVG names (e.g. viewBox).
+#############################################################################
+SVG_ALLOWED_ELEMENTS = frozenset([
+    "svg", "g", "defs", "style", "title", "desc", "symbol", "use", "marker", "a",
+    "path", "rect", "circle", "ellipse", "line", "polyline", "polygon",
+    "text", "tspan", "textpath", "lineargradient", "radialgradient", "stop", "clippath", "mask", "pattern",
+    "foreignobject",
+    # HTML in labels
+    "div", "span", "p", "br", "b", "i", "em", "strong", "code", "pre", "ul", "ol", "li",
+])
+SVG_ALLOWED_ATTRIBUTES = frozenset([
+    "id", "class", "style", "role", "transform", "xmlns", "xmlns:xlink", "version",
+    "x", "y", "x1", "x2", "y1", "y2", "cx", "cy", "r", "rx", "ry", "dx", "dy", "d", "points",
+    "width", "height", "viewbox", "preserveaspectratio",
+    "fill", "fill-opacity", "fill-rule", "stroke", "stroke-width", "stroke-dasharray", "stroke-linecap",
+    "stroke-linejoin", "stroke-opacity", "stroke-miterlimit", "opacity",
+    "font-family", "font-size", "font-weight", "font-style", "text-anchor", "dominant-baseline", "alignment-baseline",
+    "marker-start", "marker-mid", "marker-end", "markerwidth", "markerheight", "markerunits", "refx", "refy", "orient",
+    "offset", "stop-color", "stop-opacity", "gradientunits", "gradienttransform", "clip-path", "clippathunits", "mask",
+    "patternunits", "href", "xlink:href", "aria-roledescription", "aria-labelledby", "aria-describedby",
+])
+SVG_URL_ATTRIBUTES = frozenset(["href", "xlink:href"])
+SVG_ALLOWED_URL_PREFIXES = ("#", "http://", "https://", "mailto:")
+# attributes with a CSS value, which may have url(...)
+SVG_CSS_ATTRIBUTES = frozenset(["style", "fill", "stroke", "marker-start", "marker-mid", "marker-end", "clip-path", "mask"])
+# HTML elements without end tag
+HTML_VOID_ELEMENTS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr",
+])
+
+# CSS that loads something from outside, or that we cannot check (escapes may hide "url")
+CSS_UNSAFE_RE = re.compile(
+    r"""\\|@import|expression\s*\(|(?:-webkit-)?image(?:-set)?\s*\(|url\s*\(\s*(?!['"]?#)""",
+    re.IGNORECASE
+)
+CSS_KEYFRAMES_RE = re.compile(r"@(?:-webkit-)?keyframes\s+[\w-]+", re.IGNORECASE)
+
+def is_safe_css(css:str) -> bool:
+    return CSS_UNSAFE_RE.search(css) is None
+
+def _split_css_rules(css:str) -> Optional[List[Tuple[str, str]]]:
+    # returns (prelude, body) of top-level rules, None if we cannot parse it the same way a browser does
+    rules = []
+    depth = 0
+    start = 0
+    prelude_end = 0
+    quote = None
+    for i, c in enumerate(css):
+        if quote is not None:
+            if c == "\n":
+                # a bad string in CSS, browser recovers differently
+                return None
+            if c == quote:
+                quote = None
+        elif c in "'\"":
+            quote = c
+        elif c == "{":
+            if depth == 0:
+                prelude_end = i
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth < 0:
+                return None
+            if depth == 0:
+                rules.append((css[start:prelude_end].strip(), css[prelude_end + 1:i]))
+                start = i + 1
+    return rules
+
+def _is_scoped_selector(selector:str, scope:str) -> bool:
+    # it starts with element #scope, and does not go to its siblings (#scope ~ div)
+    m = re.match(rf"#{re.escape(scope)}(?![\w-])[^\s>+~]*\s*([+~])?", selector.strip())
+    return m is not None and m.group(1) is None
+
+def sanitize_css(css:str, scope:Optional[str]) -> str:
+    """Keep only rules of a stylesheet whose selectors are all under element #scope, and @keyframes.
+
+    A rule with unsafe value is dropped, see is_safe_css.
+    """
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    rules = _split_css_rules(css) if scope is not None and "\\" not in css else None
+    if rules is None:
+        return ""
+    output = []
+    for prelude, body in rules:
+        if not is_safe_css(prelude) or not is_safe_css(body):
+            continue
+        if prelude.startswith("@"):
+            # other at-rules (@import, @font-face, @media, ...) are dropped
+            if CSS_KEYFRAMES_RE.fullmatch(prelude) is None:
+                continue
+        elif "{" in body or not all(_is_scoped_selector(selector, scope) for selector in prelude.split(",")):
+            continue
+        output.append(f"{prelude}{{{body}}}")
+    return "".join(output)
+
+class SVGSanitizer(HTMLParser):
+    output: List[str]
+    skip_depth: int                 # > 0 while inside an element that is dropped
+    style_parts: Optional[List[str]]# content of the <style> we are in, None if not in <style>
+    scope: Optional[str]            # id of the outermost <svg>, CSS rules must be under it
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.output = []
+        self.skip_depth = 0
+        self.style_parts = None
+        self.scope = None
+
+    def _get_start_tag(self, tag:str, attrs:List[Tuple[str, Optional[str]]], *, self_closing:bool=False) -> str:
+        parts = [tag]
+        for name, value in attrs:
+            if name not in SVG_ALLOWED_ATTRIBUTES and not name.startswith("data-"):
+                continue
+            if value is None:
+                parts.append(name)
+                continue
+            if name in SVG_URL_ATTRIBUTES and not value.strip().lower().startswith(SVG_ALLOWED_URL_PREFIXES):
+                continue
+            if name in SVG_CSS_ATTRIBUTES and not is_safe_css(value):
+                continue
+            parts.append(f'{name}="{escape(value, quote=True)}"')
+        return "<" + " ".join(parts) + (" />" if self_closing else ">")
+
+    def handle_starttag(self, tag:str, attrs:List[Tuple[str, Optional[str]]]):
+        if self.skip_depth > 0 or tag not in SVG_ALLOWED_ELEMENTS:
+            # a void element has no end tag, it does not have anything inside to drop
+            if tag not in HTML_VOID_ELEMENTS:
+                self.skip_depth += 1
+            return
+        if tag == "svg" and self.scope is None:
+            self.scope = dict(attrs).get("id") or ""
+        if tag == "style":
+            self.style_parts = []
+        self.output.append(self._get_start_tag(tag, attrs))
+
+    def handle_startendtag(self, tag:str, attrs:List[Tuple[str, Optional[str]]]):
+        if self.skip_depth > 0 or tag not in SVG_ALLOWED_ELEMENTS:
+            return
+        self.output.append(self._get_start_tag(tag, attrs, self_closing=True))
+
+    def handle_endtag(self, tag:str):
+        if tag in HTML_VOID_ELEMENTS:
+            # e.g. <img></img> in XHTML, its start tag did not change skip_depth
+            return
+        if self.skip_depth > 0:
+            self.skip_depth -= 1
+            return
+        if tag in SVG_ALLOWED_ELEMENTS:
+            if tag == "style" and self.style_parts is not None:
+                # it cannot contain "</style" since the parser stops there
+                self.output.append(sanitize_css("".join(self.style_parts), self.scope or None))
+                self.style_parts = None
+            self.output.append(f"</{tag}>")
+
+    def handle_data(self, data:str):
+        if self.skip_depth > 0:
+            return
+        if self.style_parts is not None:
+            # content of <style> is CSS, it is sanitized as a whole at its end tag
+            self.style_parts.append(data)
+            return
+        self.output.append(escape(data, quote=False))
+
+    # comments, doctype, <?xml ...?> etc. are dropped
+
+def sanitize_svg(svg:str) -> str:
+    """Keep only allowlisted elements and attributes of SVG, so it is safe to be put into a page.
+    """
+    sanitizer = SVGSanitizer()
+    sanitizer.feed(svg)
+    sanitizer.close()
+    return "".join(sanitizer.output)
+
+def render_mermaid(text:str) -> Optional[str]:
+    """Render mermaid diagram to SVG, returns None if mermaid cli (mmdc) is not installed.
+    """
+    mmdc = shutil.which("mmdc")
+    if mmdc is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        input_filename = os.path.join(tmpdirname, "input.mmd")
+        output_filename = os.path.join(tmpdirname, "output.svg")
+        with open(input_filename, "wt") as f:
+            f.write(text)
+        subprocess.run(
+            [mmdc, "-i", input_filename, "-o", output_filename, "-q"],
+            check=True,
+            capture_output=True,
+            timeout=MERMAID_RENDER_TIMEOUT
+        )
+        with open(output_filename, "rt") as f:
+            svg = f.read()
+    # mermaid escapes labels by default, just in case
+    return sanitize_svg(svg)
+
+#############################################################################
+# Render markdown and mermaid response chunks on server side
+# ---------------------------------------------------------------------------
+# Rendered content is stored with the chunk, so client does not need to
+# render it on every thread load. Result is cached by content hash, so the
+# same content (e.g. a diagram being re-run) is only rendered once.
+# None means the content cannot be rendered on server side, client renders it.
+#
+# It is used by action handler threads concurrently.
+#############################################################################
+class ChunkRenderer:
+    lock: threading.Lock
+    max_size: int
+    cache: "OrderedDict[str, Optional[str]]"   # key is content hash, LRU order
+
+    def __init__(self, max_size:int=1000):
+        self.lock = threading.Lock()
+        self.max_size = max_size
+        self.cache = OrderedDict()
+
+    def render(self, mime:str, text_content:str) -> Optional[str]:
+        key = hashlib.sha256(f"{mime}\0{text_content}".encode("utf-8")).hexdigest()
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+        # we do not hold the lock while rendering, the same content may be rendered
+        # twice if requested at the same time, which is fine
+        rendered_content = self._render(mime, text_content)
+        with self.lock:
+            self.cache[key] = rendered_content
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+        return rendered_content
+
+    def _render(self, mime:str, text_content:str) -> Optional[str]:
+        try:
+            if mime == MIME_MARKDOWN:
+                return render_markdown(text_content)
+            if mime == MIME_MERMAID:
+                return render_mermaid(text_content)
+        except Exception:
+            logger.warning(f"ChunkRenderer._render: failed to render, mime={mime}", exc_info=True)
+        return None
@@ -2,10 +2,11 @@ import logging
 logger = logging.getLogger(__name__)
 
 import argparse
+from datetime import timedelta
 import getpass
+import os
 
 from webcli2.config import WebCLIApplicationConfig
-from webcli2.service_loader import load_webcli_service
 
 def webcli_internal(config:WebCLIApplicationConfig, log_config:dict):
     parser = argparse.ArgumentParser(
@@ -13,7 +14,7 @@ def webcli_internal(config:WebCLIApplicationConfig, log_config:dict):
     )
     parser.add_argument(
         "action", type=str, help="Specify action",
-        choices=['start', 'init-db', 'create-user'],
+        choices=['start', 'init-db', 'migrate', 'create-user', 'archive'],
         nargs=1
     )
     parser.add_argument(
@@ -25,12 +26,17 @@ def webcli_internal(config:WebCLIApplicationConfig, log_config:dict):
     parser.add_argument(
         "--email", type=str, required=False, help="user email"
     )
+    parser.add_argument(
+        "--workers", type=int, required=False, default=1, help="Number of web server worker processes"
+    )
+    parser.add_argument(
+        "--older-than", type=int, required=False, default=90, help="Archive threads that have no activity for this many days"
+    )
     args = parser.parse_args()
     action = args.action[0]
 
     if action == "start":
         import uvicorn
-        from webcli2.web import app
 
         ####################################################################################
         # Although we can load WebCLIService here and set it in app.state.webcli_service
@@ -38,16 +44,73 @@ def webcli_internal(config:WebCLIApplicationConfig, log_config:dict):
         # Since everyone is using the same service loader, the result shuold be the same
         ####################################################################################
         # run application
-        uvicorn.run(app, host=args.host, port=args.port, reload=False, log_config=log_config)
+        # ws_per_message_deflate: browser and server compress websocket frames, large text
+        # chunks (e.g. logs, dataframes) are highly compressible. It is uvicorn's default,
+        # it is spelled out since we rely on it
+        if args.workers <= 1:
+            from webcli2.web import app
+            uvicorn.run(
+                app, 
+                host=args.host, 
+                port=args.port, 
+                reload=False, 
+                log_config=log_config,
+                ws_per_message_deflate=True
+            )
+            return
+
+        ####################################################################################
+        # Multiple workers, each worker process imports webcli2.web and loads its own
+        # WebCLIService, they talk to each other via the worker bus broker we run here,
+        # see webcli2/core/service/worker_bus.py
+        ####################################################################################
+        from webcli2.core.service.worker_bus import WorkerBusBroker, WORKER_BUS_ADDRESS_ENV, WORKER_BUS_AUTHKEY_ENV
+        authkey = os.urandom(32)
+        broker = WorkerBusBroker(worker_count=args.workers, authkey=authkey)
+        broker.start()
+        host, port = broker.address
+        os.environ[WORKER_BUS_ADDRESS_ENV] = f"{host}:{port}"
+        os.environ[WORKER_BUS_AUTHKEY_ENV] = authkey.hex()
+        try:
+            uvicorn.run(
+                "webcli2.web:app", 
+                host=args.host, 
+                port=args.port, 
+                reload=False, 
+                log_config=log_config,
+                ws_per_message_deflate=True,
+                workers=args.workers
+            )
+        finally:
+            broker.close()
         return
     
+    # init-db, migrate, create-user and archive only need the DB, we do not load action handlers
+    # and web server, see tests/test_import_time.py
+    from webcli2.service_loader import load_webcli_service
+
     if action == "init-db":
-        webcli_service = load_webcli_service(config)
+        webcli_service = load_webcli_service(config, load_action_handlers=False)
         webcli_service.create_all_tables()
         return
+
+    if action == "migrate":
+        webcli_service = load_webcli_service(config, load_action_handlers=False)
+        applied_migrations = webcli_service.migrate_db()
+        for name in applied_migrations:
+            print(f"Applied migration: {name}")
+        print(f"Database is up to date, {len(applied_migrations)} migrations applied")
+        return
     
+    if action == "archive":
+        from webcli2.core.data.data_accessor import get_utc_now
+        webcli_service = load_webcli_service(config, load_action_handlers=False)
+        archived_thread_ids = webcli_service.archive_threads(inactive_since=get_utc_now() - timedelta(days=args.older_than))
+        print(f"{len(archived_thread_ids)} threads archived to {config.core.archive_dir}")
+        return
+
     if action == "create-user":
-        webcli_service = load_webcli_service(config)
+        webcli_service = load_webcli_service(config, load_action_handlers=False)
 
         password1 = getpass.getpass("Enter your password: ")
         password2 = getpass.getpass("Enter your password again: ")
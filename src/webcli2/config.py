@@ -1,4 +1,4 @@
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 import os
 from pydantic import BaseModel
@@ -10,6 +10,22 @@ import yaml
 class WebCLIApplicationConfig(BaseModel):
     core: "CoreConfig"
 
+class DBPoolConfig(BaseModel):
+    pool_size: Optional[int] = None         # default is executor_max_workers + 4
+    max_overflow: Optional[int] = None      # default is 10
+    pool_timeout: Optional[float] = None    # in seconds, how long to wait for a connection, default is 30
+    pool_recycle: Optional[int] = None      # in seconds, re-open connections older than this
+    pool_pre_ping: bool = False             # test connection before using it, e.g. database restarts
+
+class SQLiteConfig(BaseModel):
+    # WAL, tuned pragmas and a single writer thread, only for sqlite db_url, see webcli2/core/data/sqlite.py
+    production_mode: bool = False
+    synchronous: str = "NORMAL"
+    cache_size: int = -65536        # negative value is in KiB, so it is 64MB
+    mmap_size: int = 268435456      # 256MB
+    busy_timeout: int = 5000        # in milliseconds
+    write_batch_size: int = 100     # max number of writes committed in one transaction
+
 class CoreConfig(BaseModel):
     home_dir:str = ""           # home directory
     log_config_filename: str = "logcfg.yaml"
@@ -21,6 +37,10 @@ class CoreConfig(BaseModel):
     public_key: str             # for verifying JWT token
     resource_dir:str            
     users_home_dir:str
+    archive_dir: str = "archive"    # archive files of threads, see webcli2/core/data/archive.py
+    executor_max_workers: Optional[int] = None  # threads to run actions, default is min(32, cpu count + 4)
+    db_pool: DBPoolConfig = DBPoolConfig()
+    sqlite: SQLiteConfig = SQLiteConfig()
 
 #################################################
 # resource_dir
@@ -42,6 +62,11 @@ class ActionHandlerInfo(BaseModel):
     module_name: str
     class_name: str
     config: dict = {}
+    lazy: bool = False              # import and create the action handler when it is used the first time
+    request_types: List[str] = []   # for lazy action handler, request types it handles, so we can route
+                                    # requests to it without loading it
+    sticky_request_types: List[str] = []    # for lazy action handler, request types that must be handled by
+                                            # the user's owner worker, see ActionHandler.sticky_request_types
     
 def normalize_filename(base_dir:str, filename:str):
     filename = os.path.expanduser(filename)
@@ -64,6 +89,7 @@ def load_config() ->Optional[WebCLIApplicationConfig]:
 
     config.core.resource_dir = normalize_filename(webcli_home, config.core.resource_dir)
     config.core.users_home_dir = normalize_filename(webcli_home, config.core.users_home_dir)
+    config.core.archive_dir = normalize_filename(webcli_home, config.core.archive_dir)
     config.core.log_dir = normalize_filename(webcli_home, config.core.log_dir)
     config.core.log_config_filename = normalize_filename(webcli_home, config.core.log_config_filename)
     
@@ -1,14 +1,16 @@
 import logging
 logger = logging.getLogger(__name__)
 
-from typing import List, Dict, Any, Optional, TypeVar, Type, Generic, Tuple, Callable
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, TypeVar, Type, Generic, Tuple, Callable
 import enum
 from abc import ABC, abstractmethod
 import json
 from pydantic import BaseModel, Field, ConfigDict
-from openai import OpenAI, ChatCompletion
 from webcli2.action_handlers.system import cli_print
 
+if TYPE_CHECKING:
+    from openai import ChatCompletion
+
 class AgentError(Exception):
     pass
 
@@ -179,7 +181,7 @@ class AgenticMixin:
             raise DuplicateTool(tool.name)
         self.tools[tool.name] = tool
 
-    def ask_llm(self, messages: List[Message], *, model=LLMModel.GPT_4O, temperature=0.0) -> Tuple[ChatCompletion, Dict[str, Any]]:
+    def ask_llm(self, messages: List[Message], *, model=LLMModel.GPT_4O, temperature=0.0) -> Tuple["ChatCompletion", Dict[str, Any]]:
         """Ask LLM, invoke tools
         Retruns:
             A tuple, first element is the LLM response, 2nd element is the tool invocation result
@@ -196,6 +198,7 @@ class AgenticMixin:
         if api_key is None:
             raise MissingOpenAIAPIKey()
         
+        from openai import OpenAI
         openai_client = OpenAI(api_key=api_key)
 
 
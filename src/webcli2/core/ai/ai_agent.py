@@ -4,7 +4,6 @@ logger = logging.getLogger(__name__)
 from typing import Any, Dict, TypeVar, Generic, Type, Callable
 from pydantic import BaseModel
 import json
-from openai import OpenAI
 
 from webcli2.core.data import User
 
@@ -63,6 +62,7 @@ class AIAgent:
             return
         
 
+        from openai import OpenAI
         client = OpenAI(api_key=api_key)
         tools = []
         for _, ti in self.tool_info_dict.items():
@@ -1,7 +1,9 @@
-from .data_accessor import DataAccessor, ObjectNotFound, DuplicateUserEmail, ActionAlreadyInThread
+from .data_accessor import DataAccessor, ObjectNotFound, DuplicateUserEmail, ActionAlreadyInThread, InvalidCursor, \
+    SearchNotSupported, ThreadArchived, ThreadSortKey, THREAD_SORT_KEYS, encode_thread_cursor
 from .models.user import User
-from .models.thread import Thread
-from .models.action import Action
-from .models.thread_action import ThreadAction
+from .models.thread import Thread, ThreadSummary
+from .models.action import Action, ActionSummary
+from .models.thread_action import ThreadAction, ThreadActionSummary, ThreadActionOrder
 from .models.action_response_chunk import ActionResponseChunk
-from .db_models import create_all_tables
+from .models.search_hit import SearchHit
+from .migrations import create_all_tables, migrate
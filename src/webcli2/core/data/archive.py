@@ -0,0 +1,95 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import Any, Dict, List
+import base64
+from datetime import datetime
+import gzip
+import json
+import os
+
+from sqlalchemy import Table, DateTime, LargeBinary
+
+#############################################################################
+# Thread archive
+# ---------------------------------------------------------------------------
+# Archiving a thread moves rows of a thread out of the hot tables into a
+# compressed per-thread archive file:
+#   - all thread actions of the thread
+#   - completed actions that are not in any other thread, and their response
+#     chunks, other actions stay since other threads or action handlers use them
+# DBThread stays, with archived_at set. The archive keeps the row ids, so the
+# rows are put back unchanged when the thread is accessed again (rehydrated),
+# and resource files, links to actions, etc. still work.
+#
+# An archive is a gzipped JSON document:
+#   {"version": 1, "thread_id": ..., "thread_actions": [...], "actions": [...], "response_chunks": [...]}
+# each row is a dict of column name to value, datetime is in ISO format and
+# binary is base64 encoded.
+#############################################################################
+ARCHIVE_FORMAT_VERSION = 1
+
+def dump_row(table:Table, db_object:Any) -> Dict[str, Any]:
+    """Get all columns of a DB object as a dict that can be serialized to JSON.
+    """
+    row = {}
+    for column in table.columns:
+        value = getattr(db_object, column.key)
+        if value is not None:
+            if isinstance(column.type, DateTime):
+                value = value.isoformat()
+            elif isinstance(column.type, LargeBinary):
+                value = base64.b64encode(value).decode("ascii")
+        row[column.name] = value
+    return row
+
+def load_rows(table:Table, rows:List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reverse of dump_row, returns rows that can be inserted to the table.
+    """
+    columns_by_name = {column.name: column for column in table.columns}
+    loaded_rows = []
+    for row in rows:
+        loaded_row = {}
+        for name, value in row.items():
+            column = columns_by_name[name]
+            if value is not None:
+                if isinstance(column.type, DateTime):
+                    value = datetime.fromisoformat(value)
+                elif isinstance(column.type, LargeBinary):
+                    value = base64.b64decode(value)
+            loaded_row[column.key] = value
+        loaded_rows.append(loaded_row)
+    return loaded_rows
+
+def get_thread_archive_filename(archive_dir:str, thread_id:int) -> str:
+    return os.path.join(archive_dir, f"thread-{thread_id}.json.gz")
+
+def write_thread_archive(archive_dir:str, thread_id:int, archive:dict):
+    """Write archive of a thread to its archive file, the file is replaced atomically.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    filename = get_thread_archive_filename(archive_dir, thread_id)
+    tmp_filename = f"{filename}.tmp"
+    with gzip.open(tmp_filename, "wt", encoding="utf-8") as f:
+        json.dump(archive, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_filename, filename)
+
+def read_thread_archive(archive_dir:str, thread_id:int) -> dict:
+    """Read archive of a thread.
+
+    Raises:
+        FileNotFoundError: if the thread has no archive file.
+    """
+    with gzip.open(get_thread_archive_filename(archive_dir, thread_id), "rt", encoding="utf-8") as f:
+        archive = json.load(f)
+    if archive.get("version") != ARCHIVE_FORMAT_VERSION or archive.get("thread_id") != thread_id:
+        raise ValueError(f"Invalid archive for thread {thread_id}")
+    return archive
+
+def remove_thread_archive(archive_dir:str, thread_id:int):
+    try:
+        os.remove(get_thread_archive_filename(archive_dir, thread_id))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,101 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import Optional, Tuple
+import zlib
+
+try:
+    import zstandard  # optional, faster and better ratio than zlib, pip install webcli2[zstd]
+except ImportError: # pragma: no cover
+    zstandard = None
+
+#############################################################################
+# Compressed response chunks
+# ---------------------------------------------------------------------------
+# PySpark replies and %python% output can be megabytes of text. A text chunk
+# larger than COMPRESSION_THRESHOLD is stored compressed in
+# DBActionResponseChunk.compressed_content and text_content is NULL, the
+# compression column tells how it is compressed so rows written with zstd
+# and zlib can live together. The text is decompressed only when a chunk is
+# returned.
+#############################################################################
+COMPRESSION_THRESHOLD = 64 * 1024   # in bytes of UTF-8 encoded text
+COMPRESSION_ZLIB = "zlib"
+COMPRESSION_ZSTD = "zstd"
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+def get_default_compression() -> str:
+    return COMPRESSION_ZLIB if zstandard is None else COMPRESSION_ZSTD
+
+def compress_text(text:str, *, threshold:int=COMPRESSION_THRESHOLD) -> Tuple[Optional[str], Optional[bytes], int]:
+    """Compress text if it is larger than threshold.
+
+    Returns:
+        A tuple of compression, compressed content and size of the text in bytes.
+        compression and compressed content are None if text is not compressed.
+    """
+    data = text.encode("utf-8")
+    if len(data) <= threshold:
+        return None, None, len(data)
+
+    compression = get_default_compression()
+    if compression == COMPRESSION_ZSTD:
+        compressed_content = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    else:
+        compressed_content = zlib.compress(data, ZLIB_LEVEL)
+    if len(compressed_content) >= len(data):
+        # not compressible (e.g. base64 of an image), keep it as is
+        return None, None, len(data)
+    return compression, compressed_content, len(data)
+
+def decompress_text(compression:str, compressed_content:bytes) -> str:
+    """Get the text back from compressed content.
+    """
+    if compression == COMPRESSION_ZLIB:
+        data = zlib.decompress(compressed_content)
+    elif compression == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Chunk is compressed with zstd, please install zstandard")
+        data = zstandard.ZstdDecompressor().decompress(compressed_content)
+    else:
+        raise ValueError(f"Unknown compression: {compression}")
+    return data.decode("utf-8")
+
+#############################################################################
+# Previews of large response chunks
+# ---------------------------------------------------------------------------
+# A chunk can be tens of megabytes (e.g. a printed DataFrame), sending it to
+# the browser in a thread or a websocket event freezes the page. Clients get
+# the first CHUNK_PREVIEW_SIZE bytes of the text instead, with content_size
+# and is_truncated, and fetch the full text by /apis/chunks/{id}/content.
+#############################################################################
+CHUNK_PREVIEW_SIZE = 64 * 1024     # in bytes of UTF-8 encoded text
+
+def truncate_text(text:str, size:int) -> str:
+    """Get the longest prefix of text that is no more than size bytes in UTF-8.
+    """
+    data = text.encode("utf-8")
+    if len(data) <= size:
+        return text
+    # only a character cut in the middle at the end can be invalid
+    return data[:size].decode("utf-8", errors="ignore")
+
+def decompress_text_prefix(compression:str, compressed_content:bytes, size:int) -> str:
+    """Same as truncate_text(decompress_text(...), size), but only decompresses the first size bytes.
+    """
+    if compression == COMPRESSION_ZLIB:
+        data = zlib.decompressobj().decompress(compressed_content, size)
+    elif compression == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Chunk is compressed with zstd, please install zstandard")
+        data = b""
+        with zstandard.ZstdDecompressor().stream_reader(compressed_content) as reader:
+            while len(data) < size:
+                block = reader.read(size - len(data))
+                if not block:
+                    break
+                data += block
+    else:
+        raise ValueError(f"Unknown compression: {compression}")
+    return data[:size].decode("utf-8", errors="ignore")
@@ -1,11 +1,18 @@
-from typing import List, Optional
+from typing import Any, Dict, Generator, List, Optional, Literal, Tuple, Union
+from contextlib import contextmanager
+import base64
+import json
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import select, delete, func, desc
+from sqlalchemy import select, delete, update, insert, func, desc, and_, or_, case, DateTime, Integer, String, Float
 from sqlalchemy.exc import IntegrityError
 from webcli2.core.data.db_models import DBThread, DBThreadAction, DBAction, DBActionResponseChunk, DBUser, \
     DBActionHandlerConfiguration
-from webcli2.core.data.models import User, Thread, ThreadSummary, ThreadAction, Action, ActionResponseChunk
+from webcli2.core.data.models import User, Thread, ThreadSummary, ThreadAction, ThreadActionSummary, \
+    ThreadActionOrder, Action, ActionSummary, ActionResponseChunk, SearchHit
+from webcli2.core.data.search import is_search_supported, get_search_statement, index_response_chunks
+from webcli2.core.data.archive import ARCHIVE_FORMAT_VERSION, dump_row, load_rows
+from webcli2.core.data.compression import compress_text, decompress_text, decompress_text_prefix, truncate_text
 from webcli2.core.types import PatchValue
 
 #############################################################
@@ -53,6 +60,43 @@ class ActionAlreadyInThread(DataError):
     def __str__(self):
         return f"Action({self.action_id}) is already in Thread({self.thread_id}), cannot be added again."
 
+class InvalidCursor(DataError):
+    # The cursor for pagination is malformed, or it is for another sort order
+    cursor: str
+
+    def __init__(
+        self, 
+        *args, 
+        cursor: str,
+        **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.cursor = cursor
+
+    def __str__(self):
+        return f"Invalid cursor({self.cursor})"
+
+class ThreadArchived(DataError):
+    # The thread is archived, it has to be restored before it can be read or changed
+    thread_id: int
+
+    def __init__(
+        self, 
+        *args, 
+        thread_id: int,
+        **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.thread_id = thread_id
+
+    def __str__(self):
+        return f"Thread({self.thread_id}) is archived"
+
+class SearchNotSupported(DataError):
+    # Full-text search is only supported by SQLite and PostgreSQL
+    def __str__(self):
+        return "Full-text search is not supported by this database"
+
 class ObjectNotFound(DataError):
     object_type: Optional[str]
     object_id: Optional[int]
@@ -81,11 +125,105 @@ class ObjectNotFound(DataError):
             message += self.message
         return message
  
+#############################################################
+# Thread actions are ordered by display_order, new actions are
+# appended with a gap of DISPLAY_ORDER_GAP, so moving an action
+# between two others only updates the moved action. When there
+# is no room left between the two, the thread is renumbered.
+#############################################################
+DISPLAY_ORDER_GAP = 1024
+
+#############################################################
+# Threads can be listed page by page, sorted by one of
+# THREAD_SORT_KEYS, ties are broken by thread id. A page is
+# located by a cursor made from the last thread of the
+# previous page (keyset pagination), so a page is fetched
+# with an index seek rather than skipping all threads before it.
+#############################################################
+ThreadSortKey = Literal["id", "created_at", "last_activity_at"]
+THREAD_SORT_KEYS = ("id", "created_at", "last_activity_at")
+
+def encode_thread_cursor(thread:ThreadSummary, *, sort_by:ThreadSortKey="id") -> str:
+    """Get the cursor to list threads after this thread.
+    """
+    value = getattr(thread, sort_by)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_by, value, thread.id]).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+def decode_thread_cursor(cursor:str, *, sort_by:ThreadSortKey="id") -> Tuple[Any, int]:
+    """Get the sort key value and thread id from a cursor.
+
+    Raises:
+        InvalidCursor: if the cursor is malformed or is not for sort_by.
+    """
+    try:
+        cursor_sort_by, value, thread_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if cursor_sort_by != sort_by or not isinstance(thread_id, int):
+            raise ValueError()
+        if sort_by == "id":
+            value = int(value)
+        else:
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor=cursor)
+    return value, thread_id
+
+def get_last_activity_at():
+    # when the latest action of a thread is created or completed, or when the thread is created,
+    # the query must outer join DBThreadAction and DBAction and group by thread
+    # actions of an archived thread are in its archive file, we use the value when it is archived
+    return case(
+        (DBThread.archived_at.is_not(None), DBThread.archived_last_activity_at),
+        else_=func.coalesce(
+            func.max(func.coalesce(DBAction.completed_at, DBAction.created_at)),
+            DBThread.created_at,
+            type_=DateTime
+        )
+    )
+
+def get_action_count():
+    # number of actions in a thread, the query must outer join DBThreadAction and group by thread
+    return case(
+        (DBThread.archived_at.is_not(None), DBThread.archived_action_count),
+        else_=func.count(DBThreadAction.id)
+    )
+
 class DataAccessor:
     session: Session
+    in_unit_of_work: bool   # True inside unit_of_work, writes are flushed but not committed
 
     def __init__(self, session:Session):
         self.session = session
+        self.in_unit_of_work = False
+
+    @contextmanager
+    def unit_of_work(self) -> Generator["DataAccessor", None, None]:
+        """Run several calls in one transaction, it is committed when the block exits, or rolled back if the block raises.
+
+        A unit of work inside another one joins the outer one.
+        """
+        if self.in_unit_of_work:
+            yield self
+            return
+
+        self.in_unit_of_work = True
+        try:
+            yield self
+            self.session.commit()
+        except BaseException:
+            self.session.rollback()
+            raise
+        finally:
+            self.in_unit_of_work = False
+
+    def _commit(self):
+        # inside a unit of work, objects we loaded stay valid until it ends, so we do not re-select them
+        if self.in_unit_of_work:
+            self.session.flush()
+        else:
+            self.session.commit()
 
     def create_user(self, *, email:str, password_hash:str) -> User:
         """Create a new user.
@@ -98,7 +236,7 @@ class DataAccessor:
                 password_hash = password_hash
             )
             self.session.add(db_user)
-            self.session.commit()
+            self._commit()
             return User.from_db(db_user)
         except IntegrityError:
             self.session.rollback()
@@ -125,50 +263,117 @@ class DataAccessor:
         
         return User.from_db(db_user)
 
-    def list_threads(self, *, user:User) -> List[ThreadSummary]:
-        """List all thread owned by user.
+    def list_threads(
+        self,
+        *,
+        user:User,
+        sort_by:ThreadSortKey="id",
+        descending:bool=False,
+        limit:Optional[int]=None,
+        after:Optional[str]=None
+    ) -> List[ThreadSummary]:
+        """List threads owned by user, with number of actions and last activity time of each thread.
+
+        Args:
+            sort_by: one of THREAD_SORT_KEYS, ties are broken by thread id.
+            descending: sort in descending order.
+            limit: return at most limit threads, None for all.
+            after: cursor from encode_thread_cursor, only return threads after that thread.
+
+        Raises:
+            InvalidCursor: if after is not a valid cursor for sort_by.
         """
-        db_threads = self.session.scalars(
-            select(DBThread)\
-                .join(DBThread.user)\
-                .where(DBThread.user_id == user.id)\
-                .order_by(DBThread.id)
-        )
+        action_count = get_action_count()
+        last_activity_at = get_last_activity_at()
+        # one row per thread, we do not load DBThread objects nor its user, which is the user passed in
+        stmt = select(
+            DBThread.id,
+            DBThread.created_at,
+            DBThread.title,
+            DBThread.description,
+            DBThread.version,
+            DBThread.archived_at,
+            action_count.label("action_count"),
+            last_activity_at.label("last_activity_at")
+        )\
+            .outerjoin(DBThreadAction, DBThreadAction.thread_id == DBThread.id)\
+            .outerjoin(DBAction, DBAction.id == DBThreadAction.action_id)\
+            .where(DBThread.user_id == user.id)\
+            .group_by(DBThread.id)
+
+        sort_key = {
+            "id": DBThread.id,
+            "created_at": DBThread.created_at,
+            "last_activity_at": last_activity_at
+        }[sort_by]
+        if after is not None:
+            value, thread_id = decode_thread_cursor(after, sort_by=sort_by)
+            if sort_by == "id":
+                condition = DBThread.id < thread_id if descending else DBThread.id > thread_id
+            elif descending:
+                condition = or_(sort_key < value, and_(sort_key == value, DBThread.id < thread_id))
+            else:
+                condition = or_(sort_key > value, and_(sort_key == value, DBThread.id > thread_id))
+            # last_activity_at is known after grouping
+            stmt = stmt.having(condition) if sort_by == "last_activity_at" else stmt.where(condition)
+
+        if sort_by == "id":
+            stmt = stmt.order_by(desc(DBThread.id) if descending else DBThread.id)
+        elif descending:
+            stmt = stmt.order_by(desc(sort_key), desc(DBThread.id))
+        else:
+            stmt = stmt.order_by(sort_key, DBThread.id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
         return [
-            ThreadSummary.from_db(db_thread) for db_thread in db_threads
+            ThreadSummary(
+                id = row.id,
+                user = user,
+                created_at = row.created_at,
+                title = row.title,
+                description = row.description,
+                version = row.version,
+                action_count = row.action_count,
+                last_activity_at = row.last_activity_at,
+                archived_at = row.archived_at
+            ) for row in self.session.execute(stmt)
         ]
 
-    def get_thread(self, thread_id:int, *, user:User) -> Thread:
+    def get_thread(self, thread_id:int, *, user:User, preview_size:Optional[int]=None) -> Thread:
         """Retrive a thread.
+
+        Args:
+            preview_size: if set, text of a response chunk larger than it is truncated, see _get_response_chunks.
+
+        Raises:
+            ObjectNotFound: if thread does not exist.
+            ThreadArchived: if thread is archived.
         """
         db_thread = self.session.get(DBThread, thread_id)
         if db_thread is None or db_thread.user_id != user.id:
             raise ObjectNotFound(object_type="Thread", object_id=thread_id)
+        if db_thread.archived_at is not None:
+            raise ThreadArchived(thread_id=thread_id)
 
         thread = Thread.from_db(db_thread) # need to fill in thread_actions
 
-        thread_actions: List[ThreadAction] = []
-        for db_thread_action in self.session.scalars(
+        db_thread_actions = list(self.session.scalars(
             select(DBThreadAction)\
                 .join(DBThreadAction.action)\
                 .where(DBThreadAction.thread_id == thread_id)\
                 .order_by(DBThreadAction.display_order)
-        ):
-            db_action = db_thread_action.action
-
-            db_response_chunks = self.session.scalars(
-               select(DBActionResponseChunk)\
-                    .where(DBActionResponseChunk.action_id == db_thread_action.action_id)\
-                    .order_by(DBActionResponseChunk.order)
-            )
-
-            response_chunks = [
-                ActionResponseChunk.from_db(db_action_response_chunk)
-                for db_action_response_chunk in db_response_chunks
-            ]
+        ))
+        # response chunks of all actions in one query
+        response_chunks_by_action_id = self._get_response_chunks(
+            [db_thread_action.action_id for db_thread_action in db_thread_actions],
+            preview_size=preview_size
+        )
 
-            action = Action.from_db(db_action)
-            action.response_chunks = response_chunks
+        thread_actions: List[ThreadAction] = []
+        for db_thread_action in db_thread_actions:
+            action = Action.from_db(db_thread_action.action)
+            action.response_chunks = response_chunks_by_action_id.get(db_thread_action.action_id, [])
             thread_actions.append(
                 ThreadAction(
                     id = db_thread_action.id,
@@ -186,9 +391,69 @@ class DataAccessor:
             created_at = db_thread.created_at,
             title = db_thread.title,
             description = db_thread.description,
+            version = db_thread.version,
             thread_actions = thread_actions
         )
         return thread
+
+    def get_thread_version(self, thread_id:int, *, user:User) -> int:
+        """Get version of a thread without loading it.
+
+        Raises:
+            ObjectNotFound: if thread does not exist.
+        """
+        row = self.session.execute(
+            select(DBThread.user_id, DBThread.version).where(DBThread.id == thread_id)
+        ).one_or_none()
+        if row is None or row.user_id != user.id:
+            raise ObjectNotFound(object_type="Thread", object_id=thread_id)
+        return row.version
+
+    def get_thread_etag_version(self, thread_id:int, *, user:User) -> str:
+        """Get version for the ETag of a thread without loading it, see Thread.get_etag_version.
+
+        Streamed response chunks do not bump the thread version, so it also has the latest chunk id
+        of the actions in the thread.
+
+        Raises:
+            ObjectNotFound: if thread does not exist.
+        """
+        version = self.get_thread_version(thread_id, user=user)
+        max_chunk_id = self.session.scalar(
+            select(func.max(DBActionResponseChunk.id))\
+                .join(DBThreadAction, DBThreadAction.action_id == DBActionResponseChunk.action_id)\
+                .where(DBThreadAction.thread_id == thread_id)
+        )
+        return f"{version}-{max_chunk_id or 0}"
+
+    def get_thread_list_version(self, *, user:User) -> str:
+        """Get a version of user's thread list, it changes when any thread is created, deleted or changed.
+        """
+        thread_count, max_thread_id, total_version = self.session.execute(
+            select(
+                func.count(DBThread.id), 
+                func.max(DBThread.id), 
+                func.sum(DBThread.version)
+            ).where(DBThread.user_id == user.id)
+        ).one()
+        return f"{thread_count}-{max_thread_id or 0}-{total_version or 0}"
+
+    def _bump_thread_version(self, thread_id:int):
+        # caller commits
+        self.session.execute(
+            update(DBThread)\
+                .where(DBThread.id == thread_id)\
+                .values(version=DBThread.version + 1)
+        )
+
+    def _bump_action_thread_versions(self, action_id:int):
+        # the action is shown in all threads that has it, caller commits
+        self.session.execute(
+            update(DBThread)\
+                .where(DBThread.id.in_(select(DBThreadAction.thread_id).where(DBThreadAction.action_id == action_id)))\
+                .values(version=DBThread.version + 1),
+            execution_options={"synchronize_session": False}
+        )
         
             
     def create_thread(self, *, title:str, description:str, user:User) -> Thread:
@@ -201,7 +466,7 @@ class DataAccessor:
             description = description
         )
         self.session.add(db_thread)
-        self.session.commit()
+        self._commit()
         thread = self.get_thread(db_thread.id, user=user)
         return thread
 
@@ -228,8 +493,9 @@ class DataAccessor:
             updated_fields += 1
         
         if updated_fields > 0:
+            db_thread.version = DBThread.version + 1  # in SQL, so concurrent bumps are not lost
             self.session.add(db_thread)
-            self.session.commit()
+            self._commit()
 
         return self.get_thread(thread_id, user=user)
         
@@ -248,28 +514,126 @@ class DataAccessor:
             raw_text = raw_text
         )
         self.session.add(db_action)
-        self.session.commit()
+        self._commit()
 
-        return self.get_action(db_action.id, user=user)
+        # a new action has no response chunk yet
+        return Action.from_db(db_action)
            
-    def get_action(self, action_id:int, *, user:User) -> Action:
+    def get_action(self, action_id:int, *, user:User, preview_size:Optional[int]=None) -> Action:
         """Retrieve an action.
+
+        Args:
+            preview_size: if set, text of a response chunk larger than it is truncated, see _get_response_chunks.
         """
         db_action = self.session.get(DBAction, action_id)
         if db_action is None or db_action.user_id != user.id:
             raise ObjectNotFound(object_type="Action", object_id=action_id)
         
         action = Action.from_db(db_action)
-        action.response_chunks = [
-            ActionResponseChunk.from_db(db_action_response_chunk) for db_action_response_chunk in self.session.scalars(
-                select(DBActionResponseChunk)\
-                    .where(DBActionResponseChunk.action_id == action_id)
-            )
-        ]
+        action.response_chunks = self._get_response_chunks([action_id], preview_size=preview_size).get(action_id, [])
         return action
 
-    def patch_action(self, action_id:int, *, user:User, title:Optional[PatchValue[str]]=None) -> Action:
+    def _get_response_chunks(
+        self, 
+        action_ids:List[int], 
+        *, 
+        preview_size:Optional[int]=None
+    ) -> Dict[int, List[ActionResponseChunk]]:
+        """Get response chunks of actions, ordered by order.
+
+        Args:
+            preview_size: if None, chunks are loaded as is. Otherwise a chunk whose text is larger than
+                preview_size bytes only has the first preview_size bytes of text in text_content and is_truncated
+                is set, the full text, binary_content and rendered_content are not loaded.
+
+        Returns:
+            A dict of action id to its response chunks, an action without response chunk is not in it.
+        """
+        response_chunks_by_action_id: Dict[int, List[ActionResponseChunk]] = {}
+        if len(action_ids) == 0:
+            return response_chunks_by_action_id
+
+        if preview_size is None:
+            for db_action_response_chunk in self.session.scalars(
+                select(DBActionResponseChunk)\
+                    .where(DBActionResponseChunk.action_id.in_(action_ids))\
+                    .order_by(DBActionResponseChunk.action_id, DBActionResponseChunk.order)
+            ):
+                response_chunks_by_action_id.setdefault(db_action_response_chunk.action_id, []).append(
+                    ActionResponseChunk.from_db(db_action_response_chunk)
+                )
+            return response_chunks_by_action_id
+
+        # content_size is NULL for a chunk without text, it is never truncated
+        is_truncated = DBActionResponseChunk.content_size > preview_size
+        stmt = select(
+            DBActionResponseChunk.id,
+            DBActionResponseChunk.action_id,
+            DBActionResponseChunk.order,
+            DBActionResponseChunk.mime,
+            DBActionResponseChunk.compression,
+            DBActionResponseChunk.compressed_content,
+            DBActionResponseChunk.content_size,
+            # preview_size characters are at least preview_size bytes, the rest is cut in python
+            case(
+                (is_truncated, func.substr(DBActionResponseChunk.text_content, 1, preview_size)),
+                else_=DBActionResponseChunk.text_content
+            ).label("text_content"),
+            case((is_truncated, None), else_=DBActionResponseChunk.rendered_content).label("rendered_content"),
+        ).where(
+            DBActionResponseChunk.action_id.in_(action_ids)
+        ).order_by(DBActionResponseChunk.action_id, DBActionResponseChunk.order)
+
+        for row in self.session.execute(stmt):
+            row_is_truncated = row.content_size is not None and row.content_size > preview_size
+            if row.compression is None:
+                text_content = row.text_content
+                if row_is_truncated:
+                    text_content = truncate_text(text_content, preview_size)
+            elif row_is_truncated:
+                text_content = decompress_text_prefix(row.compression, row.compressed_content, preview_size)
+            else:
+                text_content = decompress_text(row.compression, row.compressed_content)
+            response_chunks_by_action_id.setdefault(row.action_id, []).append(ActionResponseChunk(
+                id = row.id,
+                action_id = row.action_id,
+                order = row.order,
+                mime = row.mime,
+                text_content = text_content,
+                rendered_content = row.rendered_content,
+                content_size = row.content_size,
+                is_truncated = row_is_truncated
+            ))
+        return response_chunks_by_action_id
+
+    def get_response_chunk(self, chunk_id:int, *, user:User) -> ActionResponseChunk:
+        """Retrieve a response chunk with its full content.
+
+        Raises:
+            ObjectNotFound: if response chunk does not exist, or its action is not owned by user.
+        """
+        db_action_response_chunk = self.session.scalars(
+            select(DBActionResponseChunk)\
+                .join(DBAction, DBAction.id == DBActionResponseChunk.action_id)\
+                .where(DBActionResponseChunk.id == chunk_id)\
+                .where(DBAction.user_id == user.id)
+        ).one_or_none()
+        if db_action_response_chunk is None:
+            raise ObjectNotFound(object_type="ActionResponseChunk", object_id=chunk_id)
+        return ActionResponseChunk.from_db(db_action_response_chunk)
+
+    def patch_action(
+        self,
+        action_id:int,
+        *,
+        user:User,
+        title:Optional[PatchValue[str]]=None,
+        slim:bool=False
+    ) -> Union[Action, ActionSummary]:
         """Update action's title.
+
+        Returns:
+            The action, or ActionSummary without loading response chunks if slim is True.
         """
         db_action = self.session.get(DBAction, action_id)
         if db_action is None or db_action.user_id != user.id:
@@ -278,12 +642,24 @@ class DataAccessor:
         if title is not None:
             db_action.title = title.value
             self.session.add(db_action)
-            self.session.commit()
-        
+            self._bump_action_thread_versions(action_id)
+            self._commit()
+
+        if slim:
+            return ActionSummary.from_db(db_action)
         return self.get_action(action_id, user=user)
 
-    def complete_action(self, action_id:int, *, user:Optional[User]=None) -> Action:
+    def complete_action(
+        self,
+        action_id:int,
+        *,
+        user:Optional[User]=None,
+        slim:bool=False
+    ) -> Union[Action, ActionSummary]:
         """Set an action to be completed.
+
+        Returns:
+            The action, or ActionSummary without loading response chunks if slim is True.
         """
         db_action = self.session.get(DBAction, action_id)
         if user is None:
@@ -294,12 +670,25 @@ class DataAccessor:
         db_action.is_completed = True
         db_action.completed_at = get_utc_now()
         self.session.add(db_action)
-        self.session.commit()
-        
+        self._bump_action_thread_versions(action_id)
+        self._commit()
+
+        if slim:
+            return ActionSummary.from_db(db_action)
         return self.get_action(action_id, user=user)
 
-    def append_action_to_thread(self, *, thread_id:int, action_id:int, user:User) -> ThreadAction:
+    def append_action_to_thread(
+        self,
+        *,
+        thread_id:int,
+        action_id:int,
+        user:User,
+        slim:bool=False
+    ) -> Union[ThreadAction, ThreadActionSummary]:
         """Append an action to the end of a thread.
+
+        Returns:
+            The thread action, or ThreadActionSummary without loading the action if slim is True.
         """
         try:
             db_thread = self.session.get(DBThread, thread_id)
@@ -310,16 +699,20 @@ class DataAccessor:
 
             if db_action is None or db_action.user_id != user.id:
                 raise ObjectNotFound(object_type="Action", object_id=action_id)
-                
+
+            # display_order of archived thread actions are not known
+            if db_thread.archived_at is not None:
+                raise ThreadArchived(thread_id=thread_id)
+
             old_max_display_order = self.session.scalars(
                 select(
                     func.max(DBThreadAction.display_order)
                 ).where(DBThreadAction.thread_id == thread_id)
             ).one()
             if old_max_display_order is None:
-                display_order = 1
+                display_order = DISPLAY_ORDER_GAP
             else:
-                display_order = old_max_display_order + 1
+                display_order = old_max_display_order + DISPLAY_ORDER_GAP
         
             db_thread_action = DBThreadAction(
                 thread_id = thread_id,
@@ -329,8 +722,11 @@ class DataAccessor:
                 show_answer = True
             )
             self.session.add(db_thread_action)
-            self.session.commit()
+            db_thread.version = DBThread.version + 1
+            self._commit()
 
+            if slim:
+                return ThreadActionSummary.from_db(db_thread_action)
             thread_action = ThreadAction(
                 id = db_thread_action.id,
                 thread_id = db_thread_action.thread_id,
@@ -351,9 +747,10 @@ class DataAccessor:
         mime:str, 
         text_content:Optional[str] = None, 
         binary_content:Optional[bytes] = None, 
+        rendered_content:Optional[str] = None,
         user:Optional[User] = None
     ) -> ActionResponseChunk:
-        """Append an response chunk to the end of a action.
+        """Append an response chunk to the end of a action, large text_content is stored compressed.
         """
         db_action = self.session.get(DBAction, action_id)
         if user is None:
@@ -371,21 +768,62 @@ class DataAccessor:
         else:
             order = old_max_order + 1
 
+        compression, compressed_content, content_size = (None, None, None) if text_content is None \
+            else compress_text(text_content)
         db_action_response_chunk = DBActionResponseChunk(
             action_id = action_id,
             order = order,
             mime = mime,
-            text_content = text_content,
-            binary_content = binary_content
+            text_content = text_content if compression is None else None,
+            binary_content = binary_content,
+            rendered_content = rendered_content,
+            compression = compression,
+            compressed_content = compressed_content,
+            content_size = content_size
         )
         self.session.add(db_action_response_chunk)
-        self.session.commit()
-
-        action_response_chunk = ActionResponseChunk.from_db(
-            db_action_response_chunk,
+        self.session.flush()
+        chunk_id = db_action_response_chunk.id
+        if text_content is not None:
+            # the search index has the original text even if it is stored compressed
+            index_response_chunks(self.session.connection(), [(chunk_id, text_content)])
+        # thread version is not bumped on the hot path, get_thread_etag_version uses the latest chunk id
+        self._commit()
+
+        # we have the text, no need to decompress it
+        action_response_chunk = ActionResponseChunk(
+            id = chunk_id,
+            action_id = action_id,
+            order = order,
+            mime = mime,
+            text_content = text_content,
+            binary_content = binary_content,
+            rendered_content = rendered_content,
+            content_size = content_size
         )
         return action_response_chunk
 
+    def get_chunk_storage_stats(self) -> dict:
+        """Get how much space compression of response chunks saves.
+        """
+        chunk_count, compressed_chunk_count, compressed_content_size, compressed_size = self.session.execute(
+            select(
+                func.count(DBActionResponseChunk.id),
+                func.count(DBActionResponseChunk.compression),
+                func.coalesce(func.sum(
+                    case((DBActionResponseChunk.compression.is_not(None), DBActionResponseChunk.content_size), else_=0)
+                ), 0),
+                func.coalesce(func.sum(func.length(DBActionResponseChunk.compressed_content)), 0),
+            )
+        ).one()
+        return {
+            "chunks": chunk_count,
+            "compressed_chunks": compressed_chunk_count,
+            "compressed_content_size": compressed_content_size,  # text size of compressed chunks
+            "compressed_size": compressed_size,                  # what they take after compression
+            "saved_size": compressed_content_size - compressed_size,
+        }
+
     def remove_action_from_thread(
         self, 
         *,
@@ -413,7 +851,9 @@ class DataAccessor:
                 .where(DBThreadAction.action_id == action_id)
         )
         deleted_rows = result.rowcount
-        self.session.commit()
+        if deleted_rows > 0:
+            db_thread.version = DBThread.version + 1
+        self._commit()
         if deleted_rows == 0:
             raise ObjectNotFound(object_type="ThreadAction", message=f"thread_id={thread_id}, action_id={action_id}")
 
@@ -423,16 +863,21 @@ class DataAccessor:
         thread_id:int,
         *,
         user:User
-    ):
-        """Delete a thread.
+    ) -> bool:
+        """Delete a thread, an archived thread is deleted without restoring it.
+
+        Returns:
+            True if the thread is archived, caller removes its archive file once this is committed.
 
         Raises:
             ObjectNotFound: if thread does not exist.
         """
-        db_thread = self.session.get(DBThread, thread_id)
+        # so it is not restored while we delete it
+        db_thread = self.session.get(DBThread, thread_id, with_for_update=True)
 
         if db_thread is None or db_thread.user_id != user.id:
             raise ObjectNotFound(object_type="Thread", object_id=thread_id)
+        is_archived = db_thread.archived_at is not None
 
         self.session.execute(
             delete(DBThreadAction)\
@@ -442,7 +887,8 @@ class DataAccessor:
             delete(DBThread)\
                 .where(DBThread.id == thread_id)
         )
-        self.session.commit()
+        self._commit()
+        return is_archived
 
     def patch_thread_action(
         self, 
@@ -451,10 +897,14 @@ class DataAccessor:
         *, 
         user:User,
         show_question: Optional[PatchValue[bool]] = None,
-        show_answer:   Optional[PatchValue[bool]] = None
-    ) -> ThreadAction:
+        show_answer:   Optional[PatchValue[bool]] = None,
+        slim:bool = False
+    ) -> Union[ThreadAction, ThreadActionSummary]:
         """Update thread action's show_question and/or show_answer.
 
+        Returns:
+            The thread action, or ThreadActionSummary without loading the action if slim is True.
+
         Raises:
             ObjectNotFound: if thread does not exist, or action does not exist, or thread_action does not exist
         """
@@ -484,8 +934,11 @@ class DataAccessor:
         
         if updated_fields > 0:
             self.session.add(db_thread_action)
-            self.session.commit()
+            db_thread.version = DBThread.version + 1
+            self._commit()
 
+        if slim:
+            return ThreadActionSummary.from_db(db_thread_action)
         thread_action = ThreadAction(
             id = db_thread_action.id,
             thread_id = db_thread_action.thread_id,
@@ -496,6 +949,84 @@ class DataAccessor:
         )
         return thread_action
 
+    def _get_thread_action_ids(self, thread_id:int, action_ids:List[int]) -> List[int]:
+        # returns ids of thread actions for the actions, raises ObjectNotFound if any action is not in the thread
+        rows = self.session.execute(
+            select(DBThreadAction.id, DBThreadAction.action_id)\
+                .where(DBThreadAction.thread_id == thread_id)\
+                .where(DBThreadAction.action_id.in_(action_ids))
+        ).all()
+        missing_action_ids = set(action_ids) - set(row.action_id for row in rows)
+        if len(missing_action_ids) > 0:
+            raise ObjectNotFound(
+                object_type="ThreadAction",
+                message=f"thread_id={thread_id}, action_ids={sorted(missing_action_ids)}"
+            )
+        return [row.id for row in rows]
+
+    def remove_actions_from_thread(
+        self,
+        *,
+        action_ids:List[int],
+        thread_id:int,
+        user:User
+    ):
+        """Remove many actions from a thread in one transaction, it does not delete the actions.
+
+        Raises:
+            ObjectNotFound: if thread does not exist or thread does not reference to any of the actions, nothing is removed.
+        """
+        db_thread = self.session.get(DBThread, thread_id)
+        if db_thread is None or db_thread.user_id != user.id:
+            raise ObjectNotFound(object_type="Thread", object_id=thread_id)
+
+        if len(action_ids) == 0:
+            return
+
+        thread_action_ids = self._get_thread_action_ids(thread_id, action_ids)
+        self.session.execute(
+            delete(DBThreadAction).where(DBThreadAction.id.in_(thread_action_ids))
+        )
+        db_thread.version = DBThread.version + 1
+        self._commit()
+
+    def patch_thread_actions(
+        self,
+        thread_id:int,
+        action_ids:List[int],
+        *,
+        user:User,
+        show_question: Optional[PatchValue[bool]] = None,
+        show_answer:   Optional[PatchValue[bool]] = None
+    ):
+        """Update show_question and/or show_answer of many thread actions in one transaction.
+
+        Raises:
+            ObjectNotFound: if thread does not exist or thread does not reference to any of the actions, nothing is updated.
+        """
+        db_thread = self.session.get(DBThread, thread_id)
+        if db_thread is None or db_thread.user_id != user.id:
+            raise ObjectNotFound(object_type="Thread", object_id=thread_id)
+
+        thread_action_ids = self._get_thread_action_ids(thread_id, action_ids)
+
+        values = {}
+        if show_question is not None:
+            values["show_question"] = show_question.value
+        if show_answer is not None:
+            values["show_answer"] = show_answer.value
+        if len(values) == 0 or len(thread_action_ids) == 0:
+            return
+
+        self.session.execute(
+            update(DBThreadAction)\
+                .where(DBThreadAction.id.in_(thread_action_ids))\
+                .values(**values),
+            execution_options={"synchronize_session": False}
+        )
+        db_thread.version = DBThread.version + 1
+        self._commit()
+
     def get_thread_ids_for_action(self, action_id:int) -> List[int]:
         """Get list of threads that has this action.
         Returns:
@@ -508,6 +1039,50 @@ class DataAccessor:
                 .where(DBThreadAction.action_id == action_id)
         )]
 
+    def search_actions(self, query:str, *, user:User, limit:int=20, offset:int=0) -> List[SearchHit]:
+        """Full-text search user's actions and their response chunks, best hit first.
+
+        Raises:
+            SearchNotSupported: if the database does not support full-text search.
+        """
+        connection = self.session.connection()
+        if not is_search_supported(connection):
+            raise SearchNotSupported()
+        statement, query_parameter = get_search_statement(connection, query)
+        if statement is None:
+            return []
+
+        rows = self.session.execute(
+            statement.columns(
+                action_id=Integer, chunk_id=Integer, title=String, created_at=DateTime, snippet=String, rank=Float
+            ),
+            {"query": query_parameter, "user_id": user.id, "limit": limit, "offset": offset}
+        ).all()
+        search_hits = [
+            SearchHit(
+                action_id = row.action_id,
+                chunk_id = row.chunk_id,
+                title = row.title,
+                created_at = row.created_at,
+                snippet = row.snippet,
+                rank = row.rank
+            ) for row in rows
+        ]
+
+        # user's threads that have the actions found
+        thread_ids = {}
+        for action_id, thread_id in self.session.execute(
+            select(DBThreadAction.action_id, DBThreadAction.thread_id)\
+                .join(DBThread, DBThread.id == DBThreadAction.thread_id)\
+                .where(DBThreadAction.action_id.in_({search_hit.action_id for search_hit in search_hits}))\
+                .where(DBThread.user_id == user.id)\
+                .order_by(DBThreadAction.thread_id)
+        ):
+            thread_ids.setdefault(action_id, []).append(thread_id)
+        for search_hit in search_hits:
+            search_hit.thread_ids = thread_ids.get(search_hit.action_id, [])
+        return search_hits
+
     def get_action_handler_user_config(
         self,
         *,
@@ -553,41 +1128,189 @@ class DataAccessor:
             db_ahc.updated_at = get_utc_now()
 
         self.session.add(db_ahc)
-        self.session.commit()
+        self._commit()
 
 
-    def move_thread_action_up(self, thread_action_id:int, *, user:User) -> ThreadAction:
-        """Move an action up inside a thread.
+    def list_threads_to_archive(self, *, inactive_since:datetime) -> List[int]:
+        """Get ids of threads of all users which are not archived and have no activity since inactive_since.
         """
-        db_thread_action = self.session.get(DBThreadAction, thread_action_id)
-        if db_thread_action is None or db_thread_action.action.user_id != user.id:
-            raise ObjectNotFound(object_type="ThreadAction", object_id=thread_action_id)
+        return list(self.session.scalars(
+            select(DBThread.id)\
+                .outerjoin(DBThreadAction, DBThreadAction.thread_id == DBThread.id)\
+                .outerjoin(DBAction, DBAction.id == DBThreadAction.action_id)\
+                .where(DBThread.archived_at.is_(None))\
+                .group_by(DBThread.id)\
+                .having(get_last_activity_at() < inactive_since)\
+                .order_by(DBThread.id)
+        ))
 
-        prior_db_thread_action = self.session.scalars(
-            select(DBThreadAction)\
-                .where(DBThreadAction.thread_id == db_thread_action.thread_id)\
-                .where(DBThreadAction.display_order < db_thread_action.display_order)
-                .order_by(desc(DBThreadAction.display_order))
-        ).one_or_none()
+    def archive_thread(self, thread_id:int) -> Optional[dict]:
+        """Remove thread actions of a thread, and completed actions only in this thread with their response chunks.
 
-        if prior_db_thread_action is None:
-            # we already have the smallest display_order, cannot move up any more
-            return ThreadAction(
-                id = db_thread_action.id,
-                thread_id = db_thread_action.thread_id,
-                action = self.get_action(db_thread_action.action_id, user=user),
-                display_order=db_thread_action.display_order,
-                show_question=db_thread_action.show_question,
-                show_answer=db_thread_action.show_answer
-            )
+        Caller must store the archive before the change is committed, see webcli2/core/data/archive.py
 
-        tmp_display_order = db_thread_action.display_order
-        db_thread_action.display_order = prior_db_thread_action.display_order
-        prior_db_thread_action.display_order = tmp_display_order
+        Returns:
+            Archive of the thread, None if the thread is not archived since it is archived already, or it is empty.
+
+        Raises:
+            ObjectNotFound: if thread does not exist.
+        """
+        # so the thread is not changed or restored while we archive it
+        db_thread = self.session.get(DBThread, thread_id, with_for_update=True)
+        if db_thread is None:
+            raise ObjectNotFound(object_type="Thread", object_id=thread_id)
+        if db_thread.archived_at is not None:
+            return None
+
+        db_thread_actions = list(self.session.scalars(
+            select(DBThreadAction).where(DBThreadAction.thread_id == thread_id)
+        ))
+        if len(db_thread_actions) == 0:
+            return None
+
+        action_ids = [db_thread_action.action_id for db_thread_action in db_thread_actions]
+        shared_action_ids = set(self.session.scalars(
+            select(DBThreadAction.action_id)\
+                .where(DBThreadAction.action_id.in_(action_ids))\
+                .where(DBThreadAction.thread_id != thread_id)
+        ))
+        db_actions = [
+            db_action for db_action in self.session.scalars(
+                select(DBAction)\
+                    .where(DBAction.id.in_(action_ids))\
+                    .where(DBAction.is_completed == True)\
+                    .order_by(DBAction.id)
+            ) if db_action.id not in shared_action_ids
+        ]
+        archived_action_ids = [db_action.id for db_action in db_actions]
+        db_action_response_chunks = list(self.session.scalars(
+            select(DBActionResponseChunk)\
+                .where(DBActionResponseChunk.action_id.in_(archived_action_ids))\
+                .order_by(DBActionResponseChunk.id)
+        ))
+
+        # SQLite may reuse the largest id once the row is deleted, the thread would not be
+        # restored if that happens, so we skip it until there are newer rows
+        for db_model, db_objects in (
+            (DBThreadAction, db_thread_actions),
+            (DBAction, db_actions),
+            (DBActionResponseChunk, db_action_response_chunks)
+        ):
+            if len(db_objects) > 0 and \
+                max(db_object.id for db_object in db_objects) >= self.session.scalar(select(func.max(db_model.id))):
+                return None
+
+        last_activity_at = self.session.scalar(
+            select(get_last_activity_at())\
+                .select_from(DBThread)\
+                .outerjoin(DBThreadAction, DBThreadAction.thread_id == DBThread.id)\
+                .outerjoin(DBAction, DBAction.id == DBThreadAction.action_id)\
+                .where(DBThread.id == thread_id)\
+                .group_by(DBThread.id)
+        )
+
+        archive = {
+            "version": ARCHIVE_FORMAT_VERSION,
+            "thread_id": thread_id,
+            "thread_actions": [dump_row(DBThreadAction.__table__, o) for o in db_thread_actions],
+            "actions": [dump_row(DBAction.__table__, o) for o in db_actions],
+            "response_chunks": [dump_row(DBActionResponseChunk.__table__, o) for o in db_action_response_chunks],
+        }
+
+        self.session.execute(
+            delete(DBActionResponseChunk).where(DBActionResponseChunk.action_id.in_(archived_action_ids))
+        )
+        self.session.execute(
+            delete(DBThreadAction).where(DBThreadAction.thread_id == thread_id)
+        )
+        self.session.execute(
+            delete(DBAction).where(DBAction.id.in_(archived_action_ids))
+        )
+        # the thread list shows these while the thread is archived
+        db_thread.archived_at = get_utc_now()
+        db_thread.archived_action_count = len(db_thread_actions)
+        db_thread.archived_last_activity_at = last_activity_at
+        db_thread.version = DBThread.version + 1
+        self._commit()
+        return archive
+
+    def restore_thread(self, thread_id:int, archive:dict) -> bool:
+        """Put rows in the archive of the thread back.
+
+        Returns:
+            True if the thread is restored, False if it is not archived (e.g. someone else restored it).
+
+        Raises:
+            ObjectNotFound: if thread does not exist.
+        """
+        db_thread = self.session.get(DBThread, thread_id, with_for_update=True)
+        if db_thread is None:
+            raise ObjectNotFound(object_type="Thread", object_id=thread_id)
+        if db_thread.archived_at is None:
+            return False
+
+        response_chunk_rows = load_rows(DBActionResponseChunk.__table__, archive["response_chunks"])
+        indexed_chunks = [] # (chunk id, text) for the search index
+        for row in response_chunk_rows:
+            for column_name in ("compression", "compressed_content", "content_size"):
+                row.setdefault(column_name, None)
+            if row["compression"] is not None:
+                indexed_chunks.append((row["id"], decompress_text(row["compression"], row["compressed_content"])))
+            elif row["text_content"] is not None:
+                indexed_chunks.append((row["id"], row["text_content"]))
+                # chunks archived before we compress them, store them like append_response_to_action does
+                if row["content_size"] is None:
+                    row["compression"], row["compressed_content"], row["content_size"] = compress_text(row["text_content"])
+                    if row["compression"] is not None:
+                        row["text_content"] = None
+
+        for db_model, rows in (
+            (DBAction, load_rows(DBAction.__table__, archive["actions"])),
+            (DBActionResponseChunk, response_chunk_rows),
+            (DBThreadAction, load_rows(DBThreadAction.__table__, archive["thread_actions"]))
+        ):
+            if len(rows) > 0:
+                self.session.execute(insert(db_model), rows)
+        index_response_chunks(self.session.connection(), indexed_chunks)
+        self._unset_thread_archived(db_thread)
+        self._commit()
+        return True
+
+    def drop_thread_archive(self, thread_id:int) -> bool:
+        """Mark an archived thread as not archived without restoring any rows, when its archive file is lost.
+
+        Actions in the archive are lost, but the thread can be opened and deleted again.
+
+        Returns:
+            True if the thread was archived, False if it is not archived (e.g. someone else restored it).
+
+        Raises:
+            ObjectNotFound: if thread does not exist.
+        """
+        db_thread = self.session.get(DBThread, thread_id, with_for_update=True)
+        if db_thread is None:
+            raise ObjectNotFound(object_type="Thread", object_id=thread_id)
+        if db_thread.archived_at is None:
+            return False
+
+        self._unset_thread_archived(db_thread)
+        self._commit()
+        return True
+
+    def _unset_thread_archived(self, db_thread:DBThread):
+        # caller commits
+        db_thread.archived_at = None
+        db_thread.archived_action_count = None
+        db_thread.archived_last_activity_at = None
+        db_thread.version = DBThread.version + 1
+
+    def get_thread_action(self, thread_action_id:int, *, user:User) -> ThreadAction:
+        """Retrieve a thread action.
+        """
+        db_thread_action = self.session.get(DBThreadAction, thread_action_id)
+        if db_thread_action is None or db_thread_action.action.user_id != user.id:
+            raise ObjectNotFound(object_type="ThreadAction", object_id=thread_action_id)
 
-        self.session.add(db_thread_action)
-        self.session.add(prior_db_thread_action)
-        self.session.commit()
         return ThreadAction(
             id = db_thread_action.id,
             thread_id = db_thread_action.thread_id,
@@ -597,43 +1320,150 @@ class DataAccessor:
             show_answer=db_thread_action.show_answer
         )
 
-    def move_thread_action_down(self, thread_action_id:int, *, user:User) -> ThreadAction:
-        """Move an action down inside a thread.
+    def move_thread_action(
+        self, 
+        thread_action_id:int, 
+        *, 
+        user:User, 
+        direction:Literal["up", "down"]
+    ) -> List[ThreadActionOrder]:
+        """Move an action up or down by one position inside a thread.
+
+        Returns:
+            The thread actions whose display_order changed, empty if the action is already
+            at the top (moving up) or at the bottom (moving down).
         """
         db_thread_action = self.session.get(DBThreadAction, thread_action_id)
         if db_thread_action is None or db_thread_action.action.user_id != user.id:
             raise ObjectNotFound(object_type="ThreadAction", object_id=thread_action_id)
 
-        prior_db_thread_action = self.session.scalars(
-            select(DBThreadAction)\
+        if direction == "up":
+            query = select(DBThreadAction)\
                 .where(DBThreadAction.thread_id == db_thread_action.thread_id)\
-                .where(DBThreadAction.display_order > db_thread_action.display_order)
+                .where(DBThreadAction.display_order < db_thread_action.display_order)\
+                .order_by(desc(DBThreadAction.display_order))
+        else:
+            query = select(DBThreadAction)\
+                .where(DBThreadAction.thread_id == db_thread_action.thread_id)\
+                .where(DBThreadAction.display_order > db_thread_action.display_order)\
                 .order_by(DBThreadAction.display_order)
-        ).one_or_none()
+        neighbour_db_thread_action = self.session.scalars(query.limit(1)).first()
 
-        if prior_db_thread_action is None:
-            # we already have the smallest display_order, cannot move up any more
-            return ThreadAction(
-                id = db_thread_action.id,
-                thread_id = db_thread_action.thread_id,
-                action = self.get_action(db_thread_action.action_id, user=user),
-                display_order=db_thread_action.display_order,
-                show_question=db_thread_action.show_question,
-                show_answer=db_thread_action.show_answer
-            )
+        if neighbour_db_thread_action is None:
+            # already at the top or bottom, cannot move any more
+            return []
 
         tmp_display_order = db_thread_action.display_order
-        db_thread_action.display_order = prior_db_thread_action.display_order
-        prior_db_thread_action.display_order = tmp_display_order
+        db_thread_action.display_order = neighbour_db_thread_action.display_order
+        neighbour_db_thread_action.display_order = tmp_display_order
 
         self.session.add(db_thread_action)
-        self.session.add(prior_db_thread_action)
-        self.session.commit()
-        return ThreadAction(
-            id = db_thread_action.id,
-            thread_id = db_thread_action.thread_id,
-            action = self.get_action(db_thread_action.action_id, user=user),
-            display_order=db_thread_action.display_order,
-            show_question=db_thread_action.show_question,
-            show_answer=db_thread_action.show_answer
-        )
+        self.session.add(neighbour_db_thread_action)
+        self._bump_thread_version(db_thread_action.thread_id)
+        self._commit()
+        return [
+            ThreadActionOrder(id=db_thread_action.id, display_order=db_thread_action.display_order),
+            ThreadActionOrder(id=neighbour_db_thread_action.id, display_order=neighbour_db_thread_action.display_order),
+        ]
+
+    def move_thread_action_after(
+        self,
+        thread_action_id:int,
+        *,
+        user:User,
+        after_thread_action_id:Optional[int]
+    ) -> List[ThreadActionOrder]:
+        """Move an action right after another action of the same thread, or to the top if after_thread_action_id is None.
+
+        Raises:
+            ObjectNotFound: if thread action does not exist, or after_thread_action_id is not in the same thread.
+        Returns:
+            The thread actions whose display_order changed, it is only the moved one unless the thread is renumbered.
+        """
+        db_thread_action = self.session.get(DBThreadAction, thread_action_id)
+        if db_thread_action is None or db_thread_action.action.user_id != user.id:
+            raise ObjectNotFound(object_type="ThreadAction", object_id=thread_action_id)
+        thread_id = db_thread_action.thread_id
+
+        if after_thread_action_id is None:
+            lower_display_order = 0
+        else:
+            db_after_thread_action = self.session.get(DBThreadAction, after_thread_action_id)
+            if db_after_thread_action is None or db_after_thread_action.thread_id != thread_id:
+                raise ObjectNotFound(object_type="ThreadAction", object_id=after_thread_action_id)
+            if after_thread_action_id == thread_action_id:
+                return []
+            lower_display_order = db_after_thread_action.display_order
+
+        db_next_thread_action = self.session.scalars(
+            select(DBThreadAction)\
+                .where(DBThreadAction.thread_id == thread_id)\
+                .where(DBThreadAction.display_order > lower_display_order)\
+                .order_by(DBThreadAction.display_order)\
+                .limit(1)
+        ).first()
+        if db_next_thread_action is not None and db_next_thread_action.id == thread_action_id:
+            # already there
+            return []
+
+        if db_next_thread_action is None:
+            display_order = lower_display_order + DISPLAY_ORDER_GAP
+        elif db_next_thread_action.display_order - lower_display_order > 1:
+            display_order = (lower_display_order + db_next_thread_action.display_order) // 2
+        else:
+            display_order = None
+
+        if display_order is not None:
+            db_thread_action.display_order = display_order
+            display_orders = [ThreadActionOrder(id=thread_action_id, display_order=display_order)]
+        else:
+            display_orders = self._renumber_thread_actions(
+                thread_id, 
+                thread_action_id=thread_action_id, 
+                after_thread_action_id=after_thread_action_id
+            )
+        self._bump_thread_version(thread_id)
+        self._commit()
+        return display_orders
+
+    def _renumber_thread_actions(
+        self,
+        thread_id:int,
+        *,
+        thread_action_id:int,
+        after_thread_action_id:Optional[int]
+    ) -> List[ThreadActionOrder]:
+        # spread display_order of all thread actions by DISPLAY_ORDER_GAP, and put thread_action_id
+        # right after after_thread_action_id (or at the top), caller commits
+        db_thread_actions = [
+            db_thread_action for db_thread_action in self.session.scalars(
+                select(DBThreadAction)\
+                    .where(DBThreadAction.thread_id == thread_id)\
+                    .order_by(DBThreadAction.display_order)
+            ) if db_thread_action.id != thread_action_id
+        ]
+        if after_thread_action_id is None:
+            position = 0
+        else:
+            position = [db_thread_action.id for db_thread_action in db_thread_actions].index(after_thread_action_id) + 1
+        db_thread_actions.insert(position, self.session.get(DBThreadAction, thread_action_id))
+
+        display_orders = []
+        for i, db_thread_action in enumerate(db_thread_actions):
+            display_order = (i + 1) * DISPLAY_ORDER_GAP
+            if db_thread_action.display_order != display_order:
+                db_thread_action.display_order = display_order
+                display_orders.append(ThreadActionOrder(id=db_thread_action.id, display_order=display_order))
+        return display_orders
+
+    def move_thread_action_up(self, thread_action_id:int, *, user:User) -> ThreadAction:
+        """Move an action up inside a thread.
+        """
+        self.move_thread_action(thread_action_id, user=user, direction="up")
+        return self.get_thread_action(thread_action_id, user=user)
+
+    def move_thread_action_down(self, thread_action_id:int, *, user:User) -> ThreadAction:
+        """Move an action down inside a thread.
+        """
+        self.move_thread_action(thread_action_id, user=user, direction="down")
+        return self.get_thread_action(thread_action_id, user=user)
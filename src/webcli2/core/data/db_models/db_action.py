@@ -29,7 +29,7 @@ class DBAction(DBModelBase):
     id: Mapped[int] = mapped_column("id", Integer, Identity(start=1), primary_key=True)
 
     # user who created this action
-    user_id:  Mapped[int] = mapped_column(ForeignKey("DBUser.id"))
+    user_id:  Mapped[int] = mapped_column(ForeignKey("DBUser.id"), index=True)
     user:     Mapped[db_user.DBUser] = relationship(foreign_keys=[user_id])
 
     # what is the name of the action handler that handles this action?
@@ -27,6 +27,16 @@ class DBActionResponseChunk(DBModelBase):
     text_content: Mapped[Optional[str]] = mapped_column("text_content", Text, nullable=True)
     binary_content: Mapped[Optional[bytes]] = mapped_column("binary_content", LargeBinary, nullable=True)
 
+    # a large text_content is stored compressed here and text_content is NULL, compression tells
+    # how it is compressed, see webcli2/core/data/compression.py
+    compression: Mapped[Optional[str]] = mapped_column("compression", String, nullable=True)
+    compressed_content: Mapped[Optional[bytes]] = mapped_column("compressed_content", LargeBinary, nullable=True)
+    # size of text_content in bytes of UTF-8, before compression
+    content_size: Mapped[Optional[int]] = mapped_column("content_size", Integer, nullable=True)
+
+    # text_content rendered on server side (e.g. markdown to HTML), client shows it as is
+    rendered_content: Mapped[Optional[str]] = mapped_column("rendered_content", Text, nullable=True)
+
     __table_args__ = (
         UniqueConstraint('action_id', 'order', name='action_handler_user'),
     )
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from sqlalchemy import Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ._common import DBModelBase
+
+#############################################################################
+# Represent the database schema version
+# ---------------------------------------------------------------------------
+# It has one row, see webcli2/core/data/migrations.py
+#############################################################################
+class DBSchemaVersion(DBModelBase):
+    """
+    Represent the schema version of the database
+    """
+    __tablename__ = 'DBSchemaVersion'
+
+    id: Mapped[int] = mapped_column("id", Integer, primary_key=True)
+
+    # number of migrations applied to the database
+    version: Mapped[int] = mapped_column("version", Integer)
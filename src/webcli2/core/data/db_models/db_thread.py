@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from typing import Optional
 from datetime import datetime
 from sqlalchemy import Integer, Identity, String, DateTime, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -17,7 +18,7 @@ class DBThread(DBModelBase):
     id: Mapped[int] = mapped_column("id", Integer, Identity(start=1), primary_key=True)
 
     # user who created this action
-    user_id:  Mapped[int] = mapped_column(ForeignKey("DBUser.id"))
+    user_id:  Mapped[int] = mapped_column(ForeignKey("DBUser.id"), index=True)
     user:     Mapped[db_user.DBUser] = relationship(foreign_keys=[user_id])
 
     # when the thread is created
@@ -26,3 +27,15 @@ class DBThread(DBModelBase):
     title: Mapped[str] = mapped_column("title", String)
     description: Mapped[str] = mapped_column("description", String)
 
+    # bumped whenever the thread or anything shown in it (thread actions, actions and their
+    # responses) changes, used as ETag so client can skip reloading an unchanged thread
+    version: Mapped[int] = mapped_column("version", Integer, default=0, server_default="0")
+
+    # set when the thread actions, and actions only in this thread, are moved to an archive file,
+    # see webcli2/core/data/archive.py
+    archived_at: Mapped[Optional[datetime]] = mapped_column("archived_at", DateTime, nullable=True)
+
+    # number of actions and last activity time of the thread when it is archived, its thread
+    # actions are in the archive file so they cannot be counted, see DataAccessor.list_threads
+    archived_action_count: Mapped[Optional[int]] = mapped_column("archived_action_count", Integer, nullable=True)
+    archived_last_activity_at: Mapped[Optional[datetime]] = mapped_column("archived_last_activity_at", DateTime, nullable=True)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import Integer, Identity, Boolean, ForeignKey, UniqueConstraint
+from sqlalchemy import Integer, Identity, Boolean, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ._common import DBModelBase
@@ -15,7 +15,7 @@ class DBThreadAction(DBModelBase):
     id: Mapped[int] = mapped_column("id", Integer, Identity(start=1), primary_key=True)
 
     thread_id:  Mapped[int] = mapped_column(ForeignKey("DBThread.id"))
-    action_id:  Mapped[int] = mapped_column(ForeignKey("DBAction.id"))
+    action_id:  Mapped[int] = mapped_column(ForeignKey("DBAction.id"), index=True)
     action:     Mapped[db_action.DBAction] = relationship(foreign_keys=[action_id])
 
     # within the thread, the display order of this action
@@ -26,4 +26,6 @@ class DBThreadAction(DBModelBase):
 
     __table_args__ = (
         UniqueConstraint('thread_id', 'action_id', name='threadaction_thread_id_action_id'),
+        # load a thread's actions in order, find the neighbour when moving an action
+        Index('ix_DBThreadAction_thread_id_display_order', 'thread_id', 'display_order'),
     )
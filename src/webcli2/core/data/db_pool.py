@@ -0,0 +1,132 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import Optional
+import threading
+import time
+
+from sqlalchemy import create_engine, make_url, event, Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# besides the action handler threads, web requests and websocket handlers use the DB too
+DB_POOL_REQUEST_CONNECTIONS = 4
+DB_POOL_MAX_OVERFLOW = 10
+
+#############################################################################
+# Connection pool with statistics
+# ---------------------------------------------------------------------------
+# Action handlers run in the service's thread pool, each of them may hold a
+# connection while a web request needs one too. The pool is sized by the
+# executor's max_workers unless pool_size is configured, so the executor
+# alone cannot exhaust it. A checkout that had to wait for a connection to
+# be returned is counted, so /apis/metrics shows when the pool is too small.
+#
+# We only use public APIs of QueuePool: connect() is wrapped to time the
+# checkout and count timeouts, the "checkout" pool event counts checkouts.
+#############################################################################
+class MonitoredQueuePool(QueuePool):
+    max_overflow: int   # QueuePool does not tell it
+    stats_lock: threading.Lock
+    checkouts: int      # number of connections checked out
+    waits: int          # number of checkouts that waited for a connection
+    wait_time: float    # total time spent waiting, in seconds
+    timeouts: int       # number of checkouts that gave up after pool_timeout
+
+    def __init__(self, *args, max_overflow:int=10, **kwargs):
+        super().__init__(*args, max_overflow=max_overflow, **kwargs)
+        self.max_overflow = max_overflow
+        self.stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+
+    def connect(self):
+        # no idle connection and no room to open a new one, we have to wait for a checkin
+        must_wait = self.checkedin() == 0 and self.max_overflow > -1 and self.overflow() >= self.max_overflow
+        _checkout_local.checkout = (self, must_wait, time.monotonic())
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            with self.stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            _checkout_local.checkout = None
+
+    def _record_checkout(self, must_wait:bool, start_time:float):
+        duration = time.monotonic() - start_time
+        with self.stats_lock:
+            self.checkouts += 1
+            if must_wait:
+                self.waits += 1
+                self.wait_time += duration
+
+    def get_stats(self) -> dict:
+        with self.stats_lock:
+            return {
+                "pool_size": self.size(),
+                "max_overflow": self.max_overflow,
+                "checked_out": self.checkedout(),
+                "checked_in": self.checkedin(),
+                "overflow": max(self.overflow(), 0),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_time": self.wait_time,
+                "timeouts": self.timeouts,
+            }
+
+# (pool, must_wait, start time) of the checkout in progress in this thread, set by MonitoredQueuePool.connect
+_checkout_local = threading.local()
+
+# listen on the class, a pool created by recreate() (e.g. engine.dispose()) copies listeners of the old pool,
+# a listener bound to a pool would keep counting for the old one
+@event.listens_for(MonitoredQueuePool, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    checkout = getattr(_checkout_local, "checkout", None)
+    if checkout is not None:
+        pool, must_wait, start_time = checkout
+        pool._record_checkout(must_wait, start_time)
+
+
+def get_default_pool_size(executor_max_workers:int) -> int:
+    return executor_max_workers + DB_POOL_REQUEST_CONNECTIONS
+
+def create_db_engine(
+    db_url:str,
+    *,
+    executor_max_workers:int,
+    pool_size:Optional[int]=None,
+    max_overflow:Optional[int]=None,
+    pool_timeout:Optional[float]=None,
+    pool_recycle:Optional[int]=None,
+    pool_pre_ping:bool=False
+) -> Engine:
+    """Create SQLAlchemy engine, pool_size defaults to executor_max_workers + DB_POOL_REQUEST_CONNECTIONS.
+    """
+    url = make_url(db_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # in memory sqlite database lives in one connection, it cannot be pooled
+        return create_engine(url)
+
+    kwargs = {
+        "poolclass": MonitoredQueuePool,
+        "pool_size": get_default_pool_size(executor_max_workers) if pool_size is None else pool_size,
+        "max_overflow": DB_POOL_MAX_OVERFLOW if max_overflow is None else max_overflow,
+        "pool_pre_ping": pool_pre_ping,
+    }
+    if pool_timeout is not None:
+        kwargs["pool_timeout"] = pool_timeout
+    if pool_recycle is not None:
+        kwargs["pool_recycle"] = pool_recycle
+    logger.info(f"create_db_engine: pool_size={kwargs['pool_size']}, max_overflow={kwargs['max_overflow']}")
+    return create_engine(url, **kwargs)
+
+def get_db_pool_stats(db_engine:Engine) -> dict:
+    """Get connection pool statistics of the engine.
+    """
+    pool = db_engine.pool
+    if isinstance(pool, MonitoredQueuePool):
+        return pool.get_stats()
+    return {"status": pool.status()}
@@ -0,0 +1,162 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import Engine, Connection, Table, DateTime, Integer, String, LargeBinary, inspect, select, delete, text
+
+from .db_models import DBModelBase, DBSchemaVersion, DBThread, DBAction, DBThreadAction, DBActionResponseChunk
+from .search import is_search_supported, create_search_index, drop_response_chunk_search_index, index_response_chunks
+from .compression import decompress_text
+
+#############################################################################
+# Database schema migrations
+# ---------------------------------------------------------------------------
+# create_all_tables only creates missing tables, it cannot change a table in
+# an existing database. Schema version of a database is the number of
+# migrations applied to it, it is stored in DBSchemaVersion, a database
+# created before we track the schema version is at version 0.
+#
+# To change the schema, change db_models, then append a migration below that
+# brings a database of the previous version to the new schema. A database
+# created by init-db already has the latest schema and is stamped with
+# LATEST_SCHEMA_VERSION. "webcli migrate" applies the missing migrations.
+#
+# Migrations may see a database that already has the change (e.g. it was
+# created by init-db between the schema change and this migration), so they
+# check before changing anything.
+#############################################################################
+
+def _add_column(connection:Connection, table_name:str, column_name:str, column_ddl:str):
+    column_names = [column["name"] for column in inspect(connection).get_columns(table_name)]
+    if column_name in column_names:
+        return
+    connection.execute(text(f'ALTER TABLE "{table_name}" ADD COLUMN "{column_name}" {column_ddl}'))
+
+def _create_indexes(connection:Connection, table:Table):
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+
+def _add_thread_version(connection:Connection):
+    _add_column(connection, "DBThread", "version", "INTEGER NOT NULL DEFAULT 0")
+
+def _add_rendered_content(connection:Connection):
+    _add_column(connection, "DBActionResponseChunk", "rendered_content", "TEXT")
+
+def _add_thread_archived_at(connection:Connection):
+    _add_column(connection, "DBThread", "archived_at", DateTime().compile(dialect=connection.dialect))
+
+def _add_thread_archive_summary(connection:Connection):
+    _add_column(connection, "DBThread", "archived_action_count", Integer().compile(dialect=connection.dialect))
+    _add_column(connection, "DBThread", "archived_last_activity_at", DateTime().compile(dialect=connection.dialect))
+
+def _add_chunk_compression(connection:Connection):
+    for column_name, column_type in (
+        ("compression", String()),
+        ("compressed_content", LargeBinary()),
+        ("content_size", Integer())
+    ):
+        _add_column(connection, "DBActionResponseChunk", column_name, column_type.compile(dialect=connection.dialect))
+
+def _fill_chunk_content_size(connection:Connection):
+    # content_size tells if a chunk needs a preview, fill it for text chunks written before it exists
+    if connection.dialect.name == "sqlite":
+        size_expr = "length(CAST(text_content AS BLOB))"
+    else:
+        size_expr = "octet_length(text_content)"
+    connection.execute(text(
+        f'UPDATE "DBActionResponseChunk" SET content_size = {size_expr} '
+        'WHERE content_size IS NULL AND text_content IS NOT NULL'
+    ))
+
+def _index_compressed_chunks(connection:Connection):
+    # the search index of response chunks only had text_content, compressed chunks were not searchable
+    drop_response_chunk_search_index(connection)
+    create_search_index(connection)
+    if not is_search_supported(connection):
+        return
+    chunk_ids = list(connection.scalars(
+        select(DBActionResponseChunk.id).where(DBActionResponseChunk.compression.is_not(None)).order_by(DBActionResponseChunk.id)
+    ))
+    batch_size = 100
+    for i in range(0, len(chunk_ids), batch_size):
+        rows = connection.execute(
+            select(DBActionResponseChunk.id, DBActionResponseChunk.compression, DBActionResponseChunk.compressed_content)\
+                .where(DBActionResponseChunk.id.in_(chunk_ids[i:i + batch_size]))
+        )
+        index_response_chunks(connection, [
+            (row.id, decompress_text(row.compression, row.compressed_content)) for row in rows
+        ])
+
+def _add_secondary_indexes(connection:Connection):
+    for db_model in (DBThread, DBAction, DBThreadAction):
+        _create_indexes(connection, db_model.__table__)
+
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("add DBThread.version", _add_thread_version),
+    ("add DBActionResponseChunk.rendered_content", _add_rendered_content),
+    ("add secondary indexes", _add_secondary_indexes),
+    ("add full-text search index", create_search_index),
+    ("add DBThread.archived_at", _add_thread_archived_at),
+    ("add DBActionResponseChunk compression", _add_chunk_compression),
+    ("fill DBActionResponseChunk.content_size", _fill_chunk_content_size),
+    ("add DBThread archive summary", _add_thread_archive_summary),
+    ("index compressed DBActionResponseChunk", _index_compressed_chunks),
+]
+LATEST_SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(connection:Connection) -> Optional[int]:
+    """Get schema version of the database.
+
+    Returns:
+        None if the database is not initialized.
+    """
+    inspector = inspect(connection)
+    if not inspector.has_table(DBThread.__tablename__):
+        return None
+    if not inspector.has_table(DBSchemaVersion.__tablename__):
+        return 0
+    version = connection.scalar(select(DBSchemaVersion.version))
+    return 0 if version is None else version
+
+def _set_schema_version(connection:Connection, version:int):
+    connection.execute(delete(DBSchemaVersion))
+    connection.execute(DBSchemaVersion.__table__.insert().values(id=1, version=version))
+
+def create_all_tables(engine:Engine):
+    """Create all tables for a new database, a new database is stamped with the latest schema version.
+
+    Tables of an existing database are not changed, use migrate for it.
+    """
+    with engine.begin() as connection:
+        schema_version = get_schema_version(connection)
+        DBModelBase.metadata.create_all(connection)
+        if schema_version is None:
+            # the search index is not a table of db_models
+            create_search_index(connection)
+            _set_schema_version(connection, LATEST_SCHEMA_VERSION)
+
+def migrate(engine:Engine) -> List[str]:
+    """Bring the database to the latest schema version.
+
+    Returns:
+        Names of the migrations applied.
+    """
+    log_prefix = "migrate"
+    with engine.begin() as connection:
+        schema_version = get_schema_version(connection)
+    if schema_version is None:
+        create_all_tables(engine)
+        return []
+
+    applied_migrations = []
+    for version in range(schema_version, LATEST_SCHEMA_VERSION):
+        name, migration = MIGRATIONS[version]
+        logger.info(f"{log_prefix}: migrate database from version {version} to {version + 1}: {name}")
+        # one transaction per migration, so a failed migration can be fixed and re-run
+        with engine.begin() as connection:
+            DBModelBase.metadata.create_all(connection, tables=[DBSchemaVersion.__table__])
+            migration(connection)
+            _set_schema_version(connection, version + 1)
+        applied_migrations.append(name)
+    return applied_migrations
@@ -1,7 +1,8 @@
 from .user import User
-from .action import Action
-from .thread_action import ThreadAction
+from .action import Action, ActionSummary
+from .thread_action import ThreadAction, ThreadActionSummary, ThreadActionOrder
 from .thread import Thread, ThreadSummary
 from .action_response_chunk import ActionResponseChunk
+from .search_hit import SearchHit
 # from .action_handler_configuration import ActionHandlerConfiguration
 # from .jwt_token_payload import JWTTokenPayload
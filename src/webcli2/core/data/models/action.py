@@ -9,11 +9,9 @@ from .action_response_chunk import ActionResponseChunk
 from .user import User
 
 #############################################################################
-# Represent an action
-# ---------------------------------------------------------------------------
-# It wraps the DB layer action
+# Fields of an action row, shared by Action and ActionSummary
 #############################################################################
-class Action(BaseModel):
+class ActionBase(BaseModel):
     id: int
     user: User
     handler_name: str
@@ -23,12 +21,10 @@ class Action(BaseModel):
     request: dict
     title: str
     raw_text: str
-    response_chunks: List[ActionResponseChunk] = []
-
 
     @classmethod
-    def from_db(cls, db_action:DBAction) -> "Action":
-        return Action(
+    def _get_fields_from_db(cls, db_action:DBAction) -> dict:
+        return dict(
             id = db_action.id,
             user = User.from_db(db_action.user),
             handler_name = db_action.handler_name,
@@ -37,6 +33,28 @@ class Action(BaseModel):
             completed_at = db_action.completed_at,
             request = db_action.request,
             title = db_action.title,
-            raw_text = db_action.raw_text,
-            response_chunks = []
+            raw_text = db_action.raw_text
         )
+
+#############################################################################
+# Represent an action
+# ---------------------------------------------------------------------------
+# It wraps the DB layer action
+#############################################################################
+class Action(ActionBase):
+    response_chunks: List[ActionResponseChunk] = []
+
+    @classmethod
+    def from_db(cls, db_action:DBAction) -> "Action":
+        return Action(**cls._get_fields_from_db(db_action), response_chunks = [])
+
+#############################################################################
+# An action without response chunks
+# ---------------------------------------------------------------------------
+# Returned by writes that only need the action row, so they do not load
+# every response chunk (which may have large binary content)
+#############################################################################
+class ActionSummary(ActionBase):
+    @classmethod
+    def from_db(cls, db_action:DBAction) -> "ActionSummary":
+        return ActionSummary(**cls._get_fields_from_db(db_action))
@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import Optional
 from pydantic import BaseModel, Field
 from webcli2.core.data.db_models import DBActionResponseChunk
+from webcli2.core.data.compression import decompress_text, truncate_text
 
 #############################################################################
 # Represent an action
@@ -16,6 +17,9 @@ class ActionResponseChunk(BaseModel):
     mime: str
     text_content: Optional[str] = None
     binary_content: Optional[bytes] = Field(exclude=True, default=None)
+    rendered_content: Optional[str] = None
+    content_size: Optional[int] = None     # size of the full text_content in bytes
+    is_truncated: bool = False              # text_content is a preview, see CHUNK_PREVIEW_SIZE
 
     @classmethod
     def from_db(cls, db_action_response_chunk:DBActionResponseChunk) -> "ActionResponseChunk":
@@ -24,6 +28,22 @@ class ActionResponseChunk(BaseModel):
             action_id = db_action_response_chunk.action_id,
             order = db_action_response_chunk.order,
             mime = db_action_response_chunk.mime,
-            text_content = db_action_response_chunk.text_content,
-            binary_content = db_action_response_chunk.binary_content
+            text_content = db_action_response_chunk.text_content if db_action_response_chunk.compression is None \
+                else decompress_text(db_action_response_chunk.compression, db_action_response_chunk.compressed_content),
+            binary_content = db_action_response_chunk.binary_content,
+            rendered_content = db_action_response_chunk.rendered_content,
+            content_size = db_action_response_chunk.content_size
         )
+
+    def get_preview(self, preview_size:int) -> "ActionResponseChunk":
+        """Get the chunk with text_content truncated to preview_size bytes.
+
+        rendered_content of a truncated chunk is dropped, it is rendered from the full text.
+        """
+        if self.text_content is None or self.content_size is None or self.content_size <= preview_size:
+            return self
+        return self.model_copy(update={
+            "text_content": truncate_text(self.text_content, preview_size),
+            "rendered_content": None,
+            "is_truncated": True
+        })
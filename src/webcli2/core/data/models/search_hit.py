@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from typing import Optional, List
+from datetime import datetime
+
+from pydantic import BaseModel
+
+#############################################################################
+# A full-text search hit
+# ---------------------------------------------------------------------------
+# It is either an action (its title or raw_text matches), or a response
+# chunk of an action (its text_content matches), chunk_id tells which.
+#############################################################################
+class SearchHit(BaseModel):
+    action_id: int
+    chunk_id: Optional[int] = None
+    title: str
+    created_at: datetime
+    snippet: str                    # matched text, matched terms are surrounded by **
+    rank: float                     # smaller is better
+    thread_ids: List[int] = []      # threads that have this action
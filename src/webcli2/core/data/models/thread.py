@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 from pydantic import BaseModel
@@ -13,6 +13,7 @@ class Thread(BaseModel):
     created_at: datetime
     title: str
     description: str
+    version: int = 0
     thread_actions: List[ThreadAction] = []
 
     @classmethod
@@ -23,15 +24,31 @@ class Thread(BaseModel):
             created_at = db_thread.created_at,
             title = db_thread.title,
             description = db_thread.description,
+            version = db_thread.version,
             thread_actions = []
         )
 
+    def get_etag_version(self) -> str:
+        """Version for the ETag of the thread, same as DataAccessor.get_thread_etag_version.
+
+        Appending a response chunk does not bump version, the latest chunk id tells it.
+        """
+        max_chunk_id = max((
+            response_chunk.id
+            for thread_action in self.thread_actions for response_chunk in thread_action.action.response_chunks
+        ), default=0)
+        return f"{self.version}-{max_chunk_id}"
+
 class ThreadSummary(BaseModel):
     id: int
     user: User
     created_at: datetime
     title: str
     description: str
+    version: int = 0
+    action_count: int = 0                       # number of actions in the thread
+    last_activity_at: Optional[datetime] = None # when the latest action is created or completed, or created_at
+    archived_at: Optional[datetime] = None      # set if the thread is archived, it is restored when opened
 
     @classmethod
     def from_db(cls, db_thread:DBThread) -> "ThreadSummary":
@@ -40,5 +57,6 @@ class ThreadSummary(BaseModel):
             user = User.from_db(db_thread.user),
             created_at = db_thread.created_at,
             title = db_thread.title,
-            description = db_thread.description
+            description = db_thread.description,
+            version = db_thread.version
         )
@@ -12,3 +12,30 @@ class ThreadAction(BaseModel):
     show_question: bool
     show_answer: bool
 
+
+class ThreadActionSummary(BaseModel):
+    # a thread action without its action, returned by writes that only need the thread action row
+    id: int
+    thread_id: int
+    action_id: int
+    display_order: int
+    show_question: bool
+    show_answer: bool
+
+    @classmethod
+    def from_db(cls, db_thread_action:DBThreadAction) -> "ThreadActionSummary":
+        return ThreadActionSummary(
+            id = db_thread_action.id,
+            thread_id = db_thread_action.thread_id,
+            action_id = db_thread_action.action_id,
+            display_order = db_thread_action.display_order,
+            show_question = db_thread_action.show_question,
+            show_answer = db_thread_action.show_answer
+        )
+
+
+class ThreadActionOrder(BaseModel):
+    # a thread action's position inside a thread, used to notify client
+    # about re-ordering without sending the whole thread action
+    id: int
+    display_order: int
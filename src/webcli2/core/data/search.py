@@ -0,0 +1,177 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import List, Tuple
+
+from sqlalchemy import Connection, text
+
+#############################################################################
+# Full-text search over actions and response chunks
+# ---------------------------------------------------------------------------
+# Action title, raw_text and response chunk text are indexed.
+#   - SQLite: FTS5 table DBActionSearch uses the DBAction table as external
+#     content, so text is not stored twice, triggers keep it up to date on
+#     insert, update and delete. Text of a large response chunk is stored
+#     compressed (text_content is NULL), so DBActionResponseChunkSearch has
+#     its own content, DataAccessor writes the original text to it with
+#     index_response_chunks, a trigger removes it when the chunk is deleted.
+#   - PostgreSQL: a tsvector column search_vector on both tables, with a GIN
+#     index. It is generated by the database for DBAction, and written by
+#     DataAccessor with index_response_chunks for DBActionResponseChunk.
+#     Snippets come from text_content, compressed chunks have no snippet.
+# Other databases do not support search.
+#############################################################################
+SNIPPET_START = "**"        # a snippet highlights matched terms like markdown bold
+SNIPPET_END = "**"
+SNIPPET_ELLIPSIS = "..."
+SNIPPET_TOKENS = 16         # max number of tokens in a snippet
+
+SQLITE_SEARCH_INDEX_DDLS = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS "DBActionSearch" USING fts5(
+        title, raw_text, content='DBAction', content_rowid='id'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS "DBAction_search_insert" AFTER INSERT ON "DBAction" BEGIN
+        INSERT INTO "DBActionSearch"(rowid, title, raw_text) VALUES (new.id, new.title, new.raw_text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS "DBAction_search_delete" AFTER DELETE ON "DBAction" BEGIN
+        INSERT INTO "DBActionSearch"("DBActionSearch", rowid, title, raw_text) VALUES ('delete', old.id, old.title, old.raw_text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS "DBAction_search_update" AFTER UPDATE OF title, raw_text ON "DBAction" BEGIN
+        INSERT INTO "DBActionSearch"("DBActionSearch", rowid, title, raw_text) VALUES ('delete', old.id, old.title, old.raw_text);
+        INSERT INTO "DBActionSearch"(rowid, title, raw_text) VALUES (new.id, new.title, new.raw_text);
+    END''',
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS "DBActionResponseChunkSearch" USING fts5(text_content)''',
+    '''CREATE TRIGGER IF NOT EXISTS "DBActionResponseChunk_search_delete" AFTER DELETE ON "DBActionResponseChunk" BEGIN
+        DELETE FROM "DBActionResponseChunkSearch" WHERE rowid = old.id;
+    END''',
+]
+
+POSTGRESQL_SEARCH_INDEX_DDLS = [
+    '''ALTER TABLE "DBAction" ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        to_tsvector('english', coalesce(title, '') || ' ' || coalesce(raw_text, ''))
+    ) STORED''',
+    '''CREATE INDEX IF NOT EXISTS "ix_DBAction_search_vector" ON "DBAction" USING GIN (search_vector)''',
+    '''ALTER TABLE "DBActionResponseChunk" ADD COLUMN IF NOT EXISTS search_vector tsvector''',
+    '''CREATE INDEX IF NOT EXISTS "ix_DBActionResponseChunk_search_vector" ON "DBActionResponseChunk" USING GIN (search_vector)''',
+]
+
+def is_search_supported(connection:Connection) -> bool:
+    return connection.dialect.name in ("sqlite", "postgresql")
+
+def create_search_index(connection:Connection):
+    """Create the full-text search index and index existing actions and response chunks, it can be called again.
+
+    Only text_content of response chunks is indexed, caller indexes compressed chunks with index_response_chunks.
+    """
+    dialect_name = connection.dialect.name
+    if dialect_name == "sqlite":
+        for ddl in SQLITE_SEARCH_INDEX_DDLS:
+            connection.exec_driver_sql(ddl)
+        # index rows inserted before the triggers exist
+        connection.exec_driver_sql('INSERT INTO "DBActionSearch"("DBActionSearch") VALUES (\'rebuild\')')
+        connection.exec_driver_sql('DELETE FROM "DBActionResponseChunkSearch"')
+        connection.exec_driver_sql(
+            'INSERT INTO "DBActionResponseChunkSearch"(rowid, text_content) '
+            'SELECT id, text_content FROM "DBActionResponseChunk" WHERE text_content IS NOT NULL'
+        )
+    elif dialect_name == "postgresql":
+        for ddl in POSTGRESQL_SEARCH_INDEX_DDLS:
+            connection.exec_driver_sql(ddl)
+        connection.exec_driver_sql(
+            'UPDATE "DBActionResponseChunk" SET search_vector = to_tsvector(\'english\', text_content) '
+            'WHERE text_content IS NOT NULL'
+        )
+    else:
+        logger.warning(f"create_search_index: full-text search is not supported by {dialect_name}")
+
+def drop_response_chunk_search_index(connection:Connection):
+    """Drop the search index of response chunks, create_search_index creates it again.
+    """
+    dialect_name = connection.dialect.name
+    if dialect_name == "sqlite":
+        for trigger_name in ("insert", "delete", "update"):
+            connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS "DBActionResponseChunk_search_{trigger_name}"')
+        connection.exec_driver_sql('DROP TABLE IF EXISTS "DBActionResponseChunkSearch"')
+    elif dialect_name == "postgresql":
+        # its GIN index is dropped with it
+        connection.exec_driver_sql('ALTER TABLE "DBActionResponseChunk" DROP COLUMN IF EXISTS search_vector')
+
+def index_response_chunks(connection:Connection, chunks:List[Tuple[int, str]]):
+    """Add text of new response chunks to the search index.
+
+    Args:
+        chunks: (chunk id, text) of each chunk, text is the original text even if the chunk is stored compressed.
+    """
+    if len(chunks) == 0:
+        return
+    dialect_name = connection.dialect.name
+    if dialect_name == "sqlite":
+        statement = text('INSERT INTO "DBActionResponseChunkSearch"(rowid, text_content) VALUES (:id, :text_content)')
+    elif dialect_name == "postgresql":
+        statement = text(
+            'UPDATE "DBActionResponseChunk" SET search_vector = to_tsvector(\'english\', :text_content) WHERE id = :id'
+        )
+    else:
+        return
+    connection.execute(statement, [{"id": chunk_id, "text_content": text_content} for chunk_id, text_content in chunks])
+
+def get_sqlite_match_query(query:str) -> str:
+    """Turn user's input into a FTS5 query, every word must match, the last word matches as a prefix.
+
+    User's input is not passed as FTS5 query syntax, so quotes, "-", "OR", etc. do not cause syntax error.
+    """
+    terms: List[str] = [
+        '"' + word.replace('"', '""') + '"' for word in query.split()
+    ]
+    if len(terms) == 0:
+        return ""
+    terms[-1] += "*"
+    return " ".join(terms)
+
+SQLITE_SEARCH_SQL = f'''
+SELECT "DBAction".id AS action_id, NULL AS chunk_id, "DBAction".title AS title, "DBAction".created_at AS created_at,
+    snippet("DBActionSearch", -1, '{SNIPPET_START}', '{SNIPPET_END}', '{SNIPPET_ELLIPSIS}', {SNIPPET_TOKENS}) AS snippet,
+    bm25("DBActionSearch") AS rank
+FROM "DBActionSearch" JOIN "DBAction" ON "DBAction".id = "DBActionSearch".rowid
+WHERE "DBActionSearch" MATCH :query AND "DBAction".user_id = :user_id
+UNION ALL
+SELECT "DBAction".id, "DBActionResponseChunk".id, "DBAction".title, "DBAction".created_at,
+    snippet("DBActionResponseChunkSearch", 0, '{SNIPPET_START}', '{SNIPPET_END}', '{SNIPPET_ELLIPSIS}', {SNIPPET_TOKENS}),
+    bm25("DBActionResponseChunkSearch")
+FROM "DBActionResponseChunkSearch"
+    JOIN "DBActionResponseChunk" ON "DBActionResponseChunk".id = "DBActionResponseChunkSearch".rowid
+    JOIN "DBAction" ON "DBAction".id = "DBActionResponseChunk".action_id
+WHERE "DBActionResponseChunkSearch" MATCH :query AND "DBAction".user_id = :user_id
+ORDER BY rank, action_id, chunk_id
+LIMIT :limit OFFSET :offset
+'''
+
+# rank is negated so a better hit comes first in ascending order, same as bm25 in SQLite
+POSTGRESQL_SEARCH_SQL = f'''
+WITH q AS (SELECT websearch_to_tsquery('english', :query) AS tsquery)
+SELECT "DBAction".id AS action_id, NULL::integer AS chunk_id, "DBAction".title AS title, "DBAction".created_at AS created_at,
+    ts_headline('english', coalesce("DBAction".title, '') || ' ' || coalesce("DBAction".raw_text, ''), q.tsquery,
+        'StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, FragmentDelimiter={SNIPPET_ELLIPSIS}, MaxWords={SNIPPET_TOKENS}, MinWords=1, MaxFragments=1') AS snippet,
+    -ts_rank("DBAction".search_vector, q.tsquery) AS rank
+FROM "DBAction", q
+WHERE "DBAction".search_vector @@ q.tsquery AND "DBAction".user_id = :user_id
+UNION ALL
+SELECT "DBAction".id, "DBActionResponseChunk".id, "DBAction".title, "DBAction".created_at,
+    ts_headline('english', coalesce("DBActionResponseChunk".text_content, ''), q.tsquery,
+        'StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, FragmentDelimiter={SNIPPET_ELLIPSIS}, MaxWords={SNIPPET_TOKENS}, MinWords=1, MaxFragments=1'),
+    -ts_rank("DBActionResponseChunk".search_vector, q.tsquery)
+FROM "DBActionResponseChunk" JOIN "DBAction" ON "DBAction".id = "DBActionResponseChunk".action_id, q
+WHERE "DBActionResponseChunk".search_vector @@ q.tsquery AND "DBAction".user_id = :user_id
+ORDER BY rank, action_id, chunk_id
+LIMIT :limit OFFSET :offset
+'''
+
+def get_search_statement(connection:Connection, query:str):
+    """Get the search statement and the query parameter for the database, None if there is nothing to search.
+    """
+    if connection.dialect.name == "sqlite":
+        match_query = get_sqlite_match_query(query)
+        return (text(SQLITE_SEARCH_SQL), match_query) if match_query else (None, None)
+    if query.strip() == "":
+        return None, None
+    return text(POSTGRESQL_SEARCH_SQL), query
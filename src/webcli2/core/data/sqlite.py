@@ -0,0 +1,156 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
+from concurrent.futures import Future
+from queue import Queue, Empty
+import threading
+
+from sqlalchemy import Engine, event
+from sqlalchemy.orm import Session
+
+T = TypeVar("T")
+
+SQLITE_WRITE_BATCH_SIZE = 100
+_STOP = object()    # put to the queue to stop the writer thread, after the writes queued before it
+
+#############################################################################
+# SQLite production mode
+# ---------------------------------------------------------------------------
+# SQLite allows one writer at a time, when action handler threads append
+# response chunks concurrently, they fail with "database is locked" once
+# one of them waits longer than the busy timeout, or a transaction that
+# read first cannot become a writer since another writer committed.
+#
+# In production mode
+#   - the database uses WAL, so readers do not block the writer and the
+#     writer does not block readers, reads still run in the caller thread
+#   - pragmas are tuned on every new connection
+#   - all writes run in one writer thread (SQLiteWriter), a batch of the
+#     writes queued up is committed in one transaction, each write runs in
+#     its own savepoint, a failed write is rolled back without affecting
+#     others in the batch. Callers get the result after the batch is
+#     committed.
+#############################################################################
+def configure_sqlite_engine(
+    db_engine:Engine,
+    *,
+    synchronous:str="NORMAL",
+    cache_size:int=-65536,
+    mmap_size:int=268435456,
+    busy_timeout:int=5000
+):
+    """Enable WAL and set pragmas for every new connection of a SQLite engine.
+    """
+    @event.listens_for(db_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        # pysqlite begins transactions by itself and does not support SAVEPOINT well,
+        # we take it over and emit BEGIN in on_begin
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+            cursor.execute(f"PRAGMA cache_size={int(cache_size)}")
+            cursor.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+            cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        finally:
+            cursor.close()
+
+    @event.listens_for(db_engine, "begin")
+    def on_begin(connection):
+        # the writer takes the write lock up front, so it waits for writers in other
+        # processes (webcli start --workers N) instead of failing when it starts to write
+        if connection.get_execution_options().get("sqlite_begin_immediate"):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            connection.exec_driver_sql("BEGIN")
+
+
+class SQLiteWriter:
+    db_engine: Engine
+    batch_size: int
+    queue: "Queue[Tuple[Callable[[Session], Any], Future]]"
+    writer_thread: Optional[threading.Thread]
+
+    def __init__(self, db_engine:Engine, *, batch_size:int=SQLITE_WRITE_BATCH_SIZE):
+        self.db_engine = db_engine
+        self.batch_size = batch_size
+        self.queue = Queue()
+        self.writer_thread = None
+
+    def startup(self):
+        self.writer_thread = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+        self.writer_thread.start()
+
+    def shutdown(self):
+        # pending writes are still committed
+        self.queue.put(_STOP)
+        if self.writer_thread is not None:
+            self.writer_thread.join()
+
+    def execute(self, write:Callable[[Session], T]) -> T:
+        """Run write(session) in the writer thread and wait for it to be committed, returns what write returns.
+
+        write may call session.commit(), it only commits its savepoint, write must not hold on to the session.
+        """
+        if threading.current_thread() is self.writer_thread:
+            # it would wait for the batch it is in forever
+            raise RuntimeError("SQLiteWriter.execute cannot be called by a write")
+        future = Future()
+        self.queue.put((write, future))
+        return future.result()
+
+    def _write_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            # take whatever is queued up, we do not wait for more
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write_batch(batch)
+            if stopping:
+                return
+
+    def _write_batch(self, batch:List[Tuple[Callable[[Session], Any], Future]]):
+        log_prefix = "SQLiteWriter._write_batch"
+        results = []
+        try:
+            with self.db_engine.connect().execution_options(sqlite_begin_immediate=True) as connection:
+                connection.begin()
+                for write, future in batch:
+                    # session.commit() inside write only releases a savepoint inside write_savepoint,
+                    # if write fails, everything it did is rolled back
+                    write_savepoint = connection.begin_nested()
+                    try:
+                        with Session(bind=connection, join_transaction_mode="create_savepoint") as session:
+                            result = write(session)
+                    except Exception as e:
+                        write_savepoint.rollback()
+                        results.append((future, None, e))
+                        continue
+                    write_savepoint.commit()
+                    results.append((future, result, None))
+                connection.commit()
+        except Exception as e:
+            logger.exception(f"{log_prefix}: failed to commit {len(batch)} writes")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for future, result, exception in results:
+            if exception is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exception)
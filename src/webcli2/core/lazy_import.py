@@ -0,0 +1,33 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from types import ModuleType
+import importlib.util
+import sys
+
+#############################################################################
+# Import a module only when one of its attributes is used the first time
+# ---------------------------------------------------------------------------
+# Some packages (e.g. bcrypt, jwt) are only needed by a few code paths, we do
+# not want every CLI command and unit test pay the import time for them.
+# The returned module object can be used (and patched) like a normal module.
+#############################################################################
+def lazy_import(name:str) -> ModuleType:
+    """Returns a module which is loaded on first attribute access.
+
+    Raises:
+        ModuleNotFoundError: if the module does not exist
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,110 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import Dict, List, Optional, Set
+from collections import OrderedDict
+import threading
+
+#############################################################################
+# Cache of "which threads reference this action"
+# ---------------------------------------------------------------------------
+# Every response chunk of an action is published to all threads that has the
+# action, so we look it up on every chunk. This index is maintained by the
+# service when it adds/removes actions to/from threads, on a miss the caller
+# load it from DB and call set.
+#
+# It is accessed from both the event loop and the executor threads.
+#############################################################################
+class ActionThreadIndex:
+    lock: threading.Lock
+    max_size: int
+    generation: int                             # bumped on every change
+    action_threads: "OrderedDict[int, Set[int]]" # key is action id, LRU order
+    thread_actions: Dict[int, Set[int]]          # key is thread id, only for cached actions
+
+    def __init__(self, max_size:int=10000):
+        self.lock = threading.Lock()
+        self.max_size = max_size
+        self.generation = 0
+        self.action_threads = OrderedDict()
+        self.thread_actions = {}
+
+    def get_generation(self) -> int:
+        with self.lock:
+            return self.generation
+
+    def get(self, action_id:int) -> Optional[List[int]]:
+        """Returns thread ids for the action, or None if the action is not cached.
+        """
+        with self.lock:
+            thread_ids = self.action_threads.get(action_id)
+            if thread_ids is None:
+                return None
+            self.action_threads.move_to_end(action_id)
+            return list(thread_ids)
+
+    def set(self, action_id:int, thread_ids:List[int], *, generation:Optional[int]=None):
+        """Cache thread ids for an action.
+        If generation is given and the index has been changed since then, the thread_ids
+        may be stale (e.g. loaded from DB while another thread adding the action to a thread),
+        we ignore it and let the next lookup load it again.
+        """
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._discard(action_id)
+            self.action_threads[action_id] = set(thread_ids)
+            for thread_id in thread_ids:
+                self.thread_actions.setdefault(thread_id, set()).add(action_id)
+            while len(self.action_threads) > self.max_size:
+                self._discard(next(iter(self.action_threads)))
+
+    def add(self, action_id:int, thread_id:int):
+        """An action is added to a thread.
+        """
+        with self.lock:
+            self.generation += 1
+            thread_ids = self.action_threads.get(action_id)
+            if thread_ids is None:
+                # we do not know other threads of this action, leave it to next lookup
+                return
+            thread_ids.add(thread_id)
+            self.thread_actions.setdefault(thread_id, set()).add(action_id)
+
+    def remove(self, action_id:int, thread_id:int):
+        """An action is removed from a thread.
+        """
+        with self.lock:
+            self.generation += 1
+            thread_ids = self.action_threads.get(action_id)
+            if thread_ids is not None:
+                thread_ids.discard(thread_id)
+            action_ids = self.thread_actions.get(thread_id)
+            if action_ids is not None:
+                action_ids.discard(action_id)
+                if len(action_ids) == 0:
+                    self.thread_actions.pop(thread_id)
+
+    def remove_thread(self, thread_id:int):
+        """A thread is deleted.
+        """
+        with self.lock:
+            self.generation += 1
+            for action_id in self.thread_actions.pop(thread_id, set()):
+                thread_ids = self.action_threads.get(action_id)
+                if thread_ids is not None:
+                    thread_ids.discard(thread_id)
+
+    def discard(self, action_id:int):
+        """Forget an action, e.g. it is completed and won't produce response any more.
+        """
+        with self.lock:
+            self._discard(action_id)
+
+    def _discard(self, action_id:int):
+        for thread_id in self.action_threads.pop(action_id, set()):
+            action_ids = self.thread_actions.get(thread_id)
+            if action_ids is not None:
+                action_ids.discard(action_id)
+                if len(action_ids) == 0:
+                    self.thread_actions.pop(thread_id)
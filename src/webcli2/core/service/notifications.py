@@ -1,9 +1,10 @@
 import logging
 logger = logging.getLogger(__name__)
 
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, FrozenSet, Optional
 
 import asyncio
+import threading
 
 async def pop_notification(q:asyncio.Queue, timeout:float):
     try:
@@ -12,6 +13,9 @@ async def pop_notification(q:asyncio.Queue, timeout:float):
         r = None
     return r
 
+# put to a subscriber's queue when it unsubscribes, the reader stops after it
+SUBSCRIPTION_CLOSED = object()
+
 class Notification:
     topic_name:str
     event: Any
@@ -26,13 +30,63 @@ class TopicInfo:
     def __init__(self):
         self.subscribers = {}
 
+class NotificationCounters:
+    # How many events are published or skipped since no one subscribes
+    # updated from many threads
+    lock: threading.Lock
+    published: int
+    skipped: int
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.published = 0
+        self.skipped = 0
+
+    def add_published(self):
+        with self.lock:
+            self.published += 1
+
+    def add_skipped(self):
+        with self.lock:
+            self.skipped += 1
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "published": self.published,
+                "skipped": self.skipped
+            }
+
 class NotificationManager:
     lock: asyncio.Lock
     topics: Dict[str, TopicInfo]
+    active_topics: FrozenSet[str]   # snapshot of topics that have subscribers, can be read from any thread
+    # called with the new active_topics when a topic gets its first subscriber or loses its last one
+    on_active_topics_changed: Optional[Callable[[FrozenSet[str]], None]]
 
     def __init__(self):
         self.lock = asyncio.Lock()
         self.topics = {}
+        self.active_topics = frozenset()
+        self.on_active_topics_changed = None
+
+    def _set_active_topics(self):
+        self.active_topics = frozenset(self.topics.keys())
+        if self.on_active_topics_changed is not None:
+            try:
+                self.on_active_topics_changed(self.active_topics)
+            except Exception:
+                logger.exception("NotificationManager._set_active_topics: on_active_topics_changed failed")
+
+    def has_subscribers(self, topic_name:str) -> bool:
+        """Is anyone subscribed to this topic? Safe to call from any thread.
+        """
+        return topic_name in self.active_topics
+
+    def has_any_subscribers(self) -> bool:
+        """Is anyone subscribed to any topic? Safe to call from any thread.
+        """
+        return len(self.active_topics) > 0
 
     async def subscribe(self, topic_name:str, client_id:str) -> asyncio.Queue:
         log_prefix = "NotificationManager.subscribe"
@@ -43,6 +97,7 @@ class NotificationManager:
             if topic_name not in self.topics:
                 topic_info = TopicInfo()
                 self.topics[topic_name] = topic_info
+                self._set_active_topics()
             
             if client_id not in topic_info.subscribers:
                 q = asyncio.Queue()
@@ -64,10 +119,11 @@ class NotificationManager:
                 return
             
             q = topic_info.subscribers.pop(client_id)
-            q.shutdown()
+            q.put_nowait(SUBSCRIPTION_CLOSED)
 
             if len(topic_info.subscribers) == 0:
                 self.topics.pop(topic_name)
+                self._set_active_topics()
                 logger.debug(f"{log_prefix}: empty topic({topic_name}) is removed")
 
 
@@ -101,7 +157,7 @@ class NotificationManager:
 
                     if topic_name not in self.topics:
                         logger.debug(f"{log_prefix}: topic({topic_name}) does not exist, cannot publish nitification to it")
-                        return
+                        continue
                     
                     topic_info = self.topics[topic_name]
                     
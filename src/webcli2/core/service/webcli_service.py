@@ -3,28 +3,56 @@ from __future__ import annotations  # Enables forward declaration
 import logging
 logger = logging.getLogger(__name__)
 
-from typing import Optional, List, Dict, Any
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, Union, Callable, TypeVar, FrozenSet
 import uuid
-from concurrent.futures import ThreadPoolExecutor
-from asyncio import get_event_loop, AbstractEventLoop, run_coroutine_threadsafe
+from concurrent.futures import ThreadPoolExecutor, Future
+import asyncio
+from asyncio import AbstractEventLoop, run_coroutine_threadsafe
 from copy import copy
+from datetime import datetime
 import json
-import time
 import os
+import threading
+import time
 
 from sqlalchemy.orm import Session
-import bcrypt
-import jwt
 from pydantic import BaseModel, ValidationError
 from sqlalchemy import Engine
-from fastapi import WebSocket, WebSocketDisconnect
 
-from webcli2.core.data import User, Thread, Action, DataAccessor, ThreadAction, ActionResponseChunk, create_all_tables as cat
+from webcli2.core.data import User, Thread, ThreadSummary, ThreadSortKey, Action, ActionSummary, DataAccessor, \
+    ThreadAction, ThreadActionOrder, ActionResponseChunk, SearchHit, ThreadArchived, create_all_tables as cat, migrate
+from webcli2.core.data.archive import write_thread_archive, read_thread_archive, remove_thread_archive
+from webcli2.core.data.compression import CHUNK_PREVIEW_SIZE
 import webcli2.action_handlers.action_handler as action_handler
+from webcli2.core.data.db_pool import get_db_pool_stats
+from webcli2.core.data.sqlite import SQLiteWriter
 from webcli2.core.types import PatchValue
-from .notifications import NotificationManager, pop_notification, Notification
+from webcli2.core.lazy_import import lazy_import
+from .notifications import NotificationManager, Notification, NotificationCounters, SUBSCRIPTION_CLOSED
+from .action_thread_index import ActionThreadIndex
+from .worker_bus import WorkerBus
+
+if TYPE_CHECKING:
+    from fastapi import WebSocket
+
+T = TypeVar("T")
+
+# Only needed when user login or create user, CLI commands and unit tests do not need to pay for them
+bcrypt = lazy_import("bcrypt")
+jwt = lazy_import("jwt")
+
+WEB_SOCKET_PING_INTERVAL = 20       # in seconds
+WEB_SOCKET_MAX_BATCH_SIZE = 100     # max number of events we send to client in one frame
+WEB_SOCKET_BATCH_WINDOW = 0.005     # in seconds, how long we wait for more events before sending a frame
+
+def get_default_executor_max_workers() -> int:
+    # same as ThreadPoolExecutor's default
+    return min(32, (os.cpu_count() or 1) + 4)
 
-WEB_SOCKET_PING_INTERVAL = 20  # in seconds
+# action handler health state
+ACTION_HANDLER_STARTING = "starting"
+ACTION_HANDLER_RUNNING  = "running"
+ACTION_HANDLER_FAILED   = "failed"
 
 class ServiceError(Exception):
     pass
@@ -75,11 +103,20 @@ class WebCLIService:
     private_key:str                                 # for JWT
     users_home_dir: str                             # The parent directory for all user's home dir
     resource_dir:str                                # The directory to store all binary_output for action response chunks
+    archive_dir: Optional[str]                      # The directory to store archive files of threads, see archive.py
     db_engine: Engine                               # SQLAlchemy engine
+    db_writer: Optional[SQLiteWriter]               # SQLite production mode, all writes run in its thread
     executor: Optional[ThreadPoolExecutor]          # A thread pool
+    executor_max_workers: int                       # DB connection pool is sized by it, see db_pool.py
     event_loop: Optional[AbstractEventLoop]         # The current main loop
     action_handlers: Dict[str, action_handler.ActionHandler]
+    action_handler_index: Dict[str, List[str]]      # request type -> names of action handler that handles it
+    generic_action_handler_names: List[str]         # action handlers that do not declare request_types
+    action_handler_states: Dict[str, dict]          # health state of each action handler
+    action_handler_startups: Dict[str, Future]      # startup of each action handler, running in thread pool
     nm: NotificationManager
+    notification_counters: NotificationCounters
+    action_thread_index: ActionThreadIndex          # which threads reference an action, for routing events
 
     def __init__(
         self, 
@@ -89,45 +126,103 @@ class WebCLIService:
         public_key:str, 
         private_key:str, 
         db_engine:Engine,
-        action_handlers:Dict[str, action_handler.ActionHandler]           
+        action_handlers:Dict[str, action_handler.ActionHandler],
+        executor_max_workers:Optional[int]=None,
+        db_writer:Optional[SQLiteWriter]=None,
+        worker_bus:Optional[WorkerBus]=None,
+        archive_dir:Optional[str]=None
     ):
         self.public_key = public_key
         self.private_key = private_key
         self.users_home_dir = users_home_dir
         self.resource_dir = resource_dir
+        self.archive_dir = archive_dir
         self.db_engine = db_engine
+        self.db_writer = db_writer
         self.executor = None
+        self.executor_max_workers = executor_max_workers or get_default_executor_max_workers()
         self.event_loop = None
         self.action_handlers = copy(action_handlers)
+        self._build_action_handler_index()
+        self.action_handler_states = {}
+        self.action_handler_startups = {}
         self.nm = NotificationManager()
+        self.notification_counters = NotificationCounters()
+        self.action_thread_index = ActionThreadIndex()
+        # only set when running with multiple web server workers, see worker_bus.py
+        self.worker_bus = worker_bus
+        self.remote_topics_lock = threading.Lock()
+        self.remote_topics = {}                     # topics with subscribers in other workers, key is worker index
+        self.remote_active_topics = frozenset()     # union of remote_topics, can be read from any thread
 
     def startup(self):
         log_prefix = "WebCLIService.startup"
         
-        # TODO: maybe I should limit the thread number
         self.require_shutdown = False
-        self.executor = ThreadPoolExecutor()
-        self.event_loop = get_event_loop()
-
-        # Initialize all action handlers
+        if self.db_writer is not None:
+            self.db_writer.startup()
+        self.executor = ThreadPoolExecutor(max_workers=self.executor_max_workers)
+        try:
+            self.event_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # not started from an event loop (e.g. CLI, unit test), no client can subscribe
+            self.event_loop = None
+
+        if self.worker_bus is not None:
+            self.worker_bus.connect(self._on_worker_message)
+            self.nm.on_active_topics_changed = self._send_active_topics
+
+        # Start all action handlers concurrently in thread pool, we do not wait for them,
+        # so a slow action handler does not block the web server. An action is handled
+        # only after its action handler is started, see _wait_action_handler
         for action_handler_name, action_handler in self.action_handlers.items():
-            # TODO: if an action failed to startup, remove it since it may not handle
-            #       request properly
-            try:
-                logger.info(f"{log_prefix}: startup action handler, name={action_handler_name},  {action_handler}")
-                action_handler.startup(self)
-            except Exception:
-                # we will tolerate if action handler failed to startup
-                logger.error(f"{log_prefix}: action handler startup exception", exc_info=True)
-        logger.info(f"{log_prefix}: all action handlers are started")
+            self.action_handler_states[action_handler_name] = {"state": ACTION_HANDLER_STARTING}
+            self.action_handler_startups[action_handler_name] = self.executor.submit(
+                self._startup_action_handler, action_handler_name, action_handler
+            )
+        logger.info(f"{log_prefix}: all action handlers are starting")
+
+    def _startup_action_handler(self, action_handler_name:str, action_handler:action_handler.ActionHandler):
+        log_prefix = "WebCLIService._startup_action_handler"
+        logger.info(f"{log_prefix}: startup action handler, name={action_handler_name},  {action_handler}")
+        start_time = time.time()
+        try:
+            action_handler.startup(self)
+            state = ACTION_HANDLER_RUNNING
+        except Exception:
+            # we will tolerate if action handler failed to startup, actions for it will fail
+            logger.error(f"{log_prefix}: action handler startup exception, name={action_handler_name}", exc_info=True)
+            state = ACTION_HANDLER_FAILED
+        duration = time.time() - start_time
+        self.action_handler_states[action_handler_name] = {"state": state, "startup_duration": duration}
+        logger.info(f"{log_prefix}: action handler {action_handler_name} is {state}, duration={duration:.3f}s")
+
+    def _wait_action_handler(self, action_handler_name:str) -> bool:
+        """Wait for an action handler to finish startup.
+        Returns:
+            True if the action handler is running.
+        """
+        startup = self.action_handler_startups.get(action_handler_name)
+        if startup is not None:
+            startup.result()
+        return self.action_handler_states.get(action_handler_name, {}).get("state") == ACTION_HANDLER_RUNNING
+
+    def get_action_handler_states(self) -> Dict[str, dict]:
+        """Get health state of all action handlers.
+        """
+        return {
+            action_handler_name: dict(state) for action_handler_name, state in self.action_handler_states.items()
+        }
 
     def shutdown(self):
         log_prefix = "WebCLIService.shutdown"
         assert self.require_shutdown == False
         self.require_shutdown = True
 
-        # shutdown all action handler
+        # shutdown all action handler which is started successfully
         for action_handler_name, action_handler in self.action_handlers.items():
+            if not self._wait_action_handler(action_handler_name):
+                continue
             try:
                 logger.debug(f"{log_prefix}: shutdown action handler, name={action_handler_name},  {action_handler}")
                 action_handler.shutdown()
@@ -137,25 +232,83 @@ class WebCLIService:
         logger.info(f"{log_prefix}: all action handlers are shutdown")
         # TODO: what if some request are stuck, shall we hang on shutdown?
         self.executor.shutdown(wait=True)
+        if self.db_writer is not None:
+            self.db_writer.shutdown()
+        if self.worker_bus is not None:
+            self.worker_bus.close()
+
+    def _write(self, write:Callable[[DataAccessor], T]) -> T:
+        """Run write(da) as one unit of work in a new session, returns what write returns.
+
+        All DataAccessor calls made by write share the session and are committed together.
+        In SQLite production mode it runs in the writer thread and returns after it is committed,
+        so write must only use the DataAccessor, and notify clients after _write returns.
+        """
+        def unit_of_work(session:Session) -> T:
+            da = DataAccessor(session)
+            with da.unit_of_work():
+                return write(da)
+
+        if self.db_writer is None:
+            with Session(self.db_engine) as session:
+                return unit_of_work(session)
+        return self.db_writer.execute(unit_of_work)
 
     def _hash_password(self, password:str) -> str:
         salt = bcrypt.gensalt()
         hashed_password = bcrypt.hashpw(password.encode("utf-8"), salt)
         return hashed_password.decode("utf-8")
 
-    def _discover_action_handler(self, request:Any):
+    def _build_action_handler_index(self):
+        self.action_handler_index = {}
+        self.generic_action_handler_names = []
         for action_handler_name, action_handler in self.action_handlers.items():
-            if action_handler.can_handle(request):
+            if len(action_handler.request_types) == 0:
+                self.generic_action_handler_names.append(action_handler_name)
+                continue
+            for request_type in action_handler.request_types:
+                self.action_handler_index.setdefault(request_type, []).append(action_handler_name)
+
+    def _discover_action_handler(self, request:Any):
+        """Find the action handler for the request.
+        Returns:
+            A tuple of action handler name, action handler and the parsed request.
+            (None, None, None) if no action handler can handle this request
+        """
+        request_type = request.get("type") if isinstance(request, dict) else None
+        action_handler_names = self.action_handler_index.get(request_type, []) if isinstance(request_type, str) else []
+        if len(self.generic_action_handler_names) > 0:
+            # keep the registration order, first action handler that accepts the request wins
+            action_handler_names = [
+                action_handler_name for action_handler_name in self.action_handlers.keys()
+                if action_handler_name in action_handler_names or action_handler_name in self.generic_action_handler_names
+            ]
+
+        for action_handler_name in action_handler_names:
+            action_handler = self.action_handlers[action_handler_name]
+            parsed_request = action_handler.accept_request(request)
+            if parsed_request is not None:
                 logger.debug(f"WebCLIService._discover_action_handler: found action handler, name={action_handler_name}")
-                return action_handler_name, action_handler
+                return action_handler_name, action_handler, parsed_request
         logger.debug(f"WebCLIService._discover_action_handler: cannot find action handler for this request")
-        return None, None
+        return None, None, None
     
-    def _action_handler_handle_proxy(self, action_handler, action_id:int, request:Any, user:User, action_handler_user_config:dict):
+    def _action_handler_handle_proxy(self, action_handler_name:str, action_handler, action_id:int, request:Any, user:User, action_handler_user_config:dict):
         """ This is the proxy for action_handler.handle
         The purpose is to capture exception and log
         """
         try:
+            if not self._wait_action_handler(action_handler_name):
+                logger.error(f"Action handler {action_handler_name} is not running, cannot handle action({action_id})")
+                self.append_response_to_action(
+                    action_id,
+                    mime = "text/plain",
+                    text_content = f"Action handler {action_handler_name} failed to start, please contact administrator",
+                    user = user
+                )
+                self.complete_action(action_id, user=user)
+                return
+
             ret = action_handler(action_id, request, user, action_handler_user_config)
             if ret:
                 self.complete_action(action_id, user=user)
@@ -163,19 +316,172 @@ class WebCLIService:
         except Exception:
             logger.exception(f"Action handler {action_handler} failed when handing action({action_id})")
 
+    def _get_thread_ids_for_action(self, action_id:int) -> List[int]:
+        """Get list of threads that has this action, from cache if possible.
+        """
+        thread_ids = self.action_thread_index.get(action_id)
+        if thread_ids is None:
+            generation = self.action_thread_index.get_generation()
+            with Session(self.db_engine) as session:
+                da = DataAccessor(session)
+                thread_ids = da.get_thread_ids_for_action(action_id)
+            self.action_thread_index.set(action_id, thread_ids, generation=generation)
+        return thread_ids
+
+    def _notify_threads(self, thread_ids:List[int], event:Union[dict, Callable[[], dict]]):
+        """Publish an event to all clients watching any of the threads.
+        It is safe to call from any thread.
+
+        Args:
+            event: the event, or a function that creates the event, it is only called if 
+                someone is watching any of the threads
+        """
+        topic_names = [f"topic-{thread_id}" for thread_id in thread_ids]
+        remote_topic_names = [topic_name for topic_name in topic_names if topic_name in self.remote_active_topics]
+        if self.worker_bus is not None and len(remote_topic_names) > 0:
+            # clients watching these threads are connected to other workers
+            if callable(event):
+                event = event()
+            self.worker_bus.send({"type": "notify", "topic_names": remote_topic_names, "event": event})
+            self._publish_notifications(topic_names, event)
+            self.notification_counters.add_published()
+            return
+
+        if not self._publish_notifications(topic_names, event):
+            self.notification_counters.add_skipped()
+            return
+        self.notification_counters.add_published()
+
+    def _publish_notifications(self, topic_names:List[str], event:Union[dict, Callable[[], dict]]) -> bool:
+        """Publish an event to clients connected to this worker.
+        Returns:
+            True if the event is published, False if nobody is watching.
+        """
+        topic_names = [topic_name for topic_name in topic_names if self.nm.has_subscribers(topic_name)]
+        if len(topic_names) == 0 or self.event_loop is None or not self.event_loop.is_running():
+            # nobody is watching, or service is used by CLI where nobody can subscribe
+            return False
+
+        if callable(event):
+            event = event()
+        notifications: List[Notification] = [
+            Notification(topic_name=topic_name, event = event) for topic_name in topic_names
+        ]
+        run_coroutine_threadsafe(
+            self.nm.publish_notifications(notifications),
+            self.event_loop
+        )
+        return True
+
+    def _notify_action_threads(self, action_id:int, event:Union[dict, Callable[[], dict]]):
+        """Publish an event to all clients watching any thread that has this action.
+        """
+        if not self.nm.has_any_subscribers() and len(self.remote_active_topics) == 0:
+            # nobody is watching anything (e.g. background jobs), no need to find out the threads
+            self.notification_counters.add_skipped()
+            return
+        self._notify_threads(self._get_thread_ids_for_action(action_id), event)
+
+    ##############################################################
+    # Multiple web server workers, see worker_bus.py
+    ##############################################################
+    def _get_owner_worker_index(self, action_handler:action_handler.ActionHandler, request:Any, user:User) -> Optional[int]:
+        """If the request must be handled by another worker, returns index of that worker, otherwise None.
+        """
+        if self.worker_bus is None:
+            return None
+        if request.get("type") not in action_handler.sticky_request_types:
+            return None
+        owner_worker_index = self.worker_bus.get_owner_worker_index(user.id)
+        if owner_worker_index == self.worker_bus.worker_index:
+            return None
+        return owner_worker_index
+
+    def _send_action_thread_index_change(self, op:str, **kwargs):
+        """Tell other workers to apply the same change to their action thread index.
+        """
+        if self.worker_bus is not None:
+            self.worker_bus.send({"type": "index", "op": op, "args": kwargs})
+
+    def _send_active_topics(self, active_topics:FrozenSet[str]):
+        """Tell other workers which topics have subscribers in this worker.
+        """
+        self.worker_bus.send({"type": "topics", "topic_names": sorted(active_topics)})
+
+    def _set_remote_topics(self, worker_index:int, topic_names:List[str]):
+        with self.remote_topics_lock:
+            if len(topic_names) == 0:
+                self.remote_topics.pop(worker_index, None)
+            else:
+                self.remote_topics[worker_index] = frozenset(topic_names)
+            self.remote_active_topics = frozenset().union(*self.remote_topics.values())
+
+    def _on_worker_message(self, message:dict):
+        """Called by worker bus in its receiver thread, for a message from another worker.
+        """
+        log_prefix = "WebCLIService._on_worker_message"
+        message_type = message["type"]
+        if message_type == "notify":
+            self._publish_notifications(message["topic_names"], message["event"])
+            return
+
+        if message_type == "topics":
+            self._set_remote_topics(message["worker_index"], message["topic_names"])
+            return
+
+        if message_type == "index":
+            op = message["op"]
+            if op not in ("add", "remove", "remove_thread"):
+                logger.warning(f"{log_prefix}: unknown action thread index operation, op={op}")
+                return
+            getattr(self.action_thread_index, op)(**message["args"])
+            return
+
+        if message_type == "handle":
+            action_handler_name = message["action_handler_name"]
+            action_id = message["action_id"]
+            action_handler = self.action_handlers[action_handler_name]
+            parsed_request = action_handler.accept_request(message["request"])
+            self.executor.submit(
+                self._action_handler_handle_proxy,
+                action_handler_name,
+                action_handler.handle,
+                action_id,
+                parsed_request,
+                message["user"],
+                message["action_handler_user_config"]
+            )
+            logger.debug(f"{log_prefix}: submit a thread task for {action_handler_name} to handle action({action_id}) for another worker")
+            return
+
+        logger.warning(f"{log_prefix}: unknown message, type={message_type}")
+
+    def get_notification_counters(self) -> dict:
+        """Returns how many events are published and how many are skipped since nobody is watching.
+        """
+        return self.notification_counters.to_dict()
+
+    def get_metrics(self) -> dict:
+        """Returns DB connection pool statistics, response chunk storage, notification counters and action handler states.
+        """
+        with Session(self.db_engine) as session:
+            chunk_storage = DataAccessor(session).get_chunk_storage_stats()
+        return {
+            "db_pool": get_db_pool_stats(self.db_engine),
+            "chunk_storage": chunk_storage,
+            "executor_max_workers": self.executor_max_workers,
+            "notifications": self.get_notification_counters(),
+            "action_handlers": self.get_action_handler_states()
+        }
+
     ##############################################################
     # Below are APIs
     ##############################################################
     def create_user(self, *, email:str, password:str) -> User:
         """ Create a new user.
         """
-        with Session(self.db_engine) as session:
-            da = DataAccessor(session)
-            user = da.create_user(
-                email = email, 
-                password_hash=self._hash_password(password)
-            )
-            return user
+        password_hash = self._hash_password(password)
+        return self._write(lambda da: da.create_user(email=email, password_hash=password_hash))
 
     def get_user_from_jwt_token(self, jwt_token:str) -> User:
         """ Get user from JWT token.
@@ -243,28 +549,55 @@ class WebCLIService:
         )
         return jwt_token
     
-    def list_threads(self, *, user:User) -> List[Thread]:
-        """List all thread owned by user.
+    def list_threads(
+        self,
+        *,
+        user:User,
+        sort_by:ThreadSortKey="id",
+        descending:bool=False,
+        limit:Optional[int]=None,
+        after:Optional[str]=None
+    ) -> List[ThreadSummary]:
+        """List threads owned by user, see DataAccessor.list_threads.
+
+        Raises:
+            InvalidCursor: if after is not a valid cursor for sort_by.
         """
         with Session(self.db_engine) as session:
             da = DataAccessor(session)
-            return da.list_threads(user=user)
+            return da.list_threads(user=user, sort_by=sort_by, descending=descending, limit=limit, after=after)
 
     def create_thread(self, *, title:str, description:str, user:User) -> Thread:
         """Create a new thread.
         """
-        with Session(self.db_engine) as session:
-            da = DataAccessor(session)
-            return da.create_thread(title=title, description=description, user=user)
+        return self._write(lambda da: da.create_thread(title=title, description=description, user=user))
 
     def get_thread(self, thread_id:int, *, user:User) -> Thread:
-        """Retrive a thread.
+        """Retrive a thread, text of a large response chunk is truncated to CHUNK_PREVIEW_SIZE bytes.
+        Raises:
+            ObjectNotFound: if thread does not exist, or user is not the creator of the thread
+        """
+        def get_thread() -> Thread:
+            with Session(self.db_engine) as session:
+                da = DataAccessor(session)
+                return da.get_thread(thread_id, user=user, preview_size=CHUNK_PREVIEW_SIZE)
+        return self._restore_thread_if_archived(thread_id, get_thread)
+
+    def get_thread_etag_version(self, thread_id:int, *, user:User) -> str:
+        """Get version for the ETag of a thread, it changes whenever the thread or anything in it changes.
         Raises:
             ObjectNotFound: if thread does not exist, or user is not the creator of the thread
         """
         with Session(self.db_engine) as session:
             da = DataAccessor(session)
-            return da.get_thread(thread_id, user=user)
+            return da.get_thread_etag_version(thread_id, user=user)
+
+    def get_thread_list_version(self, *, user:User) -> str:
+        """Get version of user's thread list.
+        """
+        with Session(self.db_engine) as session:
+            da = DataAccessor(session)
+            return da.get_thread_list_version(user=user)
 
     def patch_thread(
         self, 
@@ -283,20 +616,28 @@ class WebCLIService:
         Raises:
             ObjectNotFound: if thread does not exist, or user is not the creator of the thread
         """
-        with Session(self.db_engine) as session:
-            da = DataAccessor(session)
-            return da.patch_thread(thread_id, title=title, description=description, user=user)
+        thread = self._write(lambda da: da.patch_thread(thread_id, title=title, description=description, user=user))
+
+        event = {
+            "type": "thread-patched",
+            "thread_id": thread_id,
+        }
+        if title is not None:
+            event["title"] = thread.title
+        if description is not None:
+            event["description"] = thread.description
+        self._notify_threads([thread_id], event)
+        return thread
 
     def create_thread_action(self, *, request:dict, thread_id:int, title:str, raw_text:str, user:User) -> ThreadAction:
         """Create a new action.
         """
-        action_handler_name, action_handler = self._discover_action_handler(request)
+        action_handler_name, action_handler, parsed_request = self._discover_action_handler(request)
         if action_handler_name is None:
             raise NoHandler()
-        with Session(self.db_engine) as session:
-            da = DataAccessor(session)
-            # we are going to let action handler to handle this action in a thread pool
-            # and finish this API without waiting for the action handler to complete handling the request
+        # we are going to let action handler to handle this action in a thread pool
+        # and finish this API without waiting for the action handler to complete handling the request
+        def write(da:DataAccessor):
             action = da.create_action(
                 handler_name=action_handler_name, 
                 request=request, 
@@ -304,32 +645,73 @@ class WebCLIService:
                 raw_text=raw_text, 
                 user=user
             )
-            thread_aciton = da.append_action_to_thread(thread_id=thread_id, action_id=action.id, user=user)
-
-            action_handler_user_config = self.get_action_handler_user_config(
+            # the action is brand new, it has no response chunk, no need to load it again
+            thread_action_summary = da.append_action_to_thread(thread_id=thread_id, action_id=action.id, user=user, slim=True)
+            thread_action = ThreadAction(
+                id = thread_action_summary.id,
+                thread_id = thread_action_summary.thread_id,
+                action = action,
+                display_order = thread_action_summary.display_order,
+                show_question = thread_action_summary.show_question,
+                show_answer = thread_action_summary.show_answer
+            )
+            action_handler_user_config = da.get_action_handler_user_config(
                 action_handler_name=action_handler_name,
                 user=user
             )
-            # Invoke handler in thread pool, and no wait
-            self.executor.submit(
-                self._action_handler_handle_proxy,
-                action_handler.handle, 
-                action.id, 
-                request, 
-                user, 
-                action_handler_user_config
-            )
-            logger.debug(f"WebCLIService.create_action: submit a thread task for {action_handler_name} to handle an action")
+            return action, thread_action, action_handler_user_config
+        action, thread_aciton, action_handler_user_config = self._restore_thread_if_archived(
+            thread_id, lambda: self._write(write)
+        )
+        # a brand new action, this is the only thread that has it
+        self.action_thread_index.set(action.id, [thread_id])
+        self._notify_threads([thread_id], {
+            "type": "thread-action-inserted",
+            "thread_action": thread_aciton.model_dump(mode="json")
+        })
+
+        owner_worker_index = self._get_owner_worker_index(action_handler, request, user)
+        if owner_worker_index is not None:
+            # the action needs state kept in another worker (e.g. user's python interpreter)
+            self.worker_bus.send({
+                "type": "handle",
+                "worker_index": owner_worker_index,
+                "action_handler_name": action_handler_name,
+                "action_id": action.id,
+                "request": request,
+                "user": user,
+                "action_handler_user_config": action_handler_user_config
+            })
+            logger.debug(f"WebCLIService.create_action: send action to worker {owner_worker_index} for {action_handler_name} to handle")
             return thread_aciton
 
+        # Invoke handler in thread pool, and no wait
+        self.executor.submit(
+            self._action_handler_handle_proxy,
+            action_handler_name,
+            action_handler.handle, 
+            action.id, 
+            parsed_request, 
+            user, 
+            action_handler_user_config
+        )
+        logger.debug(f"WebCLIService.create_action: submit a thread task for {action_handler_name} to handle an action")
+        return thread_aciton
+
     def delete_thread(self, thread_id:int, *, user:User):
         """Delete a thread.
         Raises:
             ObjectNotFound: if the thread is not found.
         """
-        with Session(self.db_engine) as session:
-            da = DataAccessor(session)
-            return da.delete_thread(thread_id, user=user)
+        # an archived thread is deleted as is, restoring its actions only to delete them is a waste
+        if self._write(lambda da: da.delete_thread(thread_id, user=user)):
+            remove_thread_archive(self.archive_dir, thread_id)
+        self.action_thread_index.remove_thread(thread_id)
+        self._send_action_thread_index_change("remove_thread", thread_id=thread_id)
+        self._notify_threads([thread_id], {
+            "type": "thread-deleted",
+            "thread_id": thread_id
+        })
 
     def remove_action_from_thread(
         self, 
@@ -337,59 +719,86 @@ class WebCLIService:
         action_id:int, 
         thread_id:int,
         user:User
-    ) -> bool:
+    ):
         """Remove an action from a thread, it does not delete the action.
 
-        Returns:
-            bool: True if the action is removed, False if the action was not part of the thread
+        Raises:
+            ObjectNotFound: if thread does not exist or action does not exist or thread does not reference to action.
         """
-        with Session(self.db_engine) as session:
-            da = DataAccessor(session)
-            return da.remove_action_from_thread(action_id=action_id, thread_id=thread_id, user=user)
-        
+        self._write(lambda da: da.remove_action_from_thread(action_id=action_id, thread_id=thread_id, user=user))
+        self.action_thread_index.remove(action_id, thread_id)
+        self._send_action_thread_index_change("remove", action_id=action_id, thread_id=thread_id)
+        self._notify_threads([thread_id], {
+            "type": "thread-action-removed",
+            "thread_id": thread_id,
+            "action_id": action_id
+        })
+
+    def remove_actions_from_thread(
+        self,
+        *,
+        action_ids:List[int],
+        thread_id:int,
+        user:User
+    ):
+        """Remove many actions from a thread in one transaction, it does not delete the actions.
+
+        Raises:
+            ObjectNotFound: if thread does not exist or thread does not reference to any of the actions.
+        """
+        self._write(lambda da: da.remove_actions_from_thread(action_ids=action_ids, thread_id=thread_id, user=user))
+        if len(action_ids) == 0:
+            return
+        for action_id in action_ids:
+            self.action_thread_index.remove(action_id, thread_id)
+            self._send_action_thread_index_change("remove", action_id=action_id, thread_id=thread_id)
+        self._notify_threads([thread_id], {
+            "type": "thread-actions-removed",
+            "thread_id": thread_id,
+            "action_ids": action_ids
+        })
+
     def patch_action(self, action_id:int, *, user:User, title:Optional[PatchValue[str]]=None) -> Action:
         """Update action's title.
         """
-        with Session(self.db_engine) as session:
-            da = DataAccessor(session)
-            return da.patch_action(action_id, user=user, title=title)
+        action = self._write(lambda da: da.patch_action(action_id, user=user, title=title))
+
+        if title is not None:
+            self._notify_action_threads(action_id, {
+                "type": "action-patched",
+                "action_id": action_id,
+                "title": action.title
+            })
+        return action
 
     def append_action_to_thread(self, *, thread_id:int, action_id:int, user:User) -> ThreadAction:
         """Append an action to the end of a thread.
         """
-        with Session(self.db_engine) as session:
-            da = DataAccessor(session)
-            return da.append_action_to_thread(thread_id=thread_id, action_id=action_id, user=user)
-
-    def complete_action(self, action_id:int, *, user:Optional[User]=None) -> Action:
-        """Set an action to be completed.
+        thread_action = self._restore_thread_if_archived(thread_id, lambda: self._write(
+            lambda da: da.append_action_to_thread(thread_id=thread_id, action_id=action_id, user=user)
+        ))
+        self.action_thread_index.add(action_id, thread_id)
+        self._send_action_thread_index_change("add", action_id=action_id, thread_id=thread_id)
+        self._notify_threads([thread_id], {
+            "type": "thread-action-inserted",
+            "thread_action": thread_action.model_dump(mode="json")
+        })
+        return thread_action
+
+    def complete_action(self, action_id:int, *, user:Optional[User]=None) -> ActionSummary:
+        """Set an action to be completed, returns the action without response chunks.
         """
-        with Session(self.db_engine) as session:
-            da = DataAccessor(session)
-            action = da.complete_action(action_id, user=user)
-
-            thread_ids = da.get_thread_ids_for_action(action_id)
-
-            completed_at = action.model_dump(mode="json")["completed_at"]
-            event = {
-                "type": "action-completed",
-                "action_id": action_id,
-                "completed_at": completed_at
-            }
-
-            notifications: List[Notification] = [
-                Notification(
-                    topic_name=f"topic-{thread_id}", 
-                    event = event
-                ) for thread_id in thread_ids
-            ]
-
-            run_coroutine_threadsafe(
-                self.nm.publish_notifications(notifications),
-                self.event_loop
-            )
-        
-            return action
+        # the action may have many response chunks, clients only need completed_at
+        action = self._write(lambda da: da.complete_action(action_id, user=user, slim=True))
+
+        self._notify_action_threads(action_id, lambda: {
+            "type": "action-completed",
+            "action_id": action_id,
+            "completed_at": action.model_dump(mode="json")["completed_at"]
+        })
+        # a completed action won't produce more response
+        self.action_thread_index.discard(action_id)
+        return action
 
     def append_response_to_action(
         self, 
@@ -398,55 +807,53 @@ class WebCLIService:
         mime:str, 
         text_content:Optional[str] = None, 
         binary_content:Optional[bytes] = None, 
+        rendered_content:Optional[str] = None,
         user:Optional[User] = None
     ) -> ActionResponseChunk:
         """Append an response chunk to the end of a action.
-        """
-        with Session(self.db_engine) as session:
-            da = DataAccessor(session)
-            action_response_chunk = da.append_response_to_action(
-                action_id, 
-                mime=mime, 
-                text_content=text_content, 
-                binary_content=binary_content, 
-                user=user
-            )
-
-            # For binary content, if we know the mime type, we will save the content
-            # so it can be referenced by output chunk
-            if binary_content is not None:
-                if mime == "image/png":
-                    fileext = "png"
-                else:
-                    fileext = None
-                
-                if fileext is not None:
-                    resource_dir = os.path.join(self.resource_dir, str(action_id))
-                    os.makedirs(resource_dir, exist_ok=True)
-                    filename = os.path.join(resource_dir, f"{str(action_response_chunk.id)}.{fileext}")
-                    with open(filename, "wb") as f:
-                        f.write(binary_content)
-
-            thread_ids = da.get_thread_ids_for_action(action_id)
-            event = {
-                "type": "action-response-chunk",
-                "id": action_response_chunk.id,
-                "action_id": action_id,
-                "order": action_response_chunk.order,
-                "mime": action_response_chunk.mime,
-                "text_content": action_response_chunk.text_content
-            }
-
-            notifications: List[Notification] = [
-                Notification(topic_name=f"topic-{thread_id}", event = event) for thread_id in thread_ids
-            ]
 
-            run_coroutine_threadsafe(
-                self.nm.publish_notifications(notifications),
-                self.event_loop
-            )
-
-            return action_response_chunk
+        Args:
+            rendered_content: optional, text_content rendered on server side (e.g. markdown to HTML),
+                client shows it instead of rendering text_content
+        """
+        action_response_chunk = self._write(lambda da: da.append_response_to_action(
+            action_id, 
+            mime=mime, 
+            text_content=text_content, 
+            binary_content=binary_content, 
+            rendered_content=rendered_content,
+            user=user
+        ))
+
+        # For binary content, if we know the mime type, we will save the content
+        # so it can be referenced by output chunk
+        if binary_content is not None:
+            if mime == "image/png":
+                fileext = "png"
+            else:
+                fileext = None
+            
+            if fileext is not None:
+                resource_dir = os.path.join(self.resource_dir, str(action_id))
+                os.makedirs(resource_dir, exist_ok=True)
+                filename = os.path.join(resource_dir, f"{str(action_response_chunk.id)}.{fileext}")
+                with open(filename, "wb") as f:
+                    f.write(binary_content)
+
+        # clients get a preview of a large chunk, same as in get_thread
+        preview = action_response_chunk.get_preview(CHUNK_PREVIEW_SIZE)
+        self._notify_action_threads(action_id, lambda: {
+            "type": "action-response-chunk",
+            "id": preview.id,
+            "action_id": action_id,
+            "order": preview.order,
+            "mime": preview.mime,
+            "text_content": preview.text_content,
+            "rendered_content": preview.rendered_content,
+            "content_size": preview.content_size,
+            "is_truncated": preview.is_truncated
+        })
+        return action_response_chunk
 
 
     def patch_thread_action(
@@ -458,15 +865,80 @@ class WebCLIService:
         show_question:Optional[PatchValue[bool]]=None, 
         show_answer:Optional[PatchValue[bool]]=None
     ) -> ThreadAction:
+        thread_action = self._write(lambda da: da.patch_thread_action(
+            thread_id, 
+            action_id, 
+            user=user, 
+            show_question=show_question, 
+            show_answer=show_answer
+        ))
+
+        event = {
+            "type": "thread-action-patched",
+            "thread_id": thread_id,
+            "action_id": action_id
+        }
+        if show_question is not None:
+            event["show_question"] = thread_action.show_question
+        if show_answer is not None:
+            event["show_answer"] = thread_action.show_answer
+        self._notify_threads([thread_id], event)
+        return thread_action
+
+    def patch_thread_actions(
+        self,
+        thread_id:int,
+        action_ids:List[int],
+        *,
+        user:User,
+        show_question:Optional[PatchValue[bool]]=None,
+        show_answer:Optional[PatchValue[bool]]=None
+    ):
+        """Update show_question and/or show_answer of many thread actions in one transaction.
+
+        Raises:
+            ObjectNotFound: if thread does not exist or thread does not reference to any of the actions.
+        """
+        self._write(lambda da: da.patch_thread_actions(
+            thread_id,
+            action_ids,
+            user=user,
+            show_question=show_question,
+            show_answer=show_answer
+        ))
+        if len(action_ids) == 0 or (show_question is None and show_answer is None):
+            return
+
+        event = {
+            "type": "thread-actions-patched",
+            "thread_id": thread_id,
+            "action_ids": action_ids
+        }
+        if show_question is not None:
+            event["show_question"] = show_question.value
+        if show_answer is not None:
+            event["show_answer"] = show_answer.value
+        self._notify_threads([thread_id], event)
+
+    def search_actions(self, query:str, *, user:User, limit:int=20, offset:int=0) -> List[SearchHit]:
+        """Full-text search user's actions and their response chunks, best hit first.
+
+        Raises:
+            SearchNotSupported: if the database does not support full-text search.
+        """
         with Session(self.db_engine) as session:
             da = DataAccessor(session)
-            return da.patch_thread_action(
-                thread_id, 
-                action_id, 
-                user=user, 
-                show_question=show_question, 
-                show_answer=show_answer
-            )
+            return da.search_actions(query, user=user, limit=limit, offset=offset)
+
+    def get_response_chunk(self, chunk_id:int, *, user:User) -> ActionResponseChunk:
+        """Retrieve a response chunk with its full content.
+
+        Raises:
+            ObjectNotFound: if response chunk does not exist, or user is not the creator of its action
+        """
+        with Session(self.db_engine) as session:
+            da = DataAccessor(session)
+            return da.get_response_chunk(chunk_id, user=user)
 
     def get_action_handler_user_config(
         self,
@@ -490,9 +962,9 @@ class WebCLIService:
     ):
         """Set user configuration for a action handler.
         """
-        with Session(self.db_engine) as session:
-            da = DataAccessor(session)
-            return da.set_action_handler_user_config(action_handler_name=action_handler_name, user=user, config=config)
+        return self._write(
+            lambda da: da.set_action_handler_user_config(action_handler_name=action_handler_name, user=user, config=config)
+        )
 
     #######################################################################
     # This is called by web socket endpoint from fastapi
@@ -504,6 +976,7 @@ class WebCLIService:
     #
     #######################################################################
     async def websocket_endpoint(self, websocket: WebSocket):
+        from fastapi import WebSocketDisconnect
         log_prefix = "WebCLIService.websocket_endpoint"
 
         logger.debug(f"{log_prefix}: waiting for incoming connection")
@@ -534,69 +1007,171 @@ class WebCLIService:
 
         topic_name = f"topic-{thread_id}"
         q = await self.nm.subscribe(topic_name, client_id)
-          
+
+        ##########################################################################
+        # We run 3 tasks for each client
+        # sender:    wait for events, send events arrived within a short window in one frame
+        # receiver:  wait for client messages, so we notice disconnect immediately
+        # keepalive: ping client periodically
+        # Once any of them quit (e.g. client disconnected), we stop the others
+        ##########################################################################
+        send_lock = asyncio.Lock()
+        tasks = [
+            asyncio.create_task(self._websocket_sender(websocket, q, send_lock)),
+            asyncio.create_task(self._websocket_receiver(websocket)),
+            asyncio.create_task(self._websocket_keepalive(websocket, send_lock)),
+        ]
         try:
-            last_ping_time:float = None
-            while True:
-                # need to ping client if needed
-                now = time.time()
-                if last_ping_time is None or now - last_ping_time >= WEB_SOCKET_PING_INTERVAL:
-                    last_ping_time = now
-                    await websocket.send_text("ping")
-
-                r = await pop_notification(q, 10)
-                if r is None:
-                    # no notification
-                    continue
-
-                await websocket.send_text(json.dumps(r))
-                logger.debug(f"{log_prefix}: notify client({client_id}) on topic({topic_name}) via websocket")
-        except WebSocketDisconnect:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in done:
+                e = task.exception()
+                if e is not None and not isinstance(e, WebSocketDisconnect):
+                    logger.debug(f"{log_prefix}: client({client_id}) websocket task quit", exc_info=e)
+        finally:
+            for task in tasks:
+                task.cancel()
             await self.nm.unsubscribe(topic_name, client_id)
             logger.debug(f"{log_prefix}: client({client_id}) disconnected")
 
+    async def _websocket_sender(self, websocket:WebSocket, q:asyncio.Queue, send_lock:asyncio.Lock):
+        while True:
+            # block until we have at least one event, then give the producer a few ms to
+            # queue more, so a burst of chunks becomes a single frame
+            event = await q.get()
+            if event is SUBSCRIPTION_CLOSED:
+                return
+            events = [event]
+            if q.empty():
+                await asyncio.sleep(WEB_SOCKET_BATCH_WINDOW)
+            closed = False
+            while len(events) < WEB_SOCKET_MAX_BATCH_SIZE:
+                try:
+                    event = q.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if event is SUBSCRIPTION_CLOSED:
+                    closed = True
+                    break
+                events.append(event)
+            async with send_lock:
+                await websocket.send_text(json.dumps(events))
+            if closed:
+                return
+
+    async def _websocket_receiver(self, websocket:WebSocket):
+        # client does not send anything after the handshake, we only need to
+        # know when the connection is closed, receive_text raises WebSocketDisconnect
+        while True:
+            await websocket.receive_text()
+
+    async def _websocket_keepalive(self, websocket:WebSocket, send_lock:asyncio.Lock):
+        while True:
+            async with send_lock:
+                await websocket.send_text("ping")
+            await asyncio.sleep(WEB_SOCKET_PING_INTERVAL)
+
     def get_action_handler(self, action_handler_name:str) -> Optional[action_handler.ActionHandler]:
         return self.action_handlers.get(action_handler_name)
 
     def create_all_tables(self):
         return cat(self.db_engine)
 
-    def move_thread_action_up(self, thread_action_id:int, *, user:User) -> ThreadAction:
-        with Session(self.db_engine) as session:
-            da = DataAccessor(session)
-            thread_action = da.move_thread_action_up(thread_action_id, user=user)
+    #######################################################################
+    # Thread archival, see webcli2/core/data/archive.py
+    #######################################################################
+    def archive_threads(self, *, inactive_since:datetime) -> List[int]:
+        """Archive all threads that have no activity since inactive_since.
 
-            thread_id = thread_action.thread_id
-            event = {
-                # client need to reload thread
-                "type": "thread-reload"
-            }
+        Returns:
+            Ids of threads archived.
+        """
+        with Session(self.db_engine) as session:
+            thread_ids = DataAccessor(session).list_threads_to_archive(inactive_since=inactive_since)
+        return [thread_id for thread_id in thread_ids if self.archive_thread(thread_id)]
 
-            notification = Notification(topic_name=f"topic-{thread_id}", event = event)
+    def archive_thread(self, thread_id:int) -> bool:
+        """Move rows of a thread to its archive file, they are restored when the thread is accessed.
 
-            run_coroutine_threadsafe(
-                self.nm.publish_notification(notification),
-                self.event_loop
-            )
+        Returns:
+            True if the thread is archived.
+        """
+        if self.archive_dir is None:
+            raise ServiceError("archive_dir is not configured")
+
+        def write(da:DataAccessor) -> bool:
+            archive = da.archive_thread(thread_id)
+            if archive is None:
+                return False
+            # the rows are deleted only if the archive is saved
+            write_thread_archive(self.archive_dir, thread_id, archive)
+            return True
+        archived = self._write(write)
+        logger.info(f"WebCLIService.archive_thread: thread_id={thread_id}, archived={archived}")
+        return archived
+
+    def _restore_thread_if_archived(self, thread_id:int, call:Callable[[], T]) -> T:
+        # call() raises ThreadArchived if it needs an archived thread, we restore the thread and call again
+        try:
+            return call()
+        except ThreadArchived:
+            pass
+        log_prefix = "WebCLIService._restore_thread_if_archived"
+        try:
+            archive = read_thread_archive(self.archive_dir, thread_id)
+        except FileNotFoundError:
+            # someone else restored it and removed the archive file, the thread is not archived any more,
+            # otherwise the file is lost, the archive file is written before the thread is marked archived
+            if self._write(lambda da: da.drop_thread_archive(thread_id)):
+                logger.error(f"{log_prefix}: archive file of thread_id={thread_id} is missing, its archived actions are lost")
+            return call()
+        if self._write(lambda da: da.restore_thread(thread_id, archive)):
+            remove_thread_archive(self.archive_dir, thread_id)
+            logger.info(f"{log_prefix}: thread_id={thread_id} is restored")
+        return call()
+
+    def migrate_db(self) -> List[str]:
+        """Bring the database to the latest schema version, returns names of the migrations applied.
+        """
+        return migrate(self.db_engine)
 
-            return thread_action
+    def move_thread_action_up(self, thread_action_id:int, *, user:User) -> ThreadAction:
+        return self._move_thread_action(thread_action_id, user=user, direction="up")
 
     def move_thread_action_down(self, thread_action_id:int, *, user:User) -> ThreadAction:
-        with Session(self.db_engine) as session:
-            da = DataAccessor(session)
-            thread_action = da.move_thread_action_down(thread_action_id, user=user)
-
-            thread_id = thread_action.thread_id
-            event = {
-                # client need to reload thread
-                "type": "thread-reload"
-            }
-
-            notification = Notification(topic_name=f"topic-{thread_id}", event = event)
+        return self._move_thread_action(thread_action_id, user=user, direction="down")
 
-            run_coroutine_threadsafe(
-                self.nm.publish_notification(notification),
-                self.event_loop
+    def move_thread_action_after(self, thread_action_id:int, *, user:User, after_thread_action_id:Optional[int]) -> ThreadAction:
+        """Move an action right after another action of the same thread, or to the top if after_thread_action_id is None.
+        """
+        def write(da:DataAccessor):
+            display_orders = da.move_thread_action_after(
+                thread_action_id, 
+                user=user, 
+                after_thread_action_id=after_thread_action_id
             )
-
-            return thread_action
+            return display_orders, da.get_thread_action(thread_action_id, user=user)
+        display_orders, thread_action = self._write(write)
+        self._notify_thread_actions_reordered(thread_action.thread_id, display_orders)
+        return thread_action
+
+    def _move_thread_action(self, thread_action_id:int, *, user:User, direction:str) -> ThreadAction:
+        def write(da:DataAccessor):
+            display_orders = da.move_thread_action(thread_action_id, user=user, direction=direction)
+            return display_orders, da.get_thread_action(thread_action_id, user=user)
+        display_orders, thread_action = self._write(write)
+        self._notify_thread_actions_reordered(thread_action.thread_id, display_orders)
+        return thread_action
+
+    def _notify_thread_actions_reordered(self, thread_id:int, display_orders:List[ThreadActionOrder]):
+        if len(display_orders) > 0:
+            # client only need to update the display_order of the moved thread actions
+            self._notify_threads([thread_id], {
+                "type": "thread-actions-reordered",
+                "thread_id": thread_id,
+                "display_orders": [
+                    display_order.model_dump(mode="json") for display_order in display_orders
+                ]
+            })
@@ -0,0 +1,227 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import Any, Callable, Dict, Optional, Tuple
+from multiprocessing.connection import Listener, Client, Connection
+import os
+import socket
+import threading
+
+#############################################################################
+# Message bus between web server worker processes
+# ---------------------------------------------------------------------------
+# When "webcli start --workers N" runs N worker processes, each worker has
+# its own WebCLIService, so a client watching a thread may be connected to
+# a worker other than the one that handles the action. The parent process
+# runs a WorkerBusBroker, every worker connects to it with a WorkerBus and
+# uses it to
+#   - forward notifications to clients connected to other workers
+#   - keep other workers' action thread index up to date
+#   - send an action to the worker that owns the user (sticky routing), e.g.
+#     %python% keeps an interpreter per user in the worker process
+#
+# A message is a dict, its "type" field is one of:
+#   hello, welcome: a worker connects to the broker and gets its worker index
+#   notify:         publish an event to topics, broadcast to other workers
+#   topics:         topics that have subscribers in worker "worker_index" (set
+#                   by the broker), broadcast to other workers, so a worker
+#                   only sends notify when someone somewhere is watching. The
+#                   broker keeps the latest one of each worker for workers
+#                   that connect later, and sends an empty one for a worker
+#                   that disconnects.
+#   index:          action thread index is changed, broadcast to other workers
+#   handle:         ask worker "worker_index" to handle an action
+#############################################################################
+
+# environment variables the parent process passes to the worker processes
+WORKER_BUS_ADDRESS_ENV = "WEBCLI_WORKER_BUS_ADDRESS"
+WORKER_BUS_AUTHKEY_ENV = "WEBCLI_WORKER_BUS_AUTHKEY"
+
+class WorkerBusBroker:
+    listener: Listener
+    worker_count: int
+    lock: threading.Lock
+    connections: Dict[int, Connection]  # key is worker index
+    topics_messages: Dict[int, dict]    # latest topics message of each worker, key is worker index
+    accept_thread: Optional[threading.Thread]
+
+    def __init__(self, *, worker_count:int, authkey:bytes, address:Tuple[str, int]=("127.0.0.1", 0)):
+        self.listener = Listener(address=address, authkey=authkey)
+        self.worker_count = worker_count
+        self.lock = threading.Lock()
+        self.connections = {}
+        self.topics_messages = {}
+        self.accept_thread = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.listener.address
+
+    def start(self):
+        self.accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self.accept_thread.start()
+
+    def close(self):
+        self.listener.close()
+        with self.lock:
+            for connection in self.connections.values():
+                connection.close()
+            self.connections.clear()
+
+    def _accept_loop(self):
+        log_prefix = "WorkerBusBroker._accept_loop"
+        while True:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                # listener is closed
+                return
+            except Exception:
+                # e.g. bad authkey, ignore this connection
+                logger.warning(f"{log_prefix}: failed to accept connection", exc_info=True)
+                continue
+            threading.Thread(target=self._serve, args=(connection, ), daemon=True).start()
+
+    def _serve(self, connection:Connection):
+        log_prefix = "WorkerBusBroker._serve"
+        try:
+            message = connection.recv()
+            assert message["type"] == "hello"
+        except Exception:
+            logger.warning(f"{log_prefix}: bad hello message", exc_info=True)
+            connection.close()
+            return
+
+        with self.lock:
+            # a restarted worker takes the index of the worker it replaces
+            worker_index = 0
+            while worker_index in self.connections:
+                worker_index += 1
+            self.connections[worker_index] = connection
+            connection.send({"type": "welcome", "worker_index": worker_index, "worker_count": self.worker_count})
+            # what other workers' clients are watching
+            for topics_message in self.topics_messages.values():
+                connection.send(topics_message)
+        logger.info(f"{log_prefix}: worker connected, worker_index={worker_index}, pid={message.get('pid')}")
+
+        try:
+            while True:
+                message = connection.recv()
+                self._route(worker_index, message)
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self.lock:
+                is_current = self.connections.get(worker_index) is connection
+                if is_current:
+                    self.connections.pop(worker_index)
+                    self.topics_messages.pop(worker_index, None)
+            connection.close()
+            if is_current:
+                # its clients are gone too
+                self._route(worker_index, {"type": "topics", "topic_names": []})
+            logger.info(f"{log_prefix}: worker disconnected, worker_index={worker_index}")
+
+    def _route(self, sender_index:int, message:dict):
+        with self.lock:
+            if message["type"] == "topics":
+                message = {**message, "worker_index": sender_index}
+                if sender_index in self.connections:
+                    self.topics_messages[sender_index] = message
+            if message["type"] == "handle":
+                target = self.connections.get(message["worker_index"])
+                if target is None:
+                    # owner worker is gone, let the sender handle it
+                    target = self.connections.get(sender_index)
+                targets = [] if target is None else [target]
+            else:
+                targets = [
+                    connection for worker_index, connection in self.connections.items() if worker_index != sender_index
+                ]
+            for connection in targets:
+                try:
+                    connection.send(message)
+                except OSError:
+                    logger.warning(f"WorkerBusBroker._route: failed to send message", exc_info=True)
+
+
+class WorkerBus:
+    address: Tuple[str, int]
+    authkey: bytes
+    worker_index: Optional[int]
+    worker_count: int
+    send_lock: threading.Lock
+    connection: Optional[Connection]
+    receiver_thread: Optional[threading.Thread]
+
+    def __init__(self, *, address:Tuple[str, int], authkey:bytes):
+        self.address = address
+        self.authkey = authkey
+        self.worker_index = None
+        self.worker_count = 1
+        self.send_lock = threading.Lock()
+        self.connection = None
+        self.receiver_thread = None
+
+    def connect(self, on_message:Callable[[dict], Any]):
+        """Connect to the broker, on_message is called in a background thread for every message from other workers.
+        """
+        self.connection = Client(self.address, authkey=self.authkey)
+        self.connection.send({"type": "hello", "pid": os.getpid()})
+        welcome = self.connection.recv()
+        self.worker_index = welcome["worker_index"]
+        self.worker_count = welcome["worker_count"]
+        logger.info(f"WorkerBus.connect: connected, worker_index={self.worker_index}, worker_count={self.worker_count}")
+        self.receiver_thread = threading.Thread(target=self._receive_loop, args=(on_message, ), daemon=True)
+        self.receiver_thread.start()
+
+    def close(self):
+        if self.connection is not None:
+            # closing the fd alone does not wake up the receiver thread blocked in recv, so the
+            # broker would never see the disconnect; shut down the socket first
+            try:
+                with socket.fromfd(self.connection.fileno(), socket.AF_INET, socket.SOCK_STREAM) as sock:
+                    sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            # the receiver thread sees EOF and stops, the connection cannot be closed under it
+            if self.receiver_thread is not None and self.receiver_thread is not threading.current_thread():
+                self.receiver_thread.join()
+            self.connection.close()
+
+    def send(self, message:dict):
+        """Send a message to other workers, safe to call from any thread.
+        """
+        with self.send_lock:
+            self.connection.send(message)
+
+    def get_owner_worker_index(self, user_id:int) -> int:
+        """Which worker handles sticky actions of this user.
+        """
+        return user_id % self.worker_count
+
+    def _receive_loop(self, on_message:Callable[[dict], Any]):
+        log_prefix = "WorkerBus._receive_loop"
+        while True:
+            try:
+                message = self.connection.recv()
+            except (EOFError, OSError):
+                logger.info(f"{log_prefix}: disconnected from broker")
+                return
+            try:
+                on_message(message)
+            except Exception:
+                logger.exception(f"{log_prefix}: failed to handle message, type={message.get('type')}")
+
+
+def get_worker_bus_from_env() -> Optional[WorkerBus]:
+    """Returns a WorkerBus if we are a worker started by "webcli start --workers N", otherwise None.
+    """
+    address = os.environ.get(WORKER_BUS_ADDRESS_ENV)
+    if address is None:
+        return None
+    host, port = address.rsplit(":", 1)
+    return WorkerBus(
+        address=(host, int(port)),
+        authkey=bytes.fromhex(os.environ[WORKER_BUS_AUTHKEY_ENV])
+    )
@@ -4,15 +4,68 @@ logger = logging.getLogger(__name__)
 from typing import Dict
 import importlib
 
-from sqlalchemy import create_engine
-
 from webcli2.config import WebCLIApplicationConfig, ActionHandlerInfo
+from webcli2.core.data.db_pool import create_db_engine
+from webcli2.core.data.sqlite import configure_sqlite_engine, SQLiteWriter
 from webcli2.core.service import WebCLIService
+from webcli2.core.service.webcli_service import get_default_executor_max_workers
+from webcli2.core.service.worker_bus import get_worker_bus_from_env
+from webcli2.action_handlers.action_handler import ActionHandler
+from webcli2.action_handlers.lazy_action_handler import LazyActionHandler
 
 # Load WebCLIService
-def load_webcli_service(config:WebCLIApplicationConfig, ) -> WebCLIService:
+# load_action_handlers: set it to False if you only need to access the DB (e.g. CLI init-db, create-user),
+#     so we do not import the action handlers and the packages they depend on.
+def load_webcli_service(config:WebCLIApplicationConfig, *, load_action_handlers:bool=True) -> WebCLIService:
     logger.info(f"load_webcli_service: Loading WebCLIService")
     action_handlers = { }
+    if load_action_handlers:
+        action_handlers = _load_action_handlers(config)
+
+    executor_max_workers = config.core.executor_max_workers or get_default_executor_max_workers()
+    db_pool_config = config.core.db_pool
+    db_engine = create_db_engine(
+        config.core.db_url,
+        executor_max_workers = executor_max_workers,
+        pool_size = db_pool_config.pool_size,
+        max_overflow = db_pool_config.max_overflow,
+        pool_timeout = db_pool_config.pool_timeout,
+        pool_recycle = db_pool_config.pool_recycle,
+        pool_pre_ping = db_pool_config.pool_pre_ping
+    )
+
+    db_writer = None
+    sqlite_config = config.core.sqlite
+    if sqlite_config.production_mode and db_engine.dialect.name == "sqlite":
+        configure_sqlite_engine(
+            db_engine,
+            synchronous = sqlite_config.synchronous,
+            cache_size = sqlite_config.cache_size,
+            mmap_size = sqlite_config.mmap_size,
+            busy_timeout = sqlite_config.busy_timeout
+        )
+        # CLI commands do not start the service, they write in the caller thread
+        if load_action_handlers:
+            db_writer = SQLiteWriter(db_engine, batch_size=sqlite_config.write_batch_size)
+
+    service = WebCLIService(
+        users_home_dir = config.core.users_home_dir,
+        resource_dir = config.core.resource_dir,
+        archive_dir = config.core.archive_dir,
+        public_key=config.core.public_key,
+        private_key=config.core.private_key,
+        db_engine=db_engine,
+        action_handlers = action_handlers,
+        executor_max_workers = executor_max_workers,
+        db_writer = db_writer,
+        # set if we are one of the workers started by "webcli start --workers N"
+        worker_bus = get_worker_bus_from_env() if load_action_handlers else None
+    )
+    logger.info(f"load_webcli_service: WebCLIService is loaded!")
+    return service
+
+def _load_action_handlers(config:WebCLIApplicationConfig) -> Dict[str, ActionHandler]:
+    action_handlers = { }
 
     action_handlers_config:Dict[str, ActionHandlerInfo] = {
         "system": ActionHandlerInfo(
@@ -23,22 +76,21 @@ def load_webcli_service(config:WebCLIApplicationConfig, ) -> WebCLIService:
     }
     action_handlers_config.update(config.core.action_handlers)
     for action_handler_name, action_handler_info in action_handlers_config.items():
+        if action_handler_info.lazy:
+            logger.info(f"Lazy action handler: name={action_handler_name}, module={action_handler_info.module_name}, class={action_handler_info.class_name}")
+            action_handlers[action_handler_name] = LazyActionHandler(
+                module_name = action_handler_info.module_name,
+                class_name = action_handler_info.class_name,
+                config = action_handler_info.config,
+                request_types = action_handler_info.request_types,
+                sticky_request_types = action_handler_info.sticky_request_types
+            )
+            continue
+
         logger.info(f"Loading action handler: name={action_handler_name}, module={action_handler_info.module_name}, class={action_handler_info.class_name}")
         module = importlib.import_module(action_handler_info.module_name)
         klass = getattr(module, action_handler_info.class_name)
         action_handler = klass(**action_handler_info.config)
         action_handlers[action_handler_name] = action_handler
     logger.info(f"All action handlers are loaded")
-
-    db_engine = create_engine(config.core.db_url)
-
-    service = WebCLIService(
-        users_home_dir = config.core.users_home_dir,
-        resource_dir = config.core.resource_dir,
-        public_key=config.core.public_key,
-        private_key=config.core.private_key,
-        db_engine=db_engine,
-        action_handlers = action_handlers
-    )
-    logger.info(f"load_webcli_service: WebCLIService is loaded!")
-    return service
+    return action_handlers
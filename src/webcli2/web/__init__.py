@@ -1 +1,9 @@
-from .main import app
\ No newline at end of file
+from typing import Any
+
+# Importing main loads config and WebCLIService, we only do it when someone asks
+# for the app, so helpers in webcli2.web.libs can be imported on their own.
+def __getattr__(name:str) -> Any:
+    if name == "app":
+        from .main import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -17,10 +17,10 @@ import { FaUpLong, FaDownLong } from "react-icons/fa6";
 import mermaid from 'mermaid';
 
 import { 
-    get_thread, create_action, remove_action_from_thread, update_action_title,
-    update_thread_action_show_question, update_thread_action_show_answer,
+    get_thread, create_action, remove_action_from_thread, remove_actions_from_thread, update_action_title,
+    update_thread_action_show_question, update_thread_action_show_answer, update_thread_actions,
     update_thread_title, update_thread_description, move_thread_action_up,
-    move_thread_action_down
+    move_thread_action_down, get_chunk_content
 } from '@/apis';
 
 import {
@@ -297,6 +297,25 @@ export class ThreadPage extends React.Component {
         });
     }
 
+    /**
+     * Remove all actions from the thread with one API call, actions are not deleted
+     */
+    deleteAllActions = async () => {
+        const action_ids = this.state.threadActionWrappers.map(threadActionWrapper => threadActionWrapper.threadAction.action.id);
+        if (action_ids.length === 0) {
+            return;
+        }
+        if (!window.confirm(`Remove all ${action_ids.length} actions from this thread?`)) {
+            return;
+        }
+        await remove_actions_from_thread({thread_id:this.props.threadId, action_ids});
+        dropItemFromReactState({
+            element:this, 
+            stateFieldName:"threadActionWrappers",
+            shouldRemove: threadActionWrapper => action_ids.includes(threadActionWrapper.threadAction.action.id)
+        });
+    }
+
     setActionShowQuestion = async (threadAction, show_question) => {
         await update_thread_action_show_question({
             thread_id:this.props.threadId, 
@@ -329,6 +348,29 @@ export class ThreadPage extends React.Component {
         });
     }
 
+    /**
+     * Show or hide answers of all actions with one API call, e.g. collapse all
+     */
+    setAllActionsShowAnswer = async (show_answer) => {
+        const action_ids = this.state.threadActionWrappers.map(threadActionWrapper => threadActionWrapper.threadAction.action.id);
+        if (action_ids.length === 0) {
+            return;
+        }
+        await update_thread_actions({
+            thread_id:this.props.threadId,
+            action_ids,
+            show_answer
+        });
+        updateMatchingItemsFromReactState({
+            element: this,
+            stateFieldName:"threadActionWrappers",
+            shouldUpdate: threadActionWrapper => action_ids.includes(threadActionWrapper.threadAction.action.id),
+            doUpdate: threadActionWrapper => {
+                threadActionWrapper.threadAction.show_answer = show_answer;
+            }
+        });
+    }
+
     setActionTitle = async (action, title) => {
         updateMatchingItemsFromReactState({
             element: this,
@@ -340,10 +382,43 @@ export class ThreadPage extends React.Component {
         });
     }
 
+    loadFullResponseChunk = async (action, response_chunk) => {
+        // a large response chunk only has a preview, get the full text on demand
+        const text_content = await get_chunk_content({chunk_id: response_chunk.id});
+        updateMatchingItemsFromReactState({
+            element: this,
+            stateFieldName:"threadActionWrappers",
+            shouldUpdate: threadActionWrapper => threadActionWrapper.threadAction.action.id === action.id,
+            doUpdate: threadActionWrapper => {
+                threadActionWrapper.threadAction.action.response_chunks = threadActionWrapper.threadAction.action.response_chunks.map(
+                    chunk => chunk.id === response_chunk.id ? {...chunk, text_content: text_content, is_truncated: false} : chunk
+                );
+            }
+        });
+    }
+
     renderResponseChunk(action, response_chunk) {
+        if (!response_chunk.is_truncated) {
+            return this.renderResponseChunkContent(action, response_chunk);
+        }
+        return <div key={response_chunk.id}>
+            {this.renderResponseChunkContent(action, response_chunk)}
+            <Button
+                variant="link"
+                size="sm"
+                onClick={async () => await this.loadFullResponseChunk(action, response_chunk)}
+            >Output is truncated ({response_chunk.content_size} bytes), show all</Button>
+        </div>;
+    }
+
+    renderResponseChunkContent(action, response_chunk) {
         if (response_chunk.mime === "text/html") {
             return <div key={response_chunk.id} dangerouslySetInnerHTML={{ __html: response_chunk.text_content }} />;
         }
+        if (response_chunk.rendered_content) {
+            // server already rendered it (e.g. markdown, mermaid), we do not need to render it again
+            return <div key={response_chunk.id} dangerouslySetInnerHTML={{ __html: response_chunk.rendered_content }} />;
+        }
         if (response_chunk.mime === "text/markdown") {
             return <ReactMarkdown key={response_chunk.id}>{response_chunk.text_content}</ReactMarkdown>;
         }
@@ -507,9 +582,7 @@ export class ThreadPage extends React.Component {
         try {
             const threadAction = await create_action({thread_id:this.props.threadId, request, title:"question", raw_text:command});
             logger.info("ThreadPage.sendAction: server response: ", threadAction);
-            await setStateAsync(this, {
-                threadActionWrappers: [...this.state.threadActionWrappers, new ThreadActionWrapper(threadAction)]
-            });
+            await this.insertThreadAction(threadAction);
             logger.info("ThreadPage.sendAction: exit");
         } 
         catch(err) {
@@ -521,6 +594,22 @@ export class ThreadPage extends React.Component {
 
     }
 
+    /**********************************************************************************
+     * Add a thread action unless we already have it, the thread-action-inserted event
+     * may arrive before or after the response of create_action
+     */
+    insertThreadAction = async threadAction => {
+        if (_.some(this.state.threadActionWrappers, taw => taw.threadAction.id === threadAction.id)) {
+            return;
+        }
+        await setStateAsync(this, {
+            threadActionWrappers: _.sortBy(
+                [...this.state.threadActionWrappers, new ThreadActionWrapper(threadAction)],
+                taw => taw.threadAction.display_order
+            )
+        });
+    }
+
     // after component is mounted
     async componentDidMount() {
         logger.info("ThreadPage.componentDidMount: enter");
@@ -563,6 +652,8 @@ export class ThreadPage extends React.Component {
          *     mime: "text/plain",
          *     order: 6
          *     text_content: "blah",
+         *     content_size: 4,
+         *     is_truncated: false,
          *     type: "action-response-chunk"
          * }
          */
@@ -584,6 +675,9 @@ export class ThreadPage extends React.Component {
                     id: threadEvent.id,
                     mime: threadEvent.mime,
                     text_content: threadEvent.text_content,
+                    rendered_content: threadEvent.rendered_content,
+                    content_size: threadEvent.content_size,
+                    is_truncated: threadEvent.is_truncated,
                     order: threadEvent.order
                 },
                 ...new_response_chunks2,
@@ -606,6 +700,107 @@ export class ThreadPage extends React.Component {
             return;
         }
 
+        if (threadEvent.type === "thread-actions-reordered") {
+            // only thread actions whose display_order changed are listed
+            const displayOrders = new Map(threadEvent.display_orders.map(it => [it.id, it.display_order]));
+            for (const threadActionWrapper of this.state.threadActionWrappers) {
+                const displayOrder = displayOrders.get(threadActionWrapper.threadAction.id);
+                if (!_.isUndefined(displayOrder)) {
+                    threadActionWrapper.threadAction.display_order = displayOrder;
+                }
+            }
+            this.setState({
+                threadActionWrappers: _.sortBy(this.state.threadActionWrappers, taw => taw.threadAction.display_order)
+            });
+            return;
+        }
+
+        if (threadEvent.type === "thread-action-inserted") {
+            await this.insertThreadAction(threadEvent.thread_action);
+            return;
+        }
+
+        if (threadEvent.type === "thread-action-removed") {
+            dropItemFromReactState({
+                element:this, 
+                stateFieldName:"threadActionWrappers",
+                shouldRemove: threadActionWrapper => threadActionWrapper.threadAction.action.id === threadEvent.action_id
+            });
+            return;
+        }
+
+        if (threadEvent.type === "thread-action-patched") {
+            updateMatchingItemsFromReactState({
+                element: this,
+                stateFieldName:"threadActionWrappers",
+                shouldUpdate: threadActionWrapper => threadActionWrapper.threadAction.action.id === threadEvent.action_id,
+                doUpdate: threadActionWrapper => {
+                    if (!_.isUndefined(threadEvent.show_question)) {
+                        threadActionWrapper.threadAction.show_question = threadEvent.show_question;
+                    }
+                    if (!_.isUndefined(threadEvent.show_answer)) {
+                        threadActionWrapper.threadAction.show_answer = threadEvent.show_answer;
+                    }
+                }
+            });
+            return;
+        }
+
+        if (threadEvent.type === "thread-actions-removed") {
+            dropItemFromReactState({
+                element:this, 
+                stateFieldName:"threadActionWrappers",
+                shouldRemove: threadActionWrapper => threadEvent.action_ids.includes(threadActionWrapper.threadAction.action.id)
+            });
+            return;
+        }
+
+        if (threadEvent.type === "thread-actions-patched") {
+            updateMatchingItemsFromReactState({
+                element: this,
+                stateFieldName:"threadActionWrappers",
+                shouldUpdate: threadActionWrapper => threadEvent.action_ids.includes(threadActionWrapper.threadAction.action.id),
+                doUpdate: threadActionWrapper => {
+                    if (!_.isUndefined(threadEvent.show_question)) {
+                        threadActionWrapper.threadAction.show_question = threadEvent.show_question;
+                    }
+                    if (!_.isUndefined(threadEvent.show_answer)) {
+                        threadActionWrapper.threadAction.show_answer = threadEvent.show_answer;
+                    }
+                }
+            });
+            return;
+        }
+
+        if (threadEvent.type === "action-patched") {
+            updateMatchingItemsFromReactState({
+                element: this,
+                stateFieldName:"threadActionWrappers",
+                shouldUpdate: threadActionWrapper => threadActionWrapper.threadAction.action.id === threadEvent.action_id,
+                doUpdate: threadActionWrapper => {
+                    threadActionWrapper.threadAction.action.title = threadEvent.title;
+                }
+            });
+            return;
+        }
+
+        if (threadEvent.type === "thread-patched") {
+            const newState = {};
+            if (!_.isUndefined(threadEvent.title)) {
+                newState.thread_title = threadEvent.title;
+            }
+            if (!_.isUndefined(threadEvent.description)) {
+                newState.thread_description = threadEvent.description;
+            }
+            await setStateAsync(this, newState);
+            return;
+        }
+
+        if (threadEvent.type === "thread-deleted") {
+            await this.addAlert("This thread has been deleted");
+            return;
+        }
+
         if (threadEvent.type === "thread-reload") {
             const thread = await get_thread(this.props.threadId);
             const threadActionWrappers = thread.thread_actions.map(threadAction => new ThreadActionWrapper(threadAction));
@@ -663,10 +858,14 @@ export class ThreadPage extends React.Component {
                     logger.info("websocket.message: exit");
                     return;
                 }
+                // server sends all pending events in one frame as an array
                 const parsedData = JSON.parse(event.data);
                 logger.info("websocket.message: parsed ", parsedData);
 
-                await this.onThreadEvent(parsedData);
+                const threadEvents = Array.isArray(parsedData)?parsedData:[parsedData];
+                for (const threadEvent of threadEvents) {
+                    await this.onThreadEvent(threadEvent);
+                }
             } catch (error) {
                 error("websocket.message: parse JSON error ", error);
             }
@@ -744,6 +943,26 @@ export class ThreadPage extends React.Component {
 
                             <hr className="thin-spacebar" />
 
+                            <Row>
+                                <Col>
+                                    <Button
+                                        variant="link"
+                                        size="sm"
+                                        onClick={async () => await this.setAllActionsShowAnswer(false)}
+                                    >Hide all answers</Button>
+                                    <Button
+                                        variant="link"
+                                        size="sm"
+                                        onClick={async () => await this.setAllActionsShowAnswer(true)}
+                                    >Show all answers</Button>
+                                    <Button
+                                        variant="link"
+                                        size="sm"
+                                        onClick={async () => await this.deleteAllActions()}
+                                    >Remove all actions</Button>
+                                </Col>
+                            </Row>
+
                             <Row>
                                 <Col>
                                     <div className="actions-panel">
@@ -4,7 +4,7 @@ import Container from 'react-bootstrap/Container';
 import Card from 'react-bootstrap/Card';
 import Row from 'react-bootstrap/Row';
 import Col from 'react-bootstrap/Col';
-import { list_threads, create_thread, delete_thread } from "@/apis";
+import { list_threads_page, create_thread, delete_thread } from "@/apis";
 import Button from 'react-bootstrap/Button';
 import { PageHeader } from "@/Components/PageHeader";
 
@@ -15,16 +15,23 @@ export class ThreadsPage extends React.Component {
     constructor(props) {
         super(props);
         this.state = {
-            threads: []
+            threads: [],
+            next_cursor: null,     // to load next page of threads, null if no more
         };
     }
 
     // after component is mounted
     async componentDidMount() {
-        const threads = await list_threads();
-        this.setState({threads:threads})
+        // most recently active threads first
+        const {threads, next_cursor} = await list_threads_page({});
+        this.setState({threads, next_cursor});
     }
 
+    do_load_more = async () => {
+        const {threads, next_cursor} = await list_threads_page({after:this.state.next_cursor});
+        this.setState(state => ({threads:state.threads.concat(threads), next_cursor}));
+    };
+
     do_create_thread = async () => {
         const response = await create_thread({title:"no title", description:"no description"});
         window.location.href = `/threads/${response.id}`;
@@ -34,8 +41,7 @@ export class ThreadsPage extends React.Component {
 
     do_delete_thread = async id => {
         await delete_thread({id});
-        const threads = await list_threads();
-        this.setState({threads:threads})
+        this.setState(state => ({threads:state.threads.filter(thread => thread.id !== id)}));
     };
 
     render_thread(thread) {       
@@ -47,6 +53,9 @@ export class ThreadsPage extends React.Component {
                 <Card.Text>
                     {thread.description}
                 </Card.Text>
+                <Card.Text className="text-muted">
+                    {thread.action_count} actions, last active {new Date(thread.last_activity_at + "Z").toLocaleString()}
+                </Card.Text>
                 <Card.Link href={`/threads/${thread.id}`}>Open</Card.Link>
                 <Card.Link href="#" onClick={async event=> {
                     await this.do_delete_thread(thread.id);
@@ -87,6 +96,13 @@ export class ThreadsPage extends React.Component {
                         }
                         { this.render_add_thread() }
                     </Row>
+                    {
+                        this.state.next_cursor !== null && <Row>
+                            <Col style={{textAlign: "center"}}>
+                                <Button variant="link" onClick={this.do_load_more}>Load more</Button>
+                            </Col>
+                        </Row>
+                    }
                 </Container>
             </div>
         );
@@ -10,8 +10,10 @@ export async function list_threads() {
      * Return:
      * List of Thread
      */
+    // no-cache: browser revalidates with ETag, server returns 304 if nothing changed
     const response = await fetch("/apis/threads", {
         method: "GET",
+        cache: "no-cache",
         headers: {
             "Content-Type": "application/json",
         }
@@ -21,6 +23,48 @@ export async function list_threads() {
     return ret;
 }
 
+export async function list_threads_page({sort_by="last_activity_at", order="desc", limit=50, after=null}) {
+    /***************
+     * Return:
+     * {threads, next_cursor}, next_cursor is null if this is the last page
+     */
+    const params = new URLSearchParams({sort_by, order, limit});
+    if (after !== null) {
+        params.set("after", after);
+    }
+    const response = await fetch(`/apis/threads?${params}`, {
+        method: "GET",
+        cache: "no-cache",
+        headers: {
+            "Content-Type": "application/json",
+        }
+    });
+    if (!response.ok) {
+        throw new Error(`Failed to list threads: ${response.status}`);
+    }
+
+    const threads = await response.json();
+    return {threads, next_cursor: response.headers.get("X-Next-Cursor")};
+}
+
+export async function search({q, limit=20, offset=0}) {
+    /***************
+     * Return:
+     * List of SearchHit, best hit first
+     */
+    const params = new URLSearchParams({q, limit, offset});
+    const response = await fetch(`/apis/search?${params}`, {
+        method: "GET",
+        headers: {
+            "Content-Type": "application/json",
+        }
+    });
+    if (!response.ok) {
+        throw new Error(`Failed to search: ${response.status}`);
+    }
+    return await response.json();
+}
+
 export async function get_thread(id) {
     /***************
      * Return:
@@ -28,6 +72,7 @@ export async function get_thread(id) {
      */
     const response = await fetch(`/apis/threads/${id}`, {
         method: "GET",
+        cache: "no-cache",
         headers: {
             "Content-Type": "application/json",
         }
@@ -41,6 +86,27 @@ export async function get_thread(id) {
     return ret;
 }
 
+export async function get_chunk_content({chunk_id, first=null, last=null}) {
+    /***************
+     * Get full text of a response chunk, thread only has a preview of a large chunk
+     * first and last: optional byte range (inclusive) of the UTF-8 encoded text
+     * Return:
+     * the text
+     */
+    const headers = {};
+    if (first !== null) {
+        headers["Range"] = `bytes=${first}-${last === null ? "" : last}`;
+    }
+    const response = await fetch(`/apis/chunks/${chunk_id}/content`, {
+        method: "GET",
+        headers: headers
+    });
+    if (!response.ok) {
+        throw new Error(`Failed to get chunk content: ${response.status}`);
+    }
+    return await response.text();
+}
+
 export async function create_thread({title, description}) {
     /***************
      * Return:
@@ -140,6 +206,45 @@ export async function remove_action_from_thread({thread_id, action_id}) {
     await response.json();
 }
 
+export async function remove_actions_from_thread({thread_id, action_ids}) {
+    /**
+     * Remove many actions from thread in one call, it does not delete the actions
+     */
+    const response = await fetch(`/apis/threads/${thread_id}/actions/remove`, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+        },
+        body: JSON.stringify({action_ids}),
+    });
+    if (!response.ok) {
+        throw new Error(`Failed to remove actions from thread: ${response.status}`);
+    }
+    await response.json();
+}
+
+export async function update_thread_actions({thread_id, action_ids, show_question, show_answer}) {
+    /**
+     * Update show_question and/or show_answer of many actions in one call, e.g. collapse all
+     */
+    const body = {
+        action_ids,
+        show_question:get_patch_value(show_question),
+        show_answer:get_patch_value(show_answer)
+    };
+    const response = await fetch(`/apis/threads/${thread_id}/actions`, {
+        method: "PATCH",
+        headers: {
+            "Content-Type": "application/json",
+        },
+        body: JSON.stringify(body),
+    });
+    if (!response.ok) {
+        throw new Error(`Failed to update thread actions: ${response.status}`);
+    }
+    await response.json();
+}
+
 export async function update_action_title({action_id, title}) {
     const response = await fetch(`/apis/actions/${action_id}`, {
         method: "PATCH",
@@ -209,3 +314,20 @@ export async function move_thread_action_down({thread_action_id}) {
     }
     await response.json();
 }
+
+export async function move_thread_action_after({thread_action_id, after_thread_action_id}) {
+    /**
+     * Move thread action right after another thread action, or to the top if after_thread_action_id is null
+     */
+    const response = await fetch(`/apis/thread_actions/move/${thread_action_id}`, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+        },
+        body: JSON.stringify({direction:"after", after_thread_action_id}),
+    });
+    if (!response.ok) {
+        throw new Error(`Failed to move thread_action: ${response.status}`);
+    }
+    await response.json();
+}
@@ -0,0 +1,75 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import Set
+import mimetypes
+import os
+import re
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles, NotModifiedResponse
+from starlette.types import Scope
+
+# webpack production build puts content hash in file names (e.g. thread_page.3b5d5c3742fe5c4f7b1a.js),
+# such a file never changes, browser can cache it forever
+HASHED_FILENAME_PATTERN = re.compile(r"[0-9a-f]{16,}")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# preferred first
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+def get_accepted_encodings(request_headers:Headers) -> Set[str]:
+    accepted_encodings = set()
+    for value in request_headers.get("accept-encoding", "").split(","):
+        encoding, _, params = value.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted_encodings.add(encoding.strip().lower())
+    return accepted_encodings
+
+#############################################################################
+# Static files with precompressed variants
+# ---------------------------------------------------------------------------
+# Production build generates foo.js.br and foo.js.gz next to foo.js (see
+# webpack.config.js), if browser accepts the encoding we send the compressed
+# file as is, so we never compress the bundles at request time.
+# Files with content hash in the name are served with immutable cache headers.
+#############################################################################
+class PrecompressedStaticFiles(StaticFiles):
+    def file_response(
+        self,
+        full_path:str,
+        stat_result:os.stat_result,
+        scope:Scope,
+        status_code:int=200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        headers = {"Vary": "Accept-Encoding"}
+        if HASHED_FILENAME_PATTERN.search(os.path.basename(full_path)):
+            headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+
+        response = None
+        accepted_encodings = get_accepted_encodings(request_headers)
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if encoding not in accepted_encodings:
+                continue
+            compressed_path = f"{full_path}{suffix}"
+            try:
+                compressed_stat_result = os.stat(compressed_path)
+            except FileNotFoundError:
+                continue
+            response = FileResponse(
+                compressed_path,
+                status_code=status_code,
+                stat_result=compressed_stat_result,
+                headers=dict(headers, **{"Content-Encoding": encoding}),
+                media_type=mimetypes.guess_type(full_path)[0] or "text/plain"
+            )
+            break
+
+        if response is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
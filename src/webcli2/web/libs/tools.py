@@ -1,4 +1,8 @@
-from fastapi.responses import HTMLResponse
+from typing import Any, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+from pydantic_core import to_json
 
 ##########################################################
 # Generate a HTMLResponse that redirect user to given URL
@@ -14,3 +18,107 @@ def redirect(url) -> HTMLResponse:
 </html>
 """
     return HTMLResponse(content=html_content)
+
+##########################################################
+# JSON response for pydantic models
+# If a route returns a pydantic model, FastAPI validates it
+# against response_model, converts it with jsonable_encoder
+# and then json.dumps it, for a big thread that is most of
+# the CPU. Return ModelJSONResponse(model) instead, pydantic
+# serializes the model (or list of models) to JSON bytes in
+# one pass, the output is the same.
+##########################################################
+class ModelJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content:Any) -> bytes:
+        return to_json(content)
+
+##########################################################
+# ETag support
+# Client (browser) sends the ETag it got in If-None-Match,
+# if it still matches, we return 304 Not Modified without
+# loading the object.
+# Cache-Control: no-cache asks browser to always check with
+# us before using the cached response.
+##########################################################
+ETAG_CACHE_CONTROL = "private, no-cache"
+
+def etag_matches(request:Request, etag:str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    for value in if_none_match.split(","):
+        value = value.strip()
+        if value.startswith("W/"):
+            value = value[2:]
+        if value == "*" or value == etag:
+            return True
+    return False
+
+def not_modified(etag:str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL})
+
+##########################################################
+# Range requests
+# Client asks for part of a large content by
+#     Range: bytes=<first>-<last>, bytes=<first>- or bytes=-<suffix length>
+# we return 206 Partial Content with Content-Range. Only a
+# single range is supported, for anything else we return
+# the whole content, which HTTP allows.
+##########################################################
+class RangeNotSatisfiable(Exception):
+    pass
+
+def parse_byte_range(range_header:Optional[str], size:int) -> Optional[Tuple[int, int]]:
+    """Parse the Range header.
+
+    Returns:
+        first and last byte position (inclusive) of the range, None if the whole content should be returned.
+
+    Raises:
+        RangeNotSatisfiable: if the range does not overlap the content.
+    """
+    if range_header is None:
+        return None
+    unit, _, byte_range = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in byte_range:
+        return None
+    first, sep, last = byte_range.strip().partition("-")
+    first, last = first.strip(), last.strip()
+    if sep != "-" or (first == "" and last == "") or not all(v == "" or v.isdigit() for v in (first, last)):
+        return None
+
+    if first == "":
+        # the last N bytes
+        suffix_length = int(last)
+        if suffix_length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - suffix_length, 0), size - 1
+
+    first = int(first)
+    if first >= size:
+        raise RangeNotSatisfiable()
+    last = size - 1 if last == "" else min(int(last), size - 1)
+    if first > last:
+        # invalid range, ignored
+        return None
+    return first, last
+
+def ranged_response(request:Request, content:bytes, *, media_type:str, headers:Optional[dict]=None) -> Response:
+    """Return content, or the part of it the Range header of request asks for.
+    """
+    headers = {"Accept-Ranges": "bytes", **(headers or {})}
+    try:
+        byte_range = parse_byte_range(request.headers.get("range"), len(content))
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(content)}"})
+    if byte_range is None:
+        return Response(content=content, media_type=media_type, headers=headers)
+    first, last = byte_range
+    return Response(
+        content=content[first:last + 1],
+        status_code=206,
+        media_type=media_type,
+        headers={**headers, "Content-Range": f"bytes {first}-{last}/{len(content)}"}
+    )
@@ -9,25 +9,36 @@ import uuid
 
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-from fastapi import FastAPI, Request, HTTPException, Form, Depends
+from fastapi import FastAPI, Request, HTTPException, Form, Depends, Query
 from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
 from pydantic import BaseModel
 
 from webcli2.service_loader import load_webcli_service
-from webcli2.core.data import Thread, User, Action, ThreadAction, ObjectNotFound
+from webcli2.core.data import Thread, ThreadSummary, User, Action, ThreadAction, ObjectNotFound, InvalidCursor, \
+    SearchNotSupported, SearchHit, ThreadSortKey, encode_thread_cursor
     
 from fastapi import WebSocket
 
 from webcli2.config import load_config
 from webcli2.core.service import InvalidJWTTOken, NoHandler
 from webcli2.core.types import PatchValue
-from .libs.tools import redirect
+from .libs.static_files import PrecompressedStaticFiles
+from .libs.tools import redirect, ModelJSONResponse, etag_matches, not_modified, ranged_response, ETAG_CACHE_CONTROL
 
 class PatchThreadActionRequest(BaseModel):
     show_question: Optional[PatchValue[bool]] = None
     show_answer: Optional[PatchValue[bool]] = None
 
+class PatchThreadActionsRequest(BaseModel):
+    action_ids: List[int]
+    show_question: Optional[PatchValue[bool]] = None
+    show_answer: Optional[PatchValue[bool]] = None
+
+class RemoveThreadActionsRequest(BaseModel):
+    action_ids: List[int]
+
 class PatchActionRequest(BaseModel):
     title: Optional[PatchValue[str]] = None
 
@@ -45,13 +56,18 @@ class PatchThreadRequest(BaseModel):
     description: Optional[PatchValue[str]] = None
 
 class MoveThreadActionRequest(BaseModel):
-    direction: Literal["up", "down"]
+    direction: Literal["up", "down", "after"]
+    # for direction "after": move right after this thread action, or to the top if it is None
+    after_thread_action_id: Optional[int] = None
 
 ##########################################################
 # WEB_DIR is the directory of web insode webcli2 package
 ##########################################################
 WEB_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# responses smaller than this are not compressed, not worth it
+COMPRESS_MIN_SIZE = 1024
+
 config = load_config()
 service = load_webcli_service(config)
 
@@ -107,8 +123,11 @@ async def lifespan(app: FastAPI):
     service.shutdown()
 
 app = FastAPI(lifespan=lifespan)
+# compress API responses (e.g. a thread with many actions), responses which are already
+# compressed (e.g. precompressed javascript bundles) are sent as is
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_SIZE)
 app.mount("/static", StaticFiles(directory=os.path.join(WEB_DIR, "static")), name="static")
-app.mount("/dist", StaticFiles(directory=os.path.join(WEB_DIR, "dist")), name="dist")
+app.mount("/dist", PrecompressedStaticFiles(directory=os.path.join(WEB_DIR, "dist")), name="dist")
 app.mount("/resources", StaticFiles(directory=config.core.resource_dir), name="resources")
 templates = Jinja2Templates(directory=os.path.join(WEB_DIR, "dist", "templates"))
 
@@ -229,17 +248,58 @@ async def test_page(request: Request):
 ##########################################################
 # Thread management
 ##########################################################
-@app.get("/apis/threads", response_model=List[Thread])
-async def list_threads(request:Request, user:User=Depends(authenticate_or_deny)):
-    return service.list_threads(user=user)
+##########################################################
+# APIs return ModelJSONResponse so the result is serialized
+# in one pass, response_model is kept for API document
+##########################################################
+THREADS_PAGE_MAX_LIMIT = 1000
+
+@app.get("/apis/threads", response_model=List[ThreadSummary])
+async def list_threads(
+    request:Request, 
+    sort_by:ThreadSortKey="id",
+    order:Literal["asc", "desc"]="asc",
+    limit:Optional[int]=Query(default=None, ge=1, le=THREADS_PAGE_MAX_LIMIT),
+    after:Optional[str]=None,
+    user:User=Depends(authenticate_or_deny)
+):
+    # get version before loading, if the list changes in between, client just reloads next time
+    # ETag is checked against the cached response of the same URL, so it works with any page
+    etag = f'"threads-{user.id}-{service.get_thread_list_version(user=user)}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    try:
+        threads = service.list_threads(user=user, sort_by=sort_by, descending=(order == "desc"), limit=limit, after=after)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    headers = {"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL}
+    if limit is not None and len(threads) == limit:
+        # pass it as "after" to get the next page
+        headers["X-Next-Cursor"] = encode_thread_cursor(threads[-1], sort_by=sort_by)
+    return ModelJSONResponse(threads, headers=headers)
+
+SEARCH_PAGE_MAX_LIMIT = 100
+
+@app.get("/apis/search", response_model=List[SearchHit])
+async def search(
+    request:Request,
+    q:str,
+    limit:int=Query(default=20, ge=1, le=SEARCH_PAGE_MAX_LIMIT),
+    offset:int=Query(default=0, ge=0),
+    user:User=Depends(authenticate_or_deny)
+):
+    try:
+        return ModelJSONResponse(service.search_actions(q, user=user, limit=limit, offset=offset))
+    except SearchNotSupported:
+        raise HTTPException(status_code=501, detail="Search is not supported by the database")
 
 @app.post("/apis/threads", response_model=Thread)
 async def create_thread(request:Request, create_thread_request:CreateThreadRequest, user:User=Depends(authenticate_or_deny)):
-    return service.create_thread(
+    return ModelJSONResponse(service.create_thread(
         title=create_thread_request.title, 
         description=create_thread_request.description, 
         user=user
-    )
+    ))
 
 @app.delete("/apis/threads/{thread_id}")
 async def delete_thread(request:Request, thread_id:int, user:User=Depends(authenticate_or_deny)):
@@ -251,19 +311,39 @@ async def delete_thread(request:Request, thread_id:int, user:User=Depends(authen
 @app.get("/apis/threads/{thread_id}", response_model=Thread)
 async def get_thread(request:Request, thread_id:int, user:User=Depends(authenticate_or_deny)):
     try:
-        return service.get_thread(thread_id, user=user)
+        if "if-none-match" in request.headers:
+            etag = f'"thread-{thread_id}-{service.get_thread_etag_version(thread_id, user=user)}"'
+            if etag_matches(request, etag):
+                return not_modified(etag)
+        thread = service.get_thread(thread_id, user=user)
+        return ModelJSONResponse(
+            thread, 
+            headers={"ETag": f'"thread-{thread_id}-{thread.get_etag_version()}"', "Cache-Control": ETAG_CACHE_CONTROL}
+        )
+    except ObjectNotFound:
+        raise HTTPException(status_code=404, detail="Object not found")
+
+@app.get("/apis/chunks/{chunk_id}/content")
+async def get_chunk_content(request:Request, chunk_id:int, user:User=Depends(authenticate_or_deny)):
+    # full content of a response chunk, thread and websocket events only have a preview of a large one
+    # text is served as plain text in UTF-8, so a text/html chunk is not rendered if opened directly
+    try:
+        chunk = service.get_response_chunk(chunk_id, user=user)
     except ObjectNotFound:
         raise HTTPException(status_code=404, detail="Object not found")
+    if chunk.text_content is not None:
+        return ranged_response(request, chunk.text_content.encode("utf-8"), media_type="text/plain; charset=utf-8")
+    return ranged_response(request, chunk.binary_content or b"", media_type="application/octet-stream")
 
 @app.patch("/apis/threads/{thread_id}", response_model=Thread)
 async def patch_thread(request_data: PatchThreadRequest, request:Request, thread_id:int, user:User=Depends(authenticate_or_deny)):
     try:
-        return service.patch_thread(
+        return ModelJSONResponse(service.patch_thread(
             thread_id, 
             user=user, 
             title=request_data.title, 
             description=request_data.description
-        )
+        ))
     except ObjectNotFound:
         raise HTTPException(status_code=404, detail="Object not found")
 
@@ -277,7 +357,7 @@ async def create_thread_action(request_data: CreateActionRequest, request:Reques
             raw_text=request_data.raw_text, 
             user=user
         )
-        return thread_action
+        return ModelJSONResponse(thread_action)
     except NoHandler:
         raise HTTPException(status_code=400, detail="No handler is registered for the action you requested")
     except ObjectNotFound:
@@ -290,6 +370,26 @@ async def remove_action_from_thread(request:Request, thread_id:int, action_id:in
     except ObjectNotFound:
         raise HTTPException(status_code=404, detail="Object not found")
 
+@app.post("/apis/threads/{thread_id}/actions/remove")
+async def remove_actions_from_thread(request_data:RemoveThreadActionsRequest, request:Request, thread_id:int, user:User=Depends(authenticate_or_deny)):
+    try:
+        service.remove_actions_from_thread(action_ids=request_data.action_ids, thread_id=thread_id, user=user)
+    except ObjectNotFound:
+        raise HTTPException(status_code=404, detail="Object not found")
+
+@app.patch("/apis/threads/{thread_id}/actions")
+async def patch_thread_actions(request_data:PatchThreadActionsRequest, request:Request, thread_id:int, user:User=Depends(authenticate_or_deny)):
+    try:
+        service.patch_thread_actions(
+            thread_id,
+            request_data.action_ids,
+            show_question=request_data.show_question,
+            show_answer=request_data.show_answer,
+            user=user
+        )
+    except ObjectNotFound:
+        raise HTTPException(status_code=404, detail="Object not found")
+
 @app.patch("/apis/threads/{thread_id}/actions/{action_id}", response_model=ThreadAction)
 async def patch_thread_action(request_data: PatchThreadActionRequest, request:Request, thread_id:int, action_id:int, user:User=Depends(authenticate_or_deny)):
     try:
@@ -300,7 +400,7 @@ async def patch_thread_action(request_data: PatchThreadActionRequest, request:Re
             show_answer=request_data.show_answer,
             user=user
         )
-        return thread_action
+        return ModelJSONResponse(thread_action)
     except ObjectNotFound:
         raise HTTPException(status_code=404, detail="Object not found")
 
@@ -308,7 +408,7 @@ async def patch_thread_action(request_data: PatchThreadActionRequest, request:Re
 async def patch_action(request_data: PatchActionRequest, request:Request, action_id:int, user:User=Depends(authenticate_or_deny)):
     try:
         action = service.patch_action(action_id=action_id, title = request_data.title, user=user)
-        return action
+        return ModelJSONResponse(action)
     except ObjectNotFound:
         raise HTTPException(status_code=404, detail="Object not found")
 
@@ -320,7 +420,16 @@ async def move_thread_action(request_data:MoveThreadActionRequest, request:Reque
         elif request_data.direction == "down":
             thread_action = service.move_thread_action_down(thread_action_id=thread_action_id, user=user)
         else:
-            raise HTTPException(status_code=400, detail="Only up or down are supported")
-        return thread_action
+            thread_action = service.move_thread_action_after(
+                thread_action_id, 
+                user=user, 
+                after_thread_action_id=request_data.after_thread_action_id
+            )
+        return ModelJSONResponse(thread_action)
     except ObjectNotFound:
         raise HTTPException(status_code=404, detail="Object not found")
+
+@app.get("/apis/metrics")
+async def get_metrics(request:Request, user:User=Depends(authenticate_or_deny)):
+    # DB connection pool statistics, notification counters and action handler states of this worker
+    return ModelJSONResponse(service.get_metrics(), headers={"Cache-Control": "no-store"})
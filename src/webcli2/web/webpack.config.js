@@ -2,6 +2,8 @@ const path = require('path');
 const HtmlWebpackPlugin = require('html-webpack-plugin');
 const MiniCssExtractPlugin = require('mini-css-extract-plugin');
 const { CleanWebpackPlugin } = require('clean-webpack-plugin');
+const CompressionPlugin = require('compression-webpack-plugin');
+const zlib = require('zlib');
 
 module.exports = (env, argv) => {
     const isProduction = argv.mode === 'production';
@@ -107,6 +109,30 @@ module.exports = (env, argv) => {
                 publicPath: '/dist/',
                 chunks: ['test_page']
             }),
+
+            /****************************************
+             * Production build generates .br and .gz files next to the bundles,
+             * web server sends them as is if browser accepts the encoding
+             */
+            ...(isProduction ? [
+                new CompressionPlugin({
+                    filename: '[path][base].gz',
+                    algorithm: 'gzip',
+                    test: /\.(js|css|svg|map)$/,
+                    threshold: 1024,
+                }),
+                new CompressionPlugin({
+                    filename: '[path][base].br',
+                    algorithm: 'brotliCompress',
+                    test: /\.(js|css|svg|map)$/,
+                    compressionOptions: {
+                        params: {
+                            [zlib.constants.BROTLI_PARAM_QUALITY]: 11,
+                        },
+                    },
+                    threshold: 1024,
+                }),
+            ] : []),
         ],
     };
 };
@@ -0,0 +1,111 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from webcli2.action_handlers.system.render import ChunkRenderer, MIME_MARKDOWN, MIME_MERMAID, sanitize_svg
+from webcli2.action_handlers.system import SystemActionHandler
+
+def test_render_markdown():
+    pytest.importorskip("markdown_it")
+    chunk_renderer = ChunkRenderer()
+    assert chunk_renderer.render(MIME_MARKDOWN, "# hello") == "<h1>hello</h1>\n"
+
+    # raw HTML is escaped
+    rendered_content = chunk_renderer.render(MIME_MARKDOWN, "<script>alert(1)</script>")
+    assert "<script>" not in rendered_content
+
+def test_render_mermaid_without_mmdc():
+    with patch("webcli2.action_handlers.system.render.shutil.which", return_value=None):
+        assert ChunkRenderer().render(MIME_MERMAID, "graph TD; A-->B") is None
+
+def test_sanitize_svg():
+    svg = (
+        '<?xml version="1.0"?><svg id="a" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 10 10" onload="alert(1)">'
+        '<style>#a > .b { fill: red; }</style>'
+        '<script>alert(2)</script>'
+        '<a xlink:href="javascript:alert(3)"><rect width="10" height="10" onclick="alert(4)"/></a>'
+        '<a href="https://example.com"><text x="1" data-id="n1">1 &lt; 2</text></a>'
+        '<foreignObject width="5"><div xmlns="http://www.w3.org/1999/xhtml"><span>label</span>'
+        '<img src="x" onerror="alert(5)"></img><iframe src="javascript:alert(6)"><b>x</b></iframe>'
+        # an unclosed void element does not drop what follows it
+        '<img src="x"><b>y</b><br></div></foreignObject>'
+        '</svg>'
+    )
+    assert sanitize_svg(svg) == (
+        '<svg id="a" xmlns="http://www.w3.org/2000/svg" viewbox="0 0 10 10">'
+        '<style>#a > .b{ fill: red; }</style>'
+        '<a><rect width="10" height="10" /></a>'
+        '<a href="https://example.com"><text x="1" data-id="n1">1 &lt; 2</text></a>'
+        '<foreignobject width="5"><div xmlns="http://www.w3.org/1999/xhtml"><span>label</span>'
+        '<b>y</b><br></div></foreignobject>'
+        '</svg>'
+    )
+
+def test_sanitize_svg_css():
+    # CSS from the user, e.g. themeCSS of a mermaid init directive, is kept only if scoped to the diagram
+    css = (
+        '#my-svg{font-family:"trebuchet ms",verdana;}#my-svg .node rect, #my-svg .label{fill:#eee;}'
+        '@keyframes dash{to{stroke-dashoffset:0;}}'
+        'body{display:none;}#my-svg ~ div{display:none;}#my-svg2 .a{fill:red;}#my-svg .a, .b{fill:red;}'
+        '#my-svg .c{background:url(https://evil.com/x.png);}#my-svg .d{background:URL( "//evil.com");}'
+        '#my-svg .e{fill:url(#gradient);}@import url(https://evil.com/x.css);@font-face{src:url(x.woff);}'
+        '#my-svg .f{content:"}body{display:none}";}'
+    )
+    svg = f'<svg id="my-svg"><style>{css}</style><rect style="fill:url(https://evil.com/x)" fill="url(#g)"/></svg>'
+    assert sanitize_svg(svg) == (
+        '<svg id="my-svg"><style>'
+        '#my-svg{font-family:"trebuchet ms",verdana;}#my-svg .node rect, #my-svg .label{fill:#eee;}'
+        '@keyframes dash{to{stroke-dashoffset:0;}}'
+        '#my-svg .e{fill:url(#gradient);}'
+        '</style><rect fill="url(#g)" /></svg>'
+    )
+
+    # CSS escapes may hide url(, a diagram without id cannot be scoped
+    assert sanitize_svg('<svg id="my-svg"><style>#my-svg .a{background:u\\72l(x)}</style></svg>') == \
+        '<svg id="my-svg"><style></style></svg>'
+    assert sanitize_svg('<svg><style>#my-svg .a{fill:red}</style></svg>') == '<svg><style></style></svg>'
+
+def test_render_mermaid_sanitized():
+    svg = '<svg xmlns="http://www.w3.org/2000/svg" onload="alert(1)"><g><path d="M0 0"/></g></svg>'
+    def run_mmdc(args, **kwargs):
+        with open(args[args.index("-o") + 1], "wt") as f:
+            f.write(svg)
+    with patch("webcli2.action_handlers.system.render.shutil.which", return_value="/usr/bin/mmdc"), \
+        patch("webcli2.action_handlers.system.render.subprocess.run", side_effect=run_mmdc):
+        assert ChunkRenderer().render(MIME_MERMAID, "graph TD; A-->B") == \
+            '<svg xmlns="http://www.w3.org/2000/svg"><g><path d="M0 0" /></g></svg>'
+
+def test_render_cache():
+    chunk_renderer = ChunkRenderer(max_size=2)
+    with patch("webcli2.action_handlers.system.render.render_markdown", side_effect=lambda text: f"<p>{text}</p>") as mock_render_markdown:
+        assert chunk_renderer.render(MIME_MARKDOWN, "a") == "<p>a</p>"
+        assert chunk_renderer.render(MIME_MARKDOWN, "a") == "<p>a</p>"
+        # rendered once per content
+        assert mock_render_markdown.call_count == 1
+
+        chunk_renderer.render(MIME_MARKDOWN, "b")
+        chunk_renderer.render(MIME_MARKDOWN, "c")
+        assert len(chunk_renderer.cache) == 2
+        chunk_renderer.render(MIME_MARKDOWN, "a")
+        assert mock_render_markdown.call_count == 4
+
+    # unknown mime, client renders it
+    assert chunk_renderer.render("text/plain", "a") is None
+
+def test_system_action_handler_server_render():
+    action_handler = SystemActionHandler(server_render=True)
+    action_handler.service = MagicMock()
+    with patch("webcli2.action_handlers.system.render.render_markdown", return_value="<h1>hello</h1>"):
+        request = action_handler.parse_request({"type": "markdown", "command_text": "# hello", "args": ""})
+        assert action_handler.handle(1, request, MagicMock(), {})
+    assert action_handler.service.append_response_to_action.call_args.kwargs["rendered_content"] == "<h1>hello</h1>"
+
+    # server render is off by default
+    action_handler = SystemActionHandler()
+    action_handler.service = MagicMock()
+    request = action_handler.parse_request({"type": "markdown", "command_text": "# hello", "args": ""})
+    assert action_handler.handle(1, request, MagicMock(), {})
+    assert action_handler.service.append_response_to_action.call_args.kwargs["rendered_content"] is None
@@ -0,0 +1,94 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import Any
+from unittest.mock import MagicMock
+
+from webcli2 import ActionHandler
+from webcli2.action_handlers.lazy_action_handler import LazyActionHandler, UnparsedRequest
+
+CREATED_HANDLERS = []
+
+class FooActionHandler(ActionHandler):
+    def __init__(self, *, greeting:str):
+        self.greeting = greeting
+        CREATED_HANDLERS.append(self)
+
+    def can_handle(self, request:Any) -> bool:
+        return request.get("type") == "foo"
+
+    def handle(self, action_id:int, request:Any, user:Any, action_handler_user_config:dict) -> bool:
+        return True
+
+    def say_hello(self) -> str:
+        return self.greeting
+
+def create_lazy_action_handler(request_types):
+    return LazyActionHandler(
+        module_name = __name__,
+        class_name = "FooActionHandler",
+        config = {"greeting": "hello"},
+        request_types = request_types
+    )
+
+def test_lazy_action_handler_load_on_handle():
+    CREATED_HANDLERS.clear()
+    service = MagicMock()
+    lah = create_lazy_action_handler(["foo"])
+    assert lah.request_types == ("foo", )
+
+    # startup does not create the real action handler
+    lah.startup(service)
+    assert not lah.is_loaded()
+
+    # routed by request type, accept without loading, it is parsed when handling
+    request = lah.accept_request({"type": "foo"})
+    assert isinstance(request, UnparsedRequest)
+    assert not lah.is_loaded()
+
+    # loaded and started once when handling
+    assert lah.handle(1, request, MagicMock(), {}) == True
+    assert lah.handle(2, lah.accept_request({"type": "foo"}), MagicMock(), {}) == True
+    assert len(CREATED_HANDLERS) == 1
+    assert CREATED_HANDLERS[0].service is service
+
+    # other methods are forwarded to the real action handler
+    assert lah.say_hello() == "hello"
+
+def test_lazy_action_handler_without_request_types():
+    CREATED_HANDLERS.clear()
+    lah = create_lazy_action_handler([])
+    lah.startup(MagicMock())
+
+    # we do not know what it can handle, we have to load it
+    assert lah.accept_request({"type": "bar"}) is None
+    assert lah.is_loaded()
+    assert lah.accept_request({"type": "foo"}) == {"type": "foo"}
+
+def test_lazy_action_handler_reject_on_handle():
+    CREATED_HANDLERS.clear()
+    service = MagicMock()
+    lah = create_lazy_action_handler(["foo", "bar"])
+    lah.startup(service)
+    user = MagicMock()
+
+    # routed by type, but the real action handler does not accept it, the action is failed
+    request = lah.accept_request({"type": "bar"})
+    assert lah.handle(1, request, user, {}) == True
+    service.append_response_to_action.assert_called_once_with(
+        1, mime="text/plain", text_content="Action handler FooActionHandler cannot handle this request", user=user
+    )
+    # once loaded, requests are parsed by the real action handler right away
+    assert lah.accept_request({"type": "bar"}) is None
+
+def test_lazy_action_handler_load_failure():
+    service = MagicMock()
+    lah = LazyActionHandler(module_name=__name__, class_name="NoSuchActionHandler", config={}, request_types=["foo"])
+    lah.startup(service)
+    user = MagicMock()
+
+    # the action is failed instead of left running
+    assert lah.handle(1, lah.accept_request({"type": "foo"}), user, {}) == True
+    service.append_response_to_action.assert_called_once_with(
+        1, mime="text/plain", text_content="Action handler NoSuchActionHandler failed to load, please contact administrator", user=user
+    )
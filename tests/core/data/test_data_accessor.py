@@ -4,14 +4,17 @@ import pytest
 import json
 
 import tempfile
-from sqlalchemy import create_engine, Engine, select
+from sqlalchemy import create_engine, Engine, select, update, event
 from sqlalchemy.orm import Session
 
 from webcli2.core.data import create_all_tables, ObjectNotFound, DataAccessor, DuplicateUserEmail, \
     ActionAlreadyInThread
 from webcli2.core.data.db_models import DBUser, DBThread, DBThreadAction, DBAction, DBActionResponseChunk, \
     DBActionHandlerConfiguration
-from webcli2.core.data import User, Thread, Action, ActionResponseChunk
+from webcli2.core.data import User, Thread, Action, ActionSummary, ThreadActionSummary, ActionResponseChunk
+from webcli2.core.data.compression import get_default_compression
+from webcli2.core.data.data_accessor import DISPLAY_ORDER_GAP, InvalidCursor, ThreadArchived, encode_thread_cursor, \
+    get_utc_now
 from webcli2.core.types import PatchValue
 
 @pytest.fixture
@@ -85,6 +88,7 @@ def assert_same_action_response_chunk(action_response_chunk1:ActionResponseChunk
     assert action_response_chunk1.mime == action_response_chunk2.mime
     assert action_response_chunk1.text_content == action_response_chunk2.text_content
     assert action_response_chunk1.binary_content == action_response_chunk2.binary_content
+    assert action_response_chunk1.rendered_content == action_response_chunk2.rendered_content
 
 
 def assert_same_action(action1:Action, action2:Action):
@@ -188,6 +192,53 @@ def test_da_list_thread(session:Session, da:DataAccessor, user:User, thread:Thre
         assert len(threads) == 2
         assert_same_thread(thread, threads[0])
         assert_same_thread(thread2, threads[1])
+        assert threads[0].action_count == 0
+        assert threads[0].last_activity_at == thread.created_at
+
+def test_da_list_thread_page(session:Session, da:DataAccessor, user:User, user2:User):
+    with session:
+        threads = [da.create_thread(title=f"thread-{i}", description="", user=user) for i in range(5)]
+        da.create_thread(title="other", description="", user=user2)
+        # threads[1] is the most recently active one
+        for thread in (threads[3], threads[3], threads[1]):
+            action = da.create_action(handler_name="foo", request={}, title="", raw_text="", user=user)
+            da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
+        # make created_at of threads the same, ties are broken by id
+        session.execute(update(DBThread).values(created_at=threads[0].created_at))
+        session.commit()
+
+        statements = []
+        event.listen(session.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+        all_threads = da.list_threads(user=user, sort_by="last_activity_at", descending=True)
+        # one query, user is not loaded
+        assert len(statements) == 1
+        assert [t.id for t in all_threads] == [threads[i].id for i in (1, 3, 4, 2, 0)]
+        assert [t.action_count for t in all_threads] == [1, 2, 0, 0, 0]
+        assert all(t.user == user for t in all_threads)
+
+        def list_all_pages(**kwargs):
+            ids = []
+            after = None
+            while True:
+                page = da.list_threads(user=user, limit=2, after=after, **kwargs)
+                ids.extend(t.id for t in page)
+                if len(page) < 2:
+                    return ids
+                after = encode_thread_cursor(page[-1], sort_by=kwargs.get("sort_by", "id"))
+
+        thread_ids = [t.id for t in threads]
+        assert list_all_pages() == thread_ids
+        assert list_all_pages(descending=True) == thread_ids[::-1]
+        assert list_all_pages(sort_by="created_at") == thread_ids
+        assert list_all_pages(sort_by="created_at", descending=True) == thread_ids[::-1]
+        assert list_all_pages(sort_by="last_activity_at", descending=True) == [t.id for t in all_threads]
+        assert list_all_pages(sort_by="last_activity_at") == [t.id for t in all_threads][::-1]
+
+        # cursor of another sort order
+        with pytest.raises(InvalidCursor):
+            da.list_threads(user=user, sort_by="created_at", after=encode_thread_cursor(all_threads[0], sort_by="id"))
+        with pytest.raises(InvalidCursor):
+            da.list_threads(user=user, after="foo")
 
 def test_da_create_action(session:Session, da:DataAccessor, user:User, action:Action):
     with session:
@@ -266,6 +317,16 @@ def test_da_complete_action(session:Session, da:DataAccessor, user:User, user2:U
             assert_same_action_response_chunk(response_chunk1, response_chunk2)
     
 
+        # slim path does not load response chunks
+        da.append_response_to_action(action.id, mime="text/plain", text_content="hello", user=user)
+        statements = []
+        event.listen(session.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+        action3 = da.complete_action(action.id, user=user, slim=True)
+        assert isinstance(action3, ActionSummary)
+        assert action3.is_completed == True
+        assert action3.completed_at > action2.completed_at
+        assert not any('FROM "DBActionResponseChunk"' in statement for statement in statements)
+
         # wrong action id
         with pytest.raises(ObjectNotFound) as exc_info:
             da.complete_action(100, user=user)
@@ -287,7 +348,7 @@ def test_da_append_action_to_thread(
         thread_action1 = da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
         assert thread_action1.thread_id == thread.id
         assert_same_action(thread_action1.action, action)
-        assert thread_action1.display_order == 1
+        assert thread_action1.display_order == DISPLAY_ORDER_GAP
         assert thread_action1.show_question == False  # by default, only show answer for newly created thread action
         assert thread_action1.show_answer == True
 
@@ -295,7 +356,7 @@ def test_da_append_action_to_thread(
         thread_action2 = da.append_action_to_thread(thread_id=thread.id, action_id=action2.id, user=user)
         assert thread_action2.thread_id == thread.id
         assert_same_action(thread_action2.action, action2)
-        assert thread_action2.display_order == 2
+        assert thread_action2.display_order == 2 * DISPLAY_ORDER_GAP
         assert thread_action2.show_question == False  # by default, only show answer for newly created thread action
         assert thread_action2.show_answer == True
 
@@ -337,6 +398,7 @@ def test_da_append_response_to_action(session:Session, da:DataAccessor, user:Use
             mime = "text/plain",
             text_content="hello2",
             binary_content=None,
+            rendered_content="<p>hello2</p>",
             user=user
         )
         db_action_response_chunkns = list(session.scalars(
@@ -351,6 +413,7 @@ def test_da_append_response_to_action(session:Session, da:DataAccessor, user:Use
         assert db_action_response_chunk.mime == "text/plain"
         assert db_action_response_chunk.text_content == "hello2"
         assert db_action_response_chunk.binary_content is None
+        assert db_action_response_chunk.rendered_content == "<p>hello2</p>"
 
 def test_da_remove_action_from_thread(session:Session, da:DataAccessor, user:User, user2:User, thread:Thread, action:Action):
     with session:
@@ -438,6 +501,15 @@ def test_da_patch_thread_action(
         ta = session.get(DBThreadAction, thread_action.id)
         assert ta.show_answer == True
 
+        # slim path returns the thread action row only
+        ta = da.patch_thread_action(
+            thread_id=thread.id, action_id=action.id, user=user, show_answer=PatchValue(value=False), slim=True
+        )
+        assert ta == ThreadActionSummary(
+            id=thread_action.id, thread_id=thread.id, action_id=action.id, display_order=thread_action.display_order,
+            show_question=True, show_answer=False
+        )
+
         # if thread_id is wrong, then it cause ObjectNotFound
         with pytest.raises(ObjectNotFound) as exc_info:
             da.patch_thread_action(thread_id=100, action_id=action.id, user=user, show_question=PatchValue(value=False))
@@ -450,6 +522,50 @@ def test_da_patch_thread_action(
         with pytest.raises(ObjectNotFound) as exc_info:
             da.patch_thread_action(thread_id=thread.id, action_id=action.id, user=user2, show_question=PatchValue(value=False))
 
+def test_da_bulk_thread_actions(
+    session:Session, 
+    da:DataAccessor, 
+    user:User, 
+    user2:User, 
+    thread:Thread, 
+    action:Action, 
+    action2:Action
+):
+    with session:
+        thread_action = da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
+        thread_action2 = da.append_action_to_thread(thread_id=thread.id, action_id=action2.id, user=user)
+        version = da.get_thread_version(thread.id, user=user)
+
+        # all thread actions are updated with one version bump
+        da.patch_thread_actions(thread.id, [action.id, action2.id], user=user, show_answer=PatchValue(value=False))
+        session.expire_all()
+        assert session.get(DBThreadAction, thread_action.id).show_answer == False
+        assert session.get(DBThreadAction, thread_action2.id).show_answer == False
+        assert session.get(DBThreadAction, thread_action.id).show_question == thread_action.show_question
+        assert da.get_thread_version(thread.id, user=user) == version + 1
+
+        # if any action is not in the thread, nothing is updated
+        with pytest.raises(ObjectNotFound) as exc_info:
+            da.patch_thread_actions(thread.id, [action.id, 100], user=user, show_answer=PatchValue(value=True))
+        session.expire_all()
+        assert session.get(DBThreadAction, thread_action.id).show_answer == False
+
+        # if user does not own thread, it cause ObjectNotFound
+        with pytest.raises(ObjectNotFound) as exc_info:
+            da.patch_thread_actions(thread.id, [action.id], user=user2, show_answer=PatchValue(value=True))
+
+        # if any action is not in the thread, nothing is removed
+        with pytest.raises(ObjectNotFound) as exc_info:
+            da.remove_actions_from_thread(thread_id=thread.id, action_ids=[action.id, 100], user=user)
+        assert len(da.get_thread(thread.id, user=user).thread_actions) == 2
+
+        with pytest.raises(ObjectNotFound) as exc_info:
+            da.remove_actions_from_thread(thread_id=thread.id, action_ids=[action.id], user=user2)
+
+        da.remove_actions_from_thread(thread_id=thread.id, action_ids=[action.id, action2.id], user=user)
+        assert len(da.get_thread(thread.id, user=user).thread_actions) == 0
+        assert da.get_thread_version(thread.id, user=user) == version + 2
+
 def test_da_get_thread_ids_for_action(
     session:Session, 
     da:DataAccessor, 
@@ -528,3 +644,393 @@ def test_da_get_action_handler_user_config(session:Session, da:DataAccessor, use
         )
         assert config=={"foo": 1}
 
+
+def test_da_move_thread_action(
+    session:Session, 
+    da:DataAccessor, 
+    user:User, 
+    user2:User, 
+    thread:Thread, 
+    action:Action, 
+    action2:Action
+):
+    with session:
+        action3 = da.create_action(handler_name="foo", request={}, title="blah3", raw_text="hello3", user=user)
+        thread_action1 = da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
+        thread_action2 = da.append_action_to_thread(thread_id=thread.id, action_id=action2.id, user=user)
+        thread_action3 = da.append_action_to_thread(thread_id=thread.id, action_id=action3.id, user=user)
+
+        # move the last one up, only the 2 swapped thread actions are reported
+        display_orders = da.move_thread_action(thread_action3.id, user=user, direction="up")
+        assert [(o.id, o.display_order) for o in display_orders] == [
+            (thread_action3.id, 2 * DISPLAY_ORDER_GAP), (thread_action2.id, 3 * DISPLAY_ORDER_GAP)
+        ]
+
+        # already at the top, nothing changed
+        assert da.move_thread_action(thread_action1.id, user=user, direction="up") == []
+
+        thread_action = da.move_thread_action_down(thread_action1.id, user=user)
+        assert thread_action.id == thread_action1.id
+        assert thread_action.display_order == 2 * DISPLAY_ORDER_GAP
+        assert [ta.action.id for ta in da.get_thread(thread.id, user=user).thread_actions] == [action3.id, action.id, action2.id]
+        # 3 appends and 2 moves
+        assert da.get_thread_version(thread.id, user=user) == 5
+
+        # user does not own the thread action
+        with pytest.raises(ObjectNotFound) as exc_info:
+            da.move_thread_action(thread_action1.id, user=user2, direction="up")
+
+        with pytest.raises(ObjectNotFound) as exc_info:
+            da.get_thread_action(thread_action1.id, user=user2)
+
+def test_da_move_thread_action_after(
+    session:Session, 
+    da:DataAccessor, 
+    user:User, 
+    user2:User, 
+    thread:Thread, 
+    thread2:Thread
+):
+    with session:
+        thread_actions = []
+        for i in range(4):
+            action = da.create_action(handler_name="foo", request={}, title=f"blah{i}", raw_text="hello", user=user)
+            thread_actions.append(da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user))
+        ta0, ta1, ta2, ta3 = [ta.id for ta in thread_actions]
+
+        def get_order():
+            return [ta.id for ta in da.get_thread(thread.id, user=user).thread_actions]
+
+        # move the last one after the first one, only the moved one changes
+        display_orders = da.move_thread_action_after(ta3, user=user, after_thread_action_id=ta0)
+        assert [(o.id, o.display_order) for o in display_orders] == [(ta3, DISPLAY_ORDER_GAP + DISPLAY_ORDER_GAP // 2)]
+        assert get_order() == [ta0, ta3, ta1, ta2]
+
+        # move to the top, then to the bottom
+        assert len(da.move_thread_action_after(ta2, user=user, after_thread_action_id=None)) == 1
+        assert get_order() == [ta2, ta0, ta3, ta1]
+        assert len(da.move_thread_action_after(ta2, user=user, after_thread_action_id=ta1)) == 1
+        assert get_order() == [ta0, ta3, ta1, ta2]
+
+        # already there, or after itself, nothing changed
+        assert da.move_thread_action_after(ta3, user=user, after_thread_action_id=ta0) == []
+        assert da.move_thread_action_after(ta3, user=user, after_thread_action_id=ta3) == []
+
+        # keep moving into the same gap until there is no room, then the thread is renumbered
+        for _ in range(20):
+            da.move_thread_action_after(ta1, user=user, after_thread_action_id=ta0)
+            da.move_thread_action_after(ta3, user=user, after_thread_action_id=ta0)
+        assert get_order() == [ta0, ta3, ta1, ta2]
+        display_order_list = [ta.display_order for ta in da.get_thread(thread.id, user=user).thread_actions]
+        assert len(set(display_order_list)) == 4
+
+        # thread created before gaps were introduced, display_order are consecutive
+        session.execute(
+            update(DBThreadAction).where(DBThreadAction.id == ta0).values(display_order=1)
+        )
+        session.execute(
+            update(DBThreadAction).where(DBThreadAction.id == ta3).values(display_order=2)
+        )
+        session.commit()
+        display_orders = da.move_thread_action_after(ta2, user=user, after_thread_action_id=ta0)
+        assert len(display_orders) > 1
+        assert get_order() == [ta0, ta2, ta3, ta1]
+        assert [ta.display_order for ta in da.get_thread(thread.id, user=user).thread_actions] == [
+            DISPLAY_ORDER_GAP * (i + 1) for i in range(4)
+        ]
+
+        # after_thread_action_id must be in the same thread
+        action = da.create_action(handler_name="foo", request={}, title="other", raw_text="hello", user=user)
+        other_thread_action = da.append_action_to_thread(thread_id=thread2.id, action_id=action.id, user=user)
+        with pytest.raises(ObjectNotFound) as exc_info:
+            da.move_thread_action_after(ta0, user=user, after_thread_action_id=other_thread_action.id)
+
+        # user does not own the thread action
+        with pytest.raises(ObjectNotFound) as exc_info:
+            da.move_thread_action_after(ta0, user=user2, after_thread_action_id=None)
+
+def test_da_thread_version(
+    session:Session, 
+    da:DataAccessor, 
+    user:User, 
+    user2:User, 
+    thread:Thread, 
+    thread2:Thread, 
+    action:Action
+):
+    with session:
+        assert da.get_thread_version(thread.id, user=user) == 0
+        list_version = da.get_thread_list_version(user=user)
+
+        # every change to the thread, or to the actions in it, bumps the version
+        versions = [0]
+        da.patch_thread(thread.id, user=user, title=PatchValue(value="foo"))
+        versions.append(da.get_thread_version(thread.id, user=user))
+        thread_action = da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
+        versions.append(da.get_thread_version(thread.id, user=user))
+        # a streamed response chunk does not write the thread, the ETag version has the latest chunk id
+        assert da.get_thread_etag_version(thread.id, user=user) == "2-0"
+        chunk = da.append_response_to_action(action.id, mime="text/plain", text_content="hello", user=user)
+        assert da.get_thread_version(thread.id, user=user) == versions[-1]
+        assert da.get_thread_etag_version(thread.id, user=user) == f"2-{chunk.id}"
+        assert da.get_thread(thread.id, user=user).get_etag_version() == f"2-{chunk.id}"
+        da.patch_action(action.id, user=user, title=PatchValue(value="bar"))
+        versions.append(da.get_thread_version(thread.id, user=user))
+        da.complete_action(action.id, user=user)
+        versions.append(da.get_thread_version(thread.id, user=user))
+        da.patch_thread_action(thread.id, action.id, user=user, show_question=PatchValue(value=True))
+        versions.append(da.get_thread_version(thread.id, user=user))
+        # the only action in thread cannot move, nothing changed
+        assert da.move_thread_action(thread_action.id, user=user, direction="up") == []
+        assert da.get_thread_version(thread.id, user=user) == versions[-1]
+        da.remove_action_from_thread(action_id=action.id, thread_id=thread.id, user=user)
+        versions.append(da.get_thread_version(thread.id, user=user))
+        assert versions == list(range(7))
+        assert da.get_thread(thread.id, user=user).version == 6
+
+        # other threads are not affected
+        assert da.get_thread_version(thread2.id, user=user) == 0
+
+        assert da.get_thread_list_version(user=user) != list_version
+        list_version = da.get_thread_list_version(user=user)
+        da.delete_thread(thread2.id, user=user)
+        assert da.get_thread_list_version(user=user) != list_version
+
+        with pytest.raises(ObjectNotFound):
+            da.get_thread_version(thread.id, user=user2)
+
+def test_da_unit_of_work(db_engine:Engine, session:Session, da:DataAccessor, user:User, thread:Thread):
+    with session:
+        commits = []
+        event.listen(session, "after_commit", lambda session: commits.append(1))
+
+        # everything in the unit of work is committed once
+        with da.unit_of_work():
+            action = da.create_action(handler_name="foo", request={}, title="blah", raw_text="hello", user=user)
+            with da.unit_of_work():
+                thread_action = da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
+            da.append_response_to_action(action.id, mime="text/plain", text_content="hello", user=user)
+            da.complete_action(action.id, user=user)
+            assert commits == []
+        assert commits == [1]
+        assert not da.in_unit_of_work
+
+        with Session(db_engine) as session2:
+            action2 = DataAccessor(session2).get_action(action.id, user=user)
+            assert action2.is_completed
+            assert len(action2.response_chunks) == 1
+            assert DataAccessor(session2).get_thread(thread.id, user=user).thread_actions[0].id == thread_action.id
+
+        # nothing is written if the unit of work fails
+        with pytest.raises(ObjectNotFound):
+            with da.unit_of_work():
+                da.patch_thread(thread.id, user=user, title=PatchValue(value="foo"))
+                da.append_action_to_thread(thread_id=thread.id, action_id=action.id + 100, user=user)
+        assert commits == [1]
+        assert da.get_thread(thread.id, user=user).title == "blah"
+
+def test_da_search_actions(session:Session, da:DataAccessor, user:User, user2:User, thread:Thread):
+    with session:
+        action1 = da.create_action(handler_name="foo", request={}, title="spark job", raw_text="%pyspark%\nspark.sql('select 1')", user=user)
+        action2 = da.create_action(handler_name="foo", request={}, title="hello", raw_text="print('hello')", user=user)
+        da.append_action_to_thread(thread_id=thread.id, action_id=action2.id, user=user)
+        chunk = da.append_response_to_action(action2.id, mime="text/plain", text_content="the answer is spark-submit", user=user)
+        da.create_action(handler_name="foo", request={}, title="spark", raw_text="spark", user=user2)
+
+        search_hits = da.search_actions("spark", user=user)
+        assert {(search_hit.action_id, search_hit.chunk_id) for search_hit in search_hits} == {
+            (action1.id, None), (action2.id, chunk.id)
+        }
+        # the title and raw_text both match, it ranks first
+        assert search_hits[0].action_id == action1.id
+        assert "**spark**" in search_hits[0].snippet
+        assert search_hits[0].thread_ids == []
+        assert search_hits[1].thread_ids == [thread.id]
+        assert search_hits[1].title == "hello"
+
+        # pagination
+        assert da.search_actions("spark", user=user, limit=1, offset=1) == search_hits[1:]
+
+        # index is updated on write, the last word matches as a prefix
+        da.patch_action(action2.id, user=user, title=PatchValue(value="renamed"))
+        assert [search_hit.action_id for search_hit in da.search_actions("renam", user=user)] == [action2.id]
+        assert [
+            (search_hit.action_id, search_hit.chunk_id, search_hit.title) for search_hit in da.search_actions("hello", user=user)
+        ] == [(action2.id, None, "renamed")]
+
+        # words are not taken as query syntax
+        assert da.search_actions('spark" OR -', user=user) == []
+        assert da.search_actions("  ", user=user) == []
+
+def test_da_search_compressed_chunk(session:Session, da:DataAccessor, user:User, thread:Thread, thread2:Thread):
+    with session:
+        action = da.create_action(handler_name="foo", request={}, title="", raw_text="", user=user)
+        da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
+        large_text = "".join(f"line {i}: INFO spark executor heartbeat\n" for i in range(10000)) + "OutOfMemoryError\n"
+        chunk = da.append_response_to_action(action.id, mime="text/plain", text_content=large_text, user=user)
+        da.complete_action(action.id, user=user)
+        assert session.get(DBActionResponseChunk, chunk.id).text_content is None
+        # rows of the thread do not have the largest ids
+        action2 = da.create_action(handler_name="foo", request={}, title="", raw_text="", user=user)
+        da.append_action_to_thread(thread_id=thread2.id, action_id=action2.id, user=user)
+        da.append_response_to_action(action2.id, mime="text/plain", text_content="hello", user=user)
+
+        # the text is stored compressed, but it is searchable
+        search_hits = da.search_actions("OutOfMemoryError", user=user)
+        assert [(search_hit.action_id, search_hit.chunk_id) for search_hit in search_hits] == [(action.id, chunk.id)]
+        assert "**OutOfMemoryError**" in search_hits[0].snippet
+
+        # the chunk leaves the index when it is archived, and comes back when it is restored
+        archive = da.archive_thread(thread.id)
+        assert da.search_actions("OutOfMemoryError", user=user) == []
+        da.restore_thread(thread.id, archive)
+        assert [search_hit.chunk_id for search_hit in da.search_actions("OutOfMemoryError", user=user)] == [chunk.id]
+
+def test_da_archive_thread(session:Session, da:DataAccessor, user:User, thread:Thread, thread2:Thread):
+    with session:
+        actions = [da.create_action(handler_name="foo", request={}, title=f"{i}", raw_text="", user=user) for i in range(3)]
+        for action in actions:
+            da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
+            da.append_response_to_action(action.id, mime="text/plain", text_content="hello", user=user)
+        da.complete_action(actions[0].id, user=user)
+        da.complete_action(actions[1].id, user=user)
+        # actions[1] is shared with thread2, actions[2] is not completed
+        da.append_action_to_thread(thread_id=thread2.id, action_id=actions[1].id, user=user)
+        # rows of the thread do not have the largest ids
+        action = da.create_action(handler_name="foo", request={}, title="", raw_text="", user=user)
+        da.append_action_to_thread(thread_id=thread2.id, action_id=action.id, user=user)
+        da.append_response_to_action(action.id, mime="text/plain", text_content="hello", user=user)
+        expected_thread = da.get_thread(thread.id, user=user)
+        expected_summary = {t.id: t for t in da.list_threads(user=user)}[thread.id]
+
+        assert da.list_threads_to_archive(inactive_since=expected_thread.created_at) == []
+        assert da.list_threads_to_archive(inactive_since=get_utc_now()) == [thread.id, thread2.id]
+
+        archive = da.archive_thread(thread.id)
+        assert [row["id"] for row in archive["thread_actions"]] == [ta.id for ta in expected_thread.thread_actions]
+        assert [row["id"] for row in archive["actions"]] == [actions[0].id]
+        assert [row["action_id"] for row in archive["response_chunks"]] == [actions[0].id]
+        # archived already
+        assert da.archive_thread(thread.id) is None
+        assert da.list_threads_to_archive(inactive_since=get_utc_now()) == [thread2.id]
+
+        # the thread list shows the thread as it is when archived, the version is bumped
+        summary = {t.id: t for t in da.list_threads(user=user)}[thread.id]
+        assert summary.archived_at is not None
+        assert (summary.action_count, summary.last_activity_at, summary.version) == \
+            (3, expected_summary.last_activity_at, expected_summary.version + 1)
+        assert [t.id for t in da.list_threads(user=user, sort_by="last_activity_at")] == [thread.id, thread2.id]
+
+        with pytest.raises(ThreadArchived):
+            da.get_thread(thread.id, user=user)
+        with pytest.raises(ThreadArchived):
+            da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
+        with pytest.raises(ObjectNotFound):
+            da.get_action(actions[0].id, user=user)
+        # shared and running actions stay
+        da.get_action(actions[1].id, user=user)
+        da.get_action(actions[2].id, user=user)
+
+        assert da.restore_thread(thread.id, json.loads(json.dumps(archive))) == True
+        assert da.restore_thread(thread.id, archive) == False
+        assert da.get_thread(thread.id, user=user) == expected_thread.model_copy(update={"version": expected_thread.version + 2})
+        assert {t.id: t for t in da.list_threads(user=user)}[thread.id] == \
+            expected_summary.model_copy(update={"version": expected_summary.version + 2})
+
+        # the thread which has the latest rows is not archived
+        assert da.archive_thread(thread2.id) is None
+
+def test_da_restore_thread_uncompressed_chunks(session:Session, da:DataAccessor, user:User, thread:Thread, thread2:Thread):
+    with session:
+        action = da.create_action(handler_name="foo", request={}, title="", raw_text="", user=user)
+        da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
+        large_text = "".join(f"line {i}: INFO spark executor heartbeat\n" for i in range(10000))
+        chunk1 = da.append_response_to_action(action.id, mime="text/plain", text_content=large_text, user=user)
+        chunk2 = da.append_response_to_action(action.id, mime="text/plain", text_content="héllo", user=user)
+        da.complete_action(action.id, user=user)
+        # rows of the thread do not have the largest ids
+        action2 = da.create_action(handler_name="foo", request={}, title="", raw_text="", user=user)
+        da.append_action_to_thread(thread_id=thread2.id, action_id=action2.id, user=user)
+        da.append_response_to_action(action2.id, mime="text/plain", text_content="hello", user=user)
+
+        # an archive written before chunks are compressed
+        archive = json.loads(json.dumps(da.archive_thread(thread.id)))
+        for row, text_content in zip(archive["response_chunks"], [large_text, "héllo"]):
+            row["text_content"] = text_content
+            for column_name in ("compression", "compressed_content", "content_size"):
+                del row[column_name]
+
+        assert da.restore_thread(thread.id, archive) == True
+        db_chunk1 = session.get(DBActionResponseChunk, chunk1.id)
+        assert (db_chunk1.text_content, db_chunk1.compression, db_chunk1.content_size) == \
+            (None, get_default_compression(), len(large_text))
+        db_chunk2 = session.get(DBActionResponseChunk, chunk2.id)
+        assert (db_chunk2.text_content, db_chunk2.compression, db_chunk2.content_size) == ("héllo", None, 6)
+        assert [chunk.text_content for chunk in da.get_action(action.id, user=user).response_chunks] == [large_text, "héllo"]
+
+def test_da_compressed_response_chunk(session:Session, da:DataAccessor, user:User, action:Action):
+    with session:
+        large_text = "".join(f"line {i}: INFO spark executor heartbeat\n" for i in range(10000))
+        chunk1 = da.append_response_to_action(action.id, mime="text/plain", text_content=large_text, user=user)
+        chunk2 = da.append_response_to_action(action.id, mime="text/plain", text_content="small", user=user)
+        assert chunk1.text_content == large_text
+
+        # large text is stored compressed
+        db_chunk1 = session.get(DBActionResponseChunk, chunk1.id)
+        assert db_chunk1.text_content is None
+        assert db_chunk1.compression == get_default_compression()
+        assert db_chunk1.content_size == len(large_text)
+        assert len(db_chunk1.compressed_content) < len(large_text) / 10
+        db_chunk2 = session.get(DBActionResponseChunk, chunk2.id)
+        assert db_chunk2.text_content == "small"
+        assert db_chunk2.compression is None
+
+        # and decompressed when the chunk is returned
+        assert [chunk.text_content for chunk in da.get_action(action.id, user=user).response_chunks] == [large_text, "small"]
+
+        stats = da.get_chunk_storage_stats()
+        assert stats["chunks"] == 2
+        assert stats["compressed_chunks"] == 1
+        assert stats["compressed_content_size"] == len(large_text)
+        assert stats["saved_size"] == len(large_text) - len(db_chunk1.compressed_content)
+
+def test_da_response_chunk_preview(session:Session, da:DataAccessor, user:User, user2:User, thread:Thread, action:Action):
+    with session:
+        da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
+        large_text = "".join(f"line {i}: INFO spark executor heartbeat\n" for i in range(10000))
+        chunk1 = da.append_response_to_action(action.id, mime="text/plain", text_content=large_text, user=user)
+        chunk2 = da.append_response_to_action(
+            action.id, mime="text/markdown", text_content="héllo wörld", rendered_content="<p>héllo wörld</p>", user=user
+        )
+        chunk3 = da.append_response_to_action(
+            action.id, mime="text/markdown", text_content="small", rendered_content="<p>small</p>", user=user
+        )
+        chunk4 = da.append_response_to_action(action.id, mime="image/png", binary_content=b"\x89PNG", user=user)
+        assert chunk2.content_size == 13
+        assert chunk2.get_preview(9).text_content == "héllo w"
+
+        # without preview_size, chunks are complete
+        assert [chunk.text_content for chunk in da.get_thread(thread.id, user=user).thread_actions[0].action.response_chunks] == \
+            [large_text, "héllo wörld", "small", None]
+
+        # large compressed text (chunk1) and uncompressed text (chunk2) are truncated, "ö" is not cut in the middle
+        response_chunks = da.get_thread(thread.id, user=user, preview_size=9).thread_actions[0].action.response_chunks
+        assert response_chunks == da.get_action(action.id, user=user, preview_size=9).response_chunks
+        assert [(chunk.id, chunk.text_content, chunk.rendered_content, chunk.content_size, chunk.is_truncated) for chunk in response_chunks] == [
+            (chunk1.id, "line 0: I", None, len(large_text), True),
+            (chunk2.id, "héllo w", None, 13, True),
+            (chunk3.id, "small", "<p>small</p>", 5, False),
+            (chunk4.id, None, None, None, False),
+        ]
+        # a compressed chunk not larger than preview_size is complete
+        response_chunks = da.get_action(action.id, user=user, preview_size=len(large_text)).response_chunks
+        assert [chunk.text_content for chunk in response_chunks[:2]] == [large_text, "héllo wörld"]
+        assert not any(chunk.is_truncated for chunk in response_chunks)
+
+        # full content is retrieved by id
+        assert da.get_response_chunk(chunk1.id, user=user).text_content == large_text
+        assert da.get_response_chunk(chunk2.id, user=user).rendered_content == "<p>héllo wörld</p>"
+        with pytest.raises(ObjectNotFound):
+            da.get_response_chunk(chunk1.id, user=user2)
+        with pytest.raises(ObjectNotFound):
+            da.get_response_chunk(chunk4.id + 1, user=user)
@@ -0,0 +1,78 @@
+from typing import Generator
+import os
+import pytest
+import threading
+
+import tempfile
+from sqlalchemy import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from webcli2.core.data.db_pool import create_db_engine, get_db_pool_stats, MonitoredQueuePool, \
+    DB_POOL_REQUEST_CONNECTIONS, DB_POOL_MAX_OVERFLOW
+
+@pytest.fixture
+def db_url() -> Generator[str]:
+    with tempfile.NamedTemporaryFile(prefix="testdb-", suffix=".db") as f:
+        pass
+    yield f"sqlite:///{f.name}"
+    if os.path.isfile(f.name):
+        os.remove(f.name)
+
+def test_pool_size_follows_executor(db_url:str):
+    db_engine = create_db_engine(db_url, executor_max_workers=8)
+    assert isinstance(db_engine.pool, MonitoredQueuePool)
+    stats = get_db_pool_stats(db_engine)
+    assert stats["pool_size"] == 8 + DB_POOL_REQUEST_CONNECTIONS
+    assert stats["max_overflow"] == DB_POOL_MAX_OVERFLOW
+
+    # configured pool size wins
+    db_engine = create_db_engine(db_url, executor_max_workers=8, pool_size=3, max_overflow=0)
+    stats = get_db_pool_stats(db_engine)
+    assert stats["pool_size"] == 3
+    assert stats["max_overflow"] == 0
+
+def test_pool_stats(db_url:str):
+    db_engine = create_db_engine(db_url, executor_max_workers=1, pool_size=1, max_overflow=0, pool_timeout=0.1)
+
+    connection = db_engine.connect()
+    stats = get_db_pool_stats(db_engine)
+    assert stats["checked_out"] == 1
+    assert stats["checkouts"] == 1
+    assert stats["waits"] == 0
+
+    # pool is exhausted, the next checkout waits then times out
+    with pytest.raises(PoolTimeoutError):
+        db_engine.connect()
+    assert get_db_pool_stats(db_engine)["timeouts"] == 1
+
+    # the next checkout waits until the connection is returned
+    timer = threading.Timer(0.05, connection.close)
+    timer.start()
+    with db_engine.connect():
+        stats = get_db_pool_stats(db_engine)
+        assert stats["checkouts"] == 2
+        assert stats["waits"] == 1
+        assert stats["wait_time"] > 0
+    timer.join()
+    assert get_db_pool_stats(db_engine)["checked_out"] == 0
+
+def test_pool_stats_after_dispose(db_url:str):
+    db_engine = create_db_engine(db_url, executor_max_workers=1, pool_size=1, max_overflow=0)
+    with db_engine.connect():
+        pass
+    old_pool = db_engine.pool
+    assert old_pool.get_stats()["checkouts"] == 1
+
+    # dispose replaces the pool, checkouts are counted for the new pool only
+    db_engine.dispose()
+    assert db_engine.pool is not old_pool
+    with db_engine.connect():
+        pass
+    assert get_db_pool_stats(db_engine)["checkouts"] == 1
+    assert get_db_pool_stats(db_engine)["max_overflow"] == 0
+    assert old_pool.get_stats()["checkouts"] == 1
+
+def test_memory_database_is_not_pooled():
+    db_engine = create_db_engine("sqlite://", executor_max_workers=4, pool_size=10)
+    assert not isinstance(db_engine.pool, MonitoredQueuePool)
+    assert "status" in get_db_pool_stats(db_engine)
@@ -0,0 +1,176 @@
+from typing import Generator
+import os
+import pytest
+
+import tempfile
+from sqlalchemy import create_engine, Engine, select, desc, inspect, text
+from sqlalchemy.orm import Session
+
+from webcli2.core.data import create_all_tables, migrate, DataAccessor
+from webcli2.core.data.migrations import get_schema_version, LATEST_SCHEMA_VERSION, MIGRATIONS
+from webcli2.core.data.db_models import DBThread, DBThreadAction, DBAction, DBActionResponseChunk
+
+@pytest.fixture
+def db_engine() -> Generator[Engine]:
+    with tempfile.NamedTemporaryFile(prefix="testdb-", suffix=".db") as f:
+        pass
+    filename = f.name
+    url = f"sqlite:///{f.name}"
+    _db_engine = create_engine(url, connect_args={"check_same_thread": True})
+
+    yield _db_engine
+
+    _db_engine.dispose()
+    if os.path.isfile(filename):
+        os.remove(filename)
+
+def downgrade_to_version_0(db_engine:Engine):
+    # make the database look like one created before we track schema version
+    with db_engine.begin() as connection:
+        for index_name in (
+            "ix_DBThread_user_id",
+            "ix_DBAction_user_id",
+            "ix_DBThreadAction_action_id",
+            "ix_DBThreadAction_thread_id_display_order"
+        ):
+            connection.execute(text(f'DROP INDEX "{index_name}"'))
+        for table_name in ("DBAction", "DBActionResponseChunk"):
+            for trigger_name in ("insert", "delete", "update"):
+                connection.execute(text(f'DROP TRIGGER IF EXISTS "{table_name}_search_{trigger_name}"'))
+            connection.execute(text(f'DROP TABLE "{table_name}Search"'))
+        connection.execute(text('ALTER TABLE "DBThread" DROP COLUMN "version"'))
+        for column_name in ("archived_at", "archived_action_count", "archived_last_activity_at"):
+            connection.execute(text(f'ALTER TABLE "DBThread" DROP COLUMN "{column_name}"'))
+        connection.execute(text('ALTER TABLE "DBActionResponseChunk" DROP COLUMN "rendered_content"'))
+        for column_name in ("compression", "compressed_content", "content_size"):
+            connection.execute(text(f'ALTER TABLE "DBActionResponseChunk" DROP COLUMN "{column_name}"'))
+        connection.execute(text('DROP TABLE "DBSchemaVersion"'))
+
+def get_schema_version_of(db_engine:Engine):
+    with db_engine.connect() as connection:
+        return get_schema_version(connection)
+
+def test_create_all_tables_stamp_latest_version(db_engine:Engine):
+    assert get_schema_version_of(db_engine) is None
+    create_all_tables(db_engine)
+    assert get_schema_version_of(db_engine) == LATEST_SCHEMA_VERSION
+
+    # nothing to migrate, calling create_all_tables again does not change anything
+    assert migrate(db_engine) == []
+    create_all_tables(db_engine)
+    assert get_schema_version_of(db_engine) == LATEST_SCHEMA_VERSION
+
+def test_migrate(db_engine:Engine):
+    create_all_tables(db_engine)
+    with Session(db_engine) as session:
+        da = DataAccessor(session)
+        user = da.create_user(email="foo@abc.com", password_hash="***")
+        action = da.create_action(handler_name="foo", request={}, title="hello", raw_text="world", user=user)
+        chunk = da.append_response_to_action(action.id, mime="text/plain", text_content="héllo", user=user)
+    downgrade_to_version_0(db_engine)
+    assert get_schema_version_of(db_engine) == 0
+
+    assert migrate(db_engine) == [name for name, _ in MIGRATIONS]
+    assert get_schema_version_of(db_engine) == LATEST_SCHEMA_VERSION
+
+    inspector = inspect(db_engine)
+    assert "version" in [column["name"] for column in inspector.get_columns("DBThread")]
+    assert {"archived_at", "archived_action_count", "archived_last_activity_at"} <= \
+        {column["name"] for column in inspector.get_columns("DBThread")}
+    assert {"rendered_content", "compression", "compressed_content", "content_size"} <= \
+        {column["name"] for column in inspector.get_columns("DBActionResponseChunk")}
+    assert "ix_DBThreadAction_thread_id_display_order" in [index["name"] for index in inspector.get_indexes("DBThreadAction")]
+
+    # already at the latest version
+    assert migrate(db_engine) == []
+
+    with Session(db_engine) as session:
+        da = DataAccessor(session)
+        thread = da.create_thread(title="foo", description="bar", user=user)
+        assert da.get_thread(thread.id, user=user).version == 0
+        # actions created before the search index are indexed
+        assert [search_hit.action_id for search_hit in da.search_actions("world", user=user)] == [action.id]
+        # size of text chunks written before content_size is filled in bytes
+        assert da.get_response_chunk(chunk.id, user=user).content_size == 6
+
+def test_migrate_index_compressed_chunks(db_engine:Engine):
+    from webcli2.core.data.search import drop_response_chunk_search_index
+
+    create_all_tables(db_engine)
+    large_text = "".join(f"line {i}: INFO spark executor heartbeat\n" for i in range(10000)) + "needle"
+    with Session(db_engine) as session:
+        da = DataAccessor(session)
+        user = da.create_user(email="foo@abc.com", password_hash="***")
+        action = da.create_action(handler_name="foo", request={}, title="", raw_text="", user=user)
+        chunk1 = da.append_response_to_action(action.id, mime="text/plain", text_content=large_text, user=user)
+        chunk2 = da.append_response_to_action(action.id, mime="text/plain", text_content="small needle", user=user)
+
+    # the search index before, it only has text_content of the chunks
+    with db_engine.begin() as connection:
+        drop_response_chunk_search_index(connection)
+        connection.exec_driver_sql('''CREATE VIRTUAL TABLE "DBActionResponseChunkSearch" USING fts5(
+            text_content, content='DBActionResponseChunk', content_rowid='id'
+        )''')
+        connection.exec_driver_sql('INSERT INTO "DBActionResponseChunkSearch"("DBActionResponseChunkSearch") VALUES (\'rebuild\')')
+        connection.execute(text(f'UPDATE "DBSchemaVersion" SET version = {LATEST_SCHEMA_VERSION - 1}'))
+    with Session(db_engine) as session:
+        assert [search_hit.chunk_id for search_hit in DataAccessor(session).search_actions("needle", user=user)] == [chunk2.id]
+
+    assert migrate(db_engine) == ["index compressed DBActionResponseChunk"]
+    with Session(db_engine) as session:
+        assert sorted(search_hit.chunk_id for search_hit in DataAccessor(session).search_actions("needle", user=user)) == \
+            [chunk1.id, chunk2.id]
+
+def test_migrate_new_database(db_engine:Engine):
+    assert migrate(db_engine) == []
+    assert get_schema_version_of(db_engine) == LATEST_SCHEMA_VERSION
+
+############################################################################
+# Hot queries of DataAccessor must use an index rather than scan the table
+############################################################################
+def get_query_plan(db_engine:Engine, statement) -> str:
+    sql = str(statement.compile(db_engine, compile_kwargs={"literal_binds": True}))
+    with db_engine.connect() as connection:
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return "\n".join(row[-1] for row in rows)
+
+@pytest.mark.parametrize("statement, index_name", [
+    # list_threads
+    (
+        select(DBThread).where(DBThread.user_id == 1).order_by(DBThread.id),
+        "ix_DBThread_user_id"
+    ),
+    # actions of a user
+    (
+        select(DBAction).where(DBAction.user_id == 1),
+        "ix_DBAction_user_id"
+    ),
+    # get_thread, move_thread_action
+    (
+        select(DBThreadAction).where(DBThreadAction.thread_id == 1).order_by(DBThreadAction.display_order),
+        "ix_DBThreadAction_thread_id_display_order"
+    ),
+    (
+        select(DBThreadAction)\
+            .where(DBThreadAction.thread_id == 1)\
+            .where(DBThreadAction.display_order < 10)\
+            .order_by(desc(DBThreadAction.display_order))\
+            .limit(1),
+        "ix_DBThreadAction_thread_id_display_order"
+    ),
+    # get_thread_ids_for_action
+    (
+        select(DBThreadAction).where(DBThreadAction.action_id == 1),
+        "ix_DBThreadAction_action_id"
+    ),
+    # response chunks of an action, the unique constraint on (action_id, order) is the index
+    (
+        select(DBActionResponseChunk).where(DBActionResponseChunk.action_id == 1).order_by(DBActionResponseChunk.order),
+        "sqlite_autoindex_DBActionResponseChunk_1"
+    ),
+])
+def test_hot_queries_use_index(db_engine:Engine, statement, index_name:str):
+    create_all_tables(db_engine)
+    query_plan = get_query_plan(db_engine, statement)
+    assert f"INDEX {index_name}" in query_plan, query_plan
+    assert "TEMP B-TREE" not in query_plan, query_plan
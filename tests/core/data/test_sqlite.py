@@ -0,0 +1,106 @@
+from typing import Generator
+import os
+import pytest
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tempfile
+from sqlalchemy import Engine, event, text, select, func
+from sqlalchemy.orm import Session
+
+from webcli2.core.data import create_all_tables, DataAccessor, DuplicateUserEmail
+from webcli2.core.data.db_models import DBActionResponseChunk, DBUser
+from webcli2.core.data.db_pool import create_db_engine
+from webcli2.core.data.sqlite import configure_sqlite_engine, SQLiteWriter
+
+@pytest.fixture
+def db_engine() -> Generator[Engine]:
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        _db_engine = create_db_engine(f"sqlite:///{os.path.join(tmpdirname, 'webcli.db')}", executor_max_workers=8)
+        configure_sqlite_engine(_db_engine, busy_timeout=1000)
+        create_all_tables(_db_engine)
+        yield _db_engine
+        _db_engine.dispose()
+
+@pytest.fixture
+def db_writer(db_engine:Engine) -> Generator[SQLiteWriter]:
+    _db_writer = SQLiteWriter(db_engine)
+    _db_writer.startup()
+    yield _db_writer
+    _db_writer.shutdown()
+
+def test_pragmas(db_engine:Engine):
+    with db_engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1     # NORMAL
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 1000
+
+def test_concurrent_writes(db_engine:Engine, db_writer:SQLiteWriter):
+    user = db_writer.execute(lambda session: DataAccessor(session).create_user(email="foo@abc.com", password_hash="**"))
+    action = db_writer.execute(lambda session: DataAccessor(session).create_action(
+        handler_name="system", request={}, title="", raw_text="", user=user
+    ))
+
+    commits = []
+    event.listen(db_engine, "commit", lambda connection: commits.append(1))
+
+    def append_response(i:int):
+        return db_writer.execute(lambda session: DataAccessor(session).append_response_to_action(
+            action.id, mime="text/plain", text_content=f"{i}", user=user
+        ))
+
+    # action handler threads appending response chunks at the same time
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        chunks = list(executor.map(append_response, range(200)))
+    assert sorted(chunk.order for chunk in chunks) == list(range(1, 201))
+    # queued up writes are committed together
+    assert len(commits) < 200
+
+    # result is committed when execute returns, readers see it
+    with Session(db_engine) as session:
+        assert session.scalar(
+            select(func.count()).select_from(DBActionResponseChunk).where(DBActionResponseChunk.action_id == action.id)
+        ) == 200
+
+def test_failed_write_does_not_affect_batch(db_engine:Engine, db_writer:SQLiteWriter):
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking_write(session:Session):
+        # hold the writer so the following writes are in the same batch
+        started.set()
+        release.wait()
+        return DataAccessor(session).create_user(email="a@abc.com", password_hash="**").id
+
+    def failing_write(session:Session):
+        DataAccessor(session).create_user(email="b@abc.com", password_hash="**")
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(db_writer.execute, blocking_write)]
+        started.wait()
+        futures.append(executor.submit(db_writer.execute, failing_write))
+        futures.append(executor.submit(
+            db_writer.execute, lambda session: DataAccessor(session).create_user(email="a@abc.com", password_hash="**")
+        ))
+        futures.append(executor.submit(
+            db_writer.execute, lambda session: DataAccessor(session).create_user(email="c@abc.com", password_hash="**").id
+        ))
+        while db_writer.queue.qsize() < 3:
+            time.sleep(0.001)
+        release.set()
+
+        assert futures[0].result() > 0
+        with pytest.raises(ValueError):
+            futures[1].result()
+        with pytest.raises(DuplicateUserEmail):
+            futures[2].result()
+        assert futures[3].result() > 0
+
+    with Session(db_engine) as session:
+        assert sorted(session.scalars(select(DBUser.email))) == ["a@abc.com", "c@abc.com"]
+
+def test_write_cannot_call_execute(db_writer:SQLiteWriter):
+    with pytest.raises(RuntimeError):
+        db_writer.execute(lambda session: db_writer.execute(lambda session: None))
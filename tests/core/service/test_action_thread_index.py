@@ -0,0 +1,64 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from webcli2.core.service.action_thread_index import ActionThreadIndex
+
+def test_get_set():
+    ati = ActionThreadIndex()
+    # not cached
+    assert ati.get(1) is None
+
+    ati.set(1, [10, 11])
+    assert sorted(ati.get(1)) == [10, 11]
+
+    # action is not in any thread is still cached
+    ati.set(2, [])
+    assert ati.get(2) == []
+
+def test_set_stale():
+    ati = ActionThreadIndex()
+    # someone changed the index while we were loading from DB, ignore what we loaded
+    generation = ati.get_generation()
+    ati.add(1, 10)
+    ati.set(1, [11], generation=generation)
+    assert ati.get(1) is None
+
+    generation = ati.get_generation()
+    ati.set(1, [11], generation=generation)
+    assert ati.get(1) == [11]
+
+def test_add_remove():
+    ati = ActionThreadIndex()
+    # add to an uncached action does not cache partial result
+    ati.add(1, 10)
+    assert ati.get(1) is None
+
+    ati.set(1, [10])
+    ati.add(1, 11)
+    assert sorted(ati.get(1)) == [10, 11]
+
+    ati.remove(1, 10)
+    assert ati.get(1) == [11]
+
+def test_remove_thread():
+    ati = ActionThreadIndex()
+    ati.set(1, [10, 11])
+    ati.set(2, [10])
+    ati.remove_thread(10)
+    assert ati.get(1) == [11]
+    assert ati.get(2) == []
+    assert 10 not in ati.thread_actions
+
+def test_discard_and_max_size():
+    ati = ActionThreadIndex(max_size=2)
+    ati.set(1, [10])
+    ati.set(2, [10])
+    ati.get(1)          # 1 is recently used, 2 will be evicted
+    ati.set(3, [11])
+    assert ati.get(2) is None
+    assert ati.get(1) == [10]
+    assert ati.thread_actions[10] == {1}
+
+    ati.discard(1)
+    assert ati.get(1) is None
+    assert 10 not in ati.thread_actions
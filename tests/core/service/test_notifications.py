@@ -7,7 +7,8 @@ for logger_name in ["asyncio"]:
 
 import asyncio
 import pytest
-from webcli2.core.service.notifications import NotificationManager, Notification, pop_notification
+from webcli2.core.service.notifications import NotificationManager, Notification, pop_notification, \
+    SUBSCRIPTION_CLOSED
 
 
 ############################################################################
@@ -65,7 +66,29 @@ async def test_basic_subscribe_publish_02():
 async def test_basic_subscribe_unscribe_01():
     await asyncio.sleep(0.5)
     nm = NotificationManager()
-    await nm.subscribe(topic_name="foo", client_id="client1")
+    q = await nm.subscribe(topic_name="foo", client_id="client1")
     await nm.unsubscribe(topic_name="foo", client_id="client1")
     # once unsubscribed, empty topic will be removed
     assert "foo" not in nm.topics
+    # and the reader of the queue is told to stop
+    assert await pop_notification(q, 1) is SUBSCRIPTION_CLOSED
+
+############################################################################
+# has_subscribers reflects subscribe and unsubscribe
+############################################################################
+@pytest.mark.asyncio
+async def test_has_subscribers():
+    nm = NotificationManager()
+    assert not nm.has_subscribers("foo")
+    assert not nm.has_any_subscribers()
+
+    await nm.subscribe(topic_name="foo", client_id="client1")
+    await nm.subscribe(topic_name="foo", client_id="client2")
+    assert nm.has_subscribers("foo")
+    assert not nm.has_subscribers("bar")
+
+    await nm.unsubscribe(topic_name="foo", client_id="client1")
+    assert nm.has_subscribers("foo")
+    await nm.unsubscribe(topic_name="foo", client_id="client2")
+    assert not nm.has_subscribers("foo")
+    assert not nm.has_any_subscribers()
@@ -104,7 +104,8 @@ def webcli_service() -> Generator["WebCLIService"]:
             public_key=PUBLIC_KEY,
             private_key=PRIVATE_KEY,
             db_engine=db_engine,
-            action_handlers = action_handlers
+            action_handlers = action_handlers,
+            archive_dir = os.path.join(tmpdirname, "archive")
         )
         service.startup()
         yield service
@@ -191,7 +192,7 @@ def test_list_thread(webcli_service):
         from webcli2.core.data import User
         user = User(id=1, is_active=True, email="foo@abc.com", password_version=1, password_hash="**")
         threads = webcli_service.list_threads(user=user)
-        mock_da.list_threads.assert_called_once_with(user=user)
+        mock_da.list_threads.assert_called_once_with(user=user, sort_by="id", descending=False, limit=None, after=None)
         assert threads == [mock_thread1, mock_thread2]
 
 def test_get_thread(webcli_service):
@@ -204,7 +205,9 @@ def test_get_thread(webcli_service):
         from webcli2.core.data import User
         user = User(id=1, is_active=True, email="foo@abc.com", password_version=1, password_hash="**")
         thread = webcli_service.get_thread(1, user=user)
-        mock_da.get_thread.assert_called_once_with(1, user=user)
+        # large response chunks are truncated to previews
+        from webcli2.core.data.compression import CHUNK_PREVIEW_SIZE
+        mock_da.get_thread.assert_called_once_with(1, user=user, preview_size=CHUNK_PREVIEW_SIZE)
         assert thread is mock_thread
 
 def test_patch_thread(webcli_service):
@@ -232,3 +235,529 @@ def test_delete_thread(webcli_service):
         webcli_service.delete_thread(1, user=user)
         mock_da.delete_thread.assert_called_once_with(1, user=user)
 
+
+############################################################################
+# A fake websocket, browser side is driven by the test via incoming queue
+############################################################################
+class FakeWebSocket:
+    def __init__(self):
+        import asyncio
+        self.incoming = asyncio.Queue()
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def close(self, code:int=1000, reason:str=""):
+        pass
+
+    async def receive_text(self) -> str:
+        from fastapi import WebSocketDisconnect
+        data = await self.incoming.get()
+        if data is None:
+            raise WebSocketDisconnect()
+        return data
+
+    async def send_text(self, data:str):
+        self.sent.append(data)
+
+def create_bare_service():
+    from webcli2.core.service import WebCLIService
+    return WebCLIService(
+        users_home_dir = "",
+        resource_dir = "",
+        public_key = PUBLIC_KEY,
+        private_key = PRIVATE_KEY,
+        db_engine = None,
+        action_handlers = {}
+    )
+
+@pytest.mark.asyncio
+async def test_websocket_endpoint_batch_and_disconnect():
+    import asyncio
+    import json
+    from webcli2.core.service.notifications import Notification
+
+    service = create_bare_service()
+    websocket = FakeWebSocket()
+    await websocket.incoming.put(json.dumps({"client_id": "client1", "thread_id": 1}))
+    endpoint_task = asyncio.create_task(service.websocket_endpoint(websocket))
+
+    # wait for client to subscribe
+    while "topic-1" not in service.nm.topics:
+        await asyncio.sleep(0.01)
+
+    # events queued together are sent in one frame
+    await service.nm.publish_notifications([
+        Notification(topic_name="topic-1", event={"type": "foo", "id": 1}),
+        Notification(topic_name="topic-1", event={"type": "foo", "id": 2}),
+    ])
+    while len(websocket.sent) < 2:
+        await asyncio.sleep(0.01)
+    assert "ping" in websocket.sent
+    frames = [json.loads(data) for data in websocket.sent if data != "ping"]
+    assert frames == [[{"type": "foo", "id": 1}, {"type": "foo", "id": 2}]]
+
+    # client disconnect is noticed without waiting for next event or ping
+    await websocket.incoming.put(None)
+    await asyncio.wait_for(endpoint_task, timeout=1)
+    assert "topic-1" not in service.nm.topics
+
+def test_patch_thread_action_publish_delta(webcli_service):
+    from webcli2.core.types import PatchValue
+    with patch('webcli2.core.service.webcli_service.DataAccessor') as MockDataAccessor:
+        with patch.object(webcli_service, "_notify_threads") as mock_notify_threads:
+            mock_da = MagicMock()
+            MockDataAccessor.return_value = mock_da
+            mock_da.patch_thread_action.return_value = MagicMock(show_question=True, show_answer=False)
+
+            from webcli2.core.data import User
+            user = User(id=1, is_active=True, email="foo@abc.com", password_version=1, password_hash="**")
+            webcli_service.patch_thread_action(1, 2, user=user, show_question=PatchValue(value=True))
+
+            # only the changed field is sent to client
+            mock_notify_threads.assert_called_once_with([1], {
+                "type": "thread-action-patched",
+                "thread_id": 1,
+                "action_id": 2,
+                "show_question": True
+            })
+
+def test_bulk_thread_actions_notify_once(webcli_service):
+    from webcli2.core.types import PatchValue
+    with patch('webcli2.core.service.webcli_service.DataAccessor') as MockDataAccessor:
+        with patch.object(webcli_service, "_notify_threads") as mock_notify_threads:
+            mock_da = MagicMock()
+            MockDataAccessor.return_value = mock_da
+
+            from webcli2.core.data import User
+            user = User(id=1, is_active=True, email="foo@abc.com", password_version=1, password_hash="**")
+            webcli_service.patch_thread_actions(1, [2, 3], user=user, show_answer=PatchValue(value=False))
+            mock_da.patch_thread_actions.assert_called_once_with(
+                1, [2, 3], user=user, show_question=None, show_answer=PatchValue(value=False)
+            )
+            mock_notify_threads.assert_called_once_with([1], {
+                "type": "thread-actions-patched",
+                "thread_id": 1,
+                "action_ids": [2, 3],
+                "show_answer": False
+            })
+
+            mock_notify_threads.reset_mock()
+            webcli_service.action_thread_index.add(2, 1)
+            webcli_service.remove_actions_from_thread(action_ids=[2, 3], thread_id=1, user=user)
+            mock_da.remove_actions_from_thread.assert_called_once_with(action_ids=[2, 3], thread_id=1, user=user)
+            mock_notify_threads.assert_called_once_with([1], {
+                "type": "thread-actions-removed",
+                "thread_id": 1,
+                "action_ids": [2, 3]
+            })
+
+def test_append_response_to_action_cache_thread_ids(webcli_service):
+    with patch('webcli2.core.service.webcli_service.DataAccessor') as MockDataAccessor:
+        mock_da = MagicMock()
+        MockDataAccessor.return_value = mock_da
+        mock_da.get_thread_ids_for_action.return_value = [1]
+        # pretend someone is watching thread 1
+        webcli_service.nm.active_topics = frozenset(["topic-1"])
+
+        webcli_service.append_response_to_action(2, mime="text/plain", text_content="foo")
+        webcli_service.append_response_to_action(2, mime="text/plain", text_content="bar")
+
+        # thread ids are loaded from DB once, then served from cache
+        mock_da.get_thread_ids_for_action.assert_called_once_with(2)
+        assert webcli_service.action_thread_index.get(2) == [1]
+
+        # completed action is removed from cache, response chunks are not loaded
+        webcli_service.complete_action(2)
+        mock_da.complete_action.assert_called_once_with(2, user=None, slim=True)
+        assert webcli_service.action_thread_index.get(2) is None
+
+def test_append_response_to_action_no_subscriber(webcli_service):
+    with patch('webcli2.core.service.webcli_service.DataAccessor') as MockDataAccessor:
+        mock_da = MagicMock()
+        MockDataAccessor.return_value = mock_da
+
+        webcli_service.append_response_to_action(2, mime="text/plain", text_content="foo")
+
+        # nobody is watching, we do not even look up the threads
+        mock_da.append_response_to_action.assert_called_once()
+        mock_da.get_thread_ids_for_action.assert_not_called()
+        assert webcli_service.get_notification_counters() == {"published": 0, "skipped": 1}
+
+@pytest.mark.asyncio
+async def test_notify_threads_only_watched_threads():
+    import asyncio
+    service = create_bare_service()
+    service.event_loop = asyncio.get_running_loop()
+    q = await service.nm.subscribe("topic-1", "client1")
+
+    service._notify_threads([1, 2], lambda: {"type": "foo"})
+    service._notify_threads([2], lambda: {"type": "bar"})
+    assert await asyncio.wait_for(q.get(), timeout=1) == {"type": "foo"}
+    assert service.get_notification_counters() == {"published": 1, "skipped": 1}
+
+@pytest.mark.asyncio
+async def test_notify_threads_only_watched_by_other_workers():
+    import asyncio
+    service = create_bare_service()
+    service.event_loop = asyncio.get_running_loop()
+    service.worker_bus = MagicMock(worker_index=0)
+    service.nm.on_active_topics_changed = service._send_active_topics
+
+    # nobody is watching in any worker, nothing is sent to other workers
+    service._notify_threads([1], lambda: {"type": "foo"})
+    service._notify_action_threads(2, lambda: {"type": "foo"})
+    service.worker_bus.send.assert_not_called()
+
+    # a client of worker 1 watches thread 1, only its topic is sent
+    service._on_worker_message({"type": "topics", "worker_index": 1, "topic_names": ["topic-1"]})
+    service._notify_threads([1, 2], lambda: {"type": "foo"})
+    service.worker_bus.send.assert_called_once_with({"type": "notify", "topic_names": ["topic-1"], "event": {"type": "foo"}})
+
+    # worker 1 is gone
+    service.worker_bus.send.reset_mock()
+    service._on_worker_message({"type": "topics", "worker_index": 1, "topic_names": []})
+    service._notify_threads([1], lambda: {"type": "foo"})
+    service.worker_bus.send.assert_not_called()
+    assert service.get_notification_counters() == {"published": 1, "skipped": 3}
+
+    # other workers are told when a topic of this worker gets or loses subscribers
+    await service.nm.subscribe("topic-3", "client1")
+    await service.nm.subscribe("topic-3", "client2")
+    await service.nm.unsubscribe("topic-3", "client1")
+    await service.nm.unsubscribe("topic-3", "client2")
+    assert [call.args[0] for call in service.worker_bus.send.call_args_list] == [
+        {"type": "topics", "topic_names": ["topic-3"]},
+        {"type": "topics", "topic_names": []},
+    ]
+
+def test_get_metrics(webcli_service):
+    metrics = webcli_service.get_metrics()
+    assert metrics["executor_max_workers"] == webcli_service.executor._max_workers
+    assert metrics["notifications"] == {"published": 0, "skipped": 0}
+    assert "system" in metrics["action_handlers"]
+    # engine created by create_engine uses the default pool, there is no statistics
+    assert "status" in metrics["db_pool"]
+    assert metrics["chunk_storage"]["chunks"] == 0
+
+def test_discover_action_handler(webcli_service):
+    from webcli2.action_handlers.system.main import SystemActionHandlerRequest
+
+    # routed by request type, the parsed request is returned so handle does not parse it again
+    name, handler, parsed_request = webcli_service._discover_action_handler(
+        {"type": "markdown", "command_text": "# hello", "args": ""}
+    )
+    assert name == "system"
+    assert isinstance(parsed_request, SystemActionHandlerRequest)
+    assert parsed_request.command_text == "# hello"
+
+    # unknown request type, no action handler is asked
+    with patch.object(webcli_service.action_handlers["system"], "accept_request") as mock_accept_request:
+        assert webcli_service._discover_action_handler({"type": "foo"}) == (None, None, None)
+        mock_accept_request.assert_not_called()
+
+def test_discover_action_handler_generic():
+    from webcli2.core.service import WebCLIService
+    from webcli2.action_handlers.system import SystemActionHandler
+
+    # action handler without request_types is asked for any request, in registration order
+    generic_handler = MagicMock(request_types=())
+    generic_handler.accept_request.return_value = None
+    service = WebCLIService(
+        users_home_dir = "",
+        resource_dir = "",
+        public_key = PUBLIC_KEY,
+        private_key = PRIVATE_KEY,
+        db_engine = None,
+        action_handlers = {"generic": generic_handler, "system": SystemActionHandler()}
+    )
+    name, _, _ = service._discover_action_handler({"type": "html", "command_text": "<p/>", "args": ""})
+    assert name == "system"
+    generic_handler.accept_request.assert_called_once()
+
+    generic_handler.accept_request.return_value = "parsed"
+    assert service._discover_action_handler({"type": "bar"}) == ("generic", generic_handler, "parsed")
+
+############################################################################
+# Action handlers start concurrently in background, durations are logged,
+# not asserted since wall-clock time is too noisy on a busy machine
+############################################################################
+def test_startup_action_handlers_concurrently():
+    import threading
+    import time
+    from webcli2.core.service import WebCLIService
+    from webcli2.core.service.webcli_service import ACTION_HANDLER_STARTING, ACTION_HANDLER_RUNNING, ACTION_HANDLER_FAILED
+
+    # startup of every slow action handler only passes the barrier if all of them are starting at the same time,
+    # otherwise the barrier is broken after the timeout and they fail
+    barrier = threading.Barrier(4, timeout=10)
+    release = threading.Event()
+    def slow_startup(service):
+        barrier.wait()
+        assert release.wait(timeout=10)
+
+    def failed_startup(service):
+        raise Exception("cannot connect")
+
+    action_handlers = {
+        f"slow{i}": MagicMock(request_types=(f"slow{i}", ), startup=MagicMock(side_effect=slow_startup))
+        for i in range(4)
+    }
+    action_handlers["bad"] = MagicMock(request_types=("bad", ), startup=MagicMock(side_effect=failed_startup))
+    service = WebCLIService(
+        users_home_dir = "",
+        resource_dir = "",
+        public_key = PUBLIC_KEY,
+        private_key = PRIVATE_KEY,
+        db_engine = None,
+        action_handlers = action_handlers
+    )
+
+    start_time = time.time()
+    service.startup()
+    startup_duration = time.time() - start_time
+    # service does not wait for action handlers, they cannot finish until released
+    states = service.get_action_handler_states()
+    assert [states[f"slow{i}"]["state"] for i in range(4)] == [ACTION_HANDLER_STARTING] * 4
+
+    release.set()
+    for i in range(4):
+        assert service._wait_action_handler(f"slow{i}")
+    ready_duration = time.time() - start_time
+    logger.info(f"service startup: {startup_duration:.3f}s, all action handlers ready: {ready_duration:.3f}s")
+
+    states = service.get_action_handler_states()
+    # action handlers are started concurrently, or the barrier would be broken
+    assert [states[f"slow{i}"]["state"] for i in range(4)] == [ACTION_HANDLER_RUNNING] * 4
+    assert not service._wait_action_handler("bad")
+    assert service.get_action_handler_states()["bad"]["state"] == ACTION_HANDLER_FAILED
+
+    service.shutdown()
+    # failed action handler is not shutdown
+    action_handlers["bad"].shutdown.assert_not_called()
+    action_handlers["slow0"].shutdown.assert_called_once()
+
+############################################################################
+# Multiple web server workers
+############################################################################
+def test_create_thread_action_sticky_to_owner_worker(webcli_service):
+    from datetime import datetime
+    from webcli2.core.data import User, Action, ThreadActionSummary
+    user = User(id=1, is_active=True, email="foo@abc.com", password_version=1, password_hash="**")
+    webcli_service.worker_bus = MagicMock(worker_index=0)
+    webcli_service.worker_bus.get_owner_worker_index.return_value = 1
+
+    with patch('webcli2.core.service.webcli_service.DataAccessor') as MockDataAccessor:
+        with patch.object(webcli_service, "executor") as mock_executor:
+            mock_da = MagicMock()
+            MockDataAccessor.return_value = mock_da
+            mock_da.create_action.return_value = Action(
+                id=2, user=user, handler_name="system", is_completed=False, created_at=datetime(2025, 1, 1),
+                request={}, title="", raw_text=""
+            )
+            mock_da.append_action_to_thread.return_value = ThreadActionSummary(
+                id=3, thread_id=1, action_id=2, display_order=1024, show_question=False, show_answer=True
+            )
+            mock_da.get_action_handler_user_config.return_value = {}
+
+            # %python% is sent to the worker that owns the user
+            request = {"type": "python", "command_text": "print(1)", "args": ""}
+            webcli_service.create_thread_action(request=request, thread_id=1, title="", raw_text="", user=user)
+            mock_executor.submit.assert_not_called()
+            handle_messages = [
+                call.args[0] for call in webcli_service.worker_bus.send.call_args_list if call.args[0]["type"] == "handle"
+            ]
+            assert len(handle_messages) == 1
+            assert handle_messages[0]["worker_index"] == 1
+            assert handle_messages[0]["action_id"] == 2
+            assert handle_messages[0]["request"] == request
+
+            # other requests are handled by this worker
+            request = {"type": "markdown", "command_text": "# hello", "args": ""}
+            webcli_service.create_thread_action(request=request, thread_id=1, title="", raw_text="", user=user)
+            mock_executor.submit.assert_called_once()
+
+def test_create_thread_action_lazy_sticky_to_owner_worker(webcli_service):
+    from datetime import datetime
+    from webcli2.action_handlers.lazy_action_handler import LazyActionHandler
+    from webcli2.core.data import User, Action, ThreadActionSummary
+    user = User(id=1, is_active=True, email="foo@abc.com", password_version=1, password_hash="**")
+    lazy_action_handler = LazyActionHandler(
+        module_name = "webcli2.action_handlers.system",
+        class_name = "SystemActionHandler",
+        config = {},
+        request_types = ["config", "mermaid", "html", "markdown", "python"],
+        sticky_request_types = ["python"]
+    )
+    webcli_service.action_handlers["system"] = lazy_action_handler
+    webcli_service.worker_bus = MagicMock(worker_index=0)
+    webcli_service.worker_bus.get_owner_worker_index.return_value = 1
+
+    with patch('webcli2.core.service.webcli_service.DataAccessor') as MockDataAccessor:
+        with patch.object(webcli_service, "executor") as mock_executor:
+            mock_da = MagicMock()
+            MockDataAccessor.return_value = mock_da
+            mock_da.create_action.return_value = Action(
+                id=2, user=user, handler_name="system", is_completed=False, created_at=datetime(2025, 1, 1),
+                request={}, title="", raw_text=""
+            )
+            mock_da.append_action_to_thread.return_value = ThreadActionSummary(
+                id=3, thread_id=1, action_id=2, display_order=1024, show_question=False, show_answer=True
+            )
+            mock_da.get_action_handler_user_config.return_value = {}
+
+            # %python% is sent to the worker that owns the user, without loading the real action handler
+            request = {"type": "python", "command_text": "print(1)", "args": ""}
+            webcli_service.create_thread_action(request=request, thread_id=1, title="", raw_text="", user=user)
+            mock_executor.submit.assert_not_called()
+            handle_messages = [
+                call.args[0] for call in webcli_service.worker_bus.send.call_args_list if call.args[0]["type"] == "handle"
+            ]
+            assert [(message["worker_index"], message["request"]) for message in handle_messages] == [(1, request)]
+            assert not lazy_action_handler.is_loaded()
+
+            # other requests are handled by this worker
+            request = {"type": "markdown", "command_text": "# hello", "args": ""}
+            webcli_service.create_thread_action(request=request, thread_id=1, title="", raw_text="", user=user)
+            mock_executor.submit.assert_called_once()
+
+def test_on_worker_message(webcli_service):
+    webcli_service.action_thread_index.set(2, [1])
+    webcli_service._on_worker_message({"type": "index", "op": "add", "args": {"action_id": 2, "thread_id": 3}})
+    assert sorted(webcli_service.action_thread_index.get(2)) == [1, 3]
+    webcli_service._on_worker_message({"type": "index", "op": "remove_thread", "args": {"thread_id": 1}})
+    assert webcli_service.action_thread_index.get(2) == [3]
+
+    # notification from another worker is only published to clients connected to this worker
+    with patch.object(webcli_service, "_publish_notifications") as mock_publish_notifications:
+        webcli_service._on_worker_message({"type": "notify", "topic_names": ["topic-1"], "event": {"type": "foo"}})
+        mock_publish_notifications.assert_called_once_with(["topic-1"], {"type": "foo"})
+
+def test_archive_thread_restore_on_access(webcli_service):
+    from datetime import timedelta
+    from sqlalchemy.orm import Session
+    from webcli2.core.data import DataAccessor
+    from webcli2.core.data.data_accessor import get_utc_now
+    from webcli2.core.data.compression import CHUNK_PREVIEW_SIZE
+
+    with Session(webcli_service.db_engine) as session:
+        da = DataAccessor(session)
+        user = da.create_user(email="foo@abc.com", password_hash="**")
+        thread = da.create_thread(title="old", description="", user=user)
+        action = da.create_action(handler_name="system", request={}, title="", raw_text="", user=user)
+        da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
+        da.append_response_to_action(action.id, mime="application/octet-stream", binary_content=b"\x00\x01", user=user)
+        da.complete_action(action.id, user=user)
+        # newer rows, so ids of the old thread cannot be reused
+        thread2 = da.create_thread(title="new", description="", user=user)
+        action2 = da.create_action(handler_name="system", request={}, title="", raw_text="", user=user)
+        da.append_action_to_thread(thread_id=thread2.id, action_id=action2.id, user=user)
+        da.append_response_to_action(action2.id, mime="text/plain", text_content="running", user=user)
+        expected_thread = da.get_thread(thread.id, user=user, preview_size=CHUNK_PREVIEW_SIZE)
+        # archiving and restoring bump the version
+        expected_thread = expected_thread.model_copy(update={"version": expected_thread.version + 2})
+        last_activity_at = {t.id: t for t in da.list_threads(user=user)}[thread.id].last_activity_at
+
+    # action2 is not completed, thread2 keeps it
+    assert webcli_service.archive_threads(inactive_since=get_utc_now() + timedelta(days=1)) == [thread.id]
+    assert os.listdir(webcli_service.archive_dir) == [f"thread-{thread.id}.json.gz"]
+    threads = {t.id: t for t in webcli_service.list_threads(user=user)}
+    assert threads[thread.id].archived_at is not None
+    assert (threads[thread.id].action_count, threads[thread.id].last_activity_at) == (1, last_activity_at)
+
+    # opening the thread restores it, with the same ids and content
+    assert webcli_service.get_thread(thread.id, user=user) == expected_thread
+    assert os.listdir(webcli_service.archive_dir) == []
+    assert webcli_service.list_threads(user=user)[0].archived_at is None
+
+    # appending an action to an archived thread restores it first
+    assert webcli_service.archive_thread(thread.id)
+    action3 = webcli_service._write(
+        lambda da: da.create_action(handler_name="system", request={}, title="", raw_text="", user=user)
+    )
+    thread_action = webcli_service.append_action_to_thread(thread_id=thread.id, action_id=action3.id, user=user)
+    assert thread_action.display_order > expected_thread.thread_actions[-1].display_order
+    assert [ta.action.id for ta in webcli_service.get_thread(thread.id, user=user).thread_actions] == [action.id, action3.id]
+
+def test_delete_archived_thread(webcli_service):
+    from datetime import timedelta
+    from sqlalchemy.orm import Session
+    from webcli2.core.data import DataAccessor
+    from webcli2.core.data.data_accessor import get_utc_now
+
+    with Session(webcli_service.db_engine) as session:
+        da = DataAccessor(session)
+        user = da.create_user(email="foo@abc.com", password_hash="**")
+        thread = da.create_thread(title="old", description="", user=user)
+        action = da.create_action(handler_name="system", request={}, title="", raw_text="", user=user)
+        da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
+        da.complete_action(action.id, user=user)
+        thread2 = da.create_thread(title="new", description="", user=user)
+        action2 = da.create_action(handler_name="system", request={}, title="", raw_text="", user=user)
+        da.append_action_to_thread(thread_id=thread2.id, action_id=action2.id, user=user)
+
+    assert webcli_service.archive_threads(inactive_since=get_utc_now() + timedelta(days=1)) == [thread.id]
+
+    # the thread is deleted without restoring its actions, the archive file is removed
+    with patch.object(webcli_service, "_write", wraps=webcli_service._write) as mock_write:
+        webcli_service.delete_thread(thread.id, user=user)
+        assert mock_write.call_count == 1
+    assert os.listdir(webcli_service.archive_dir) == []
+    assert [t.id for t in webcli_service.list_threads(user=user)] == [thread2.id]
+    with Session(webcli_service.db_engine) as session:
+        with pytest.raises(ObjectNotFound):
+            DataAccessor(session).get_action(action.id, user=user)
+
+def test_archive_thread_missing_archive_file(webcli_service):
+    from datetime import timedelta
+    from sqlalchemy.orm import Session
+    from webcli2.core.data import DataAccessor
+    from webcli2.core.data.data_accessor import get_utc_now
+
+    with Session(webcli_service.db_engine) as session:
+        da = DataAccessor(session)
+        user = da.create_user(email="foo@abc.com", password_hash="**")
+        thread = da.create_thread(title="old", description="", user=user)
+        action = da.create_action(handler_name="system", request={}, title="", raw_text="", user=user)
+        da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
+        da.complete_action(action.id, user=user)
+        thread2 = da.create_thread(title="new", description="", user=user)
+        action2 = da.create_action(handler_name="system", request={}, title="", raw_text="", user=user)
+        da.append_action_to_thread(thread_id=thread2.id, action_id=action2.id, user=user)
+
+    assert webcli_service.archive_threads(inactive_since=get_utc_now() + timedelta(days=1)) == [thread.id]
+    os.remove(os.path.join(webcli_service.archive_dir, f"thread-{thread.id}.json.gz"))
+
+    # the archived actions are lost, but the thread still can be opened and deleted
+    assert webcli_service.get_thread(thread.id, user=user).thread_actions == []
+    assert {t.id: t for t in webcli_service.list_threads(user=user)}[thread.id].archived_at is None
+    webcli_service.delete_thread(thread.id, user=user)
+    assert [t.id for t in webcli_service.list_threads(user=user)] == [thread2.id]
+
+def test_large_response_chunk_preview(webcli_service):
+    from sqlalchemy.orm import Session
+    from webcli2.core.data import DataAccessor
+    from webcli2.core.data.compression import CHUNK_PREVIEW_SIZE
+
+    with Session(webcli_service.db_engine) as session:
+        da = DataAccessor(session)
+        user = da.create_user(email="foo@abc.com", password_hash="**")
+        thread = da.create_thread(title="", description="", user=user)
+        action = da.create_action(handler_name="system", request={}, title="", raw_text="", user=user)
+        da.append_action_to_thread(thread_id=thread.id, action_id=action.id, user=user)
+
+    large_text = "x" * (CHUNK_PREVIEW_SIZE * 10)
+    with patch.object(webcli_service, "_notify_action_threads") as mock_notify_action_threads:
+        chunk = webcli_service.append_response_to_action(action.id, mime="text/plain", text_content=large_text, user=user)
+        # websocket event only has the preview
+        event = mock_notify_action_threads.call_args.args[1]()
+        assert event["text_content"] == "x" * CHUNK_PREVIEW_SIZE
+        assert event["content_size"] == len(large_text)
+        assert event["is_truncated"] == True
+
+    # so does the thread
+    response_chunk = webcli_service.get_thread(thread.id, user=user).thread_actions[0].action.response_chunks[0]
+    assert response_chunk.text_content == "x" * CHUNK_PREVIEW_SIZE
+    assert response_chunk.is_truncated == True
+    assert webcli_service.get_response_chunk(chunk.id, user=user).text_content == large_text
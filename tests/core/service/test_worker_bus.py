@@ -0,0 +1,66 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import Generator
+import queue
+import time
+
+import pytest
+
+from webcli2.core.service.worker_bus import WorkerBusBroker, WorkerBus
+
+AUTHKEY = b"test-authkey"
+
+@pytest.fixture
+def broker() -> Generator[WorkerBusBroker]:
+    broker = WorkerBusBroker(worker_count=2, authkey=AUTHKEY)
+    broker.start()
+    yield broker
+    broker.close()
+
+def connect_worker(broker:WorkerBusBroker):
+    messages = queue.Queue()
+    worker_bus = WorkerBus(address=broker.address, authkey=AUTHKEY)
+    worker_bus.connect(messages.put)
+    return worker_bus, messages
+
+def test_worker_bus(broker):
+    worker_bus0, messages0 = connect_worker(broker)
+    worker_bus1, messages1 = connect_worker(broker)
+    assert (worker_bus0.worker_index, worker_bus1.worker_index) == (0, 1)
+    assert worker_bus0.get_owner_worker_index(3) == 1
+
+    # notifications go to other workers, not the sender
+    worker_bus0.send({"type": "notify", "topic_names": ["topic-1"], "event": {"type": "foo"}})
+    assert messages1.get(timeout=5) == {"type": "notify", "topic_names": ["topic-1"], "event": {"type": "foo"}}
+
+    # action goes to the owner worker only
+    worker_bus1.send({"type": "handle", "worker_index": 1, "action_id": 2})
+    assert messages1.get(timeout=5) == {"type": "handle", "worker_index": 1, "action_id": 2}
+    worker_bus1.send({"type": "handle", "worker_index": 0, "action_id": 3})
+    assert messages0.get(timeout=5) == {"type": "handle", "worker_index": 0, "action_id": 3}
+    assert messages0.empty() and messages1.empty()
+
+    worker_bus0.close()
+    worker_bus1.close()
+
+def test_worker_bus_wrong_authkey(broker):
+    from multiprocessing import AuthenticationError
+    worker_bus = WorkerBus(address=broker.address, authkey=b"bad")
+    with pytest.raises(AuthenticationError):
+        worker_bus.connect(lambda message: None)
+
+def test_worker_bus_topics(broker):
+    worker_bus0, messages0 = connect_worker(broker)
+    worker_bus0.send({"type": "topics", "topic_names": ["topic-1"]})
+    while 0 not in broker.topics_messages:
+        time.sleep(0.01)
+
+    # a worker connected later gets topics of other workers, the broker tells the sender
+    worker_bus1, messages1 = connect_worker(broker)
+    assert messages1.get(timeout=5) == {"type": "topics", "topic_names": ["topic-1"], "worker_index": 0}
+
+    # a worker that is gone has no subscribers
+    worker_bus0.close()
+    assert messages1.get(timeout=5) == {"type": "topics", "topic_names": [], "worker_index": 0}
+    worker_bus1.close()
@@ -0,0 +1,57 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import Dict
+import subprocess
+import sys
+
+import pytest
+
+#############################################################################
+# Startup import-time budget
+# ---------------------------------------------------------------------------
+# CLI commands (init-db, create-user) and unit tests should only import what
+# they use. We run "python -X importtime" in a fresh interpreter and check
+# heavy packages are not imported. The cumulative import time is logged, not
+# asserted, since wall-clock time is too noisy on a busy machine.
+#############################################################################
+
+HEAVY_PACKAGES = ("fastapi", "starlette", "uvicorn", "openai", "bcrypt", "jwt", "pyspark", "oci")
+
+# module -> packages it must not import
+FORBIDDEN_PACKAGES = {
+    "webcli2.config": HEAVY_PACKAGES + ("sqlalchemy", ),
+    "webcli2.cli.main_internal": HEAVY_PACKAGES + ("sqlalchemy", ),
+    "webcli2.service_loader": HEAVY_PACKAGES,
+}
+
+def get_import_times(module_name:str) -> Dict[str, int]:
+    """Import a module in a new interpreter, returns cumulative import time (in us) of every imported module.
+    """
+    # the first run warms up the pyc cache
+    for _ in range(2):
+        r = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+    import_times = {}
+    for line in r.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        import_times[name.strip()] = int(cumulative)
+    return import_times
+
+@pytest.mark.parametrize("module_name", FORBIDDEN_PACKAGES.keys())
+def test_import_time(module_name:str):
+    forbidden_packages = FORBIDDEN_PACKAGES[module_name]
+    import_times = get_import_times(module_name)
+
+    imported_packages = {name.split(".")[0] for name in import_times}
+    assert imported_packages.isdisjoint(forbidden_packages), \
+        f"{module_name} imports {sorted(imported_packages.intersection(forbidden_packages))}"
+
+    duration = import_times[module_name] / 1000000
+    logger.info(f"import {module_name}: {duration:.3f}s")
@@ -0,0 +1,62 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from typing import Generator
+import gzip
+import os
+import tempfile
+
+import pytest
+from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.testclient import TestClient
+
+from webcli2.web.libs.static_files import PrecompressedStaticFiles, IMMUTABLE_CACHE_CONTROL
+
+BUNDLE_NAME = "thread_page.0123456789abcdef0123.js"
+BUNDLE_CONTENT = b"console.log('hello');" * 100
+
+@pytest.fixture
+def client() -> Generator[TestClient]:
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        with open(os.path.join(tmpdirname, BUNDLE_NAME), "wb") as f:
+            f.write(BUNDLE_CONTENT)
+        with open(os.path.join(tmpdirname, BUNDLE_NAME + ".gz"), "wb") as f:
+            f.write(gzip.compress(BUNDLE_CONTENT))
+        with open(os.path.join(tmpdirname, BUNDLE_NAME + ".br"), "wb") as f:
+            f.write(b"fake brotli content")
+        with open(os.path.join(tmpdirname, "thread_page.js"), "wb") as f:
+            f.write(BUNDLE_CONTENT)
+
+        app = FastAPI()
+        app.add_middleware(GZipMiddleware, minimum_size=1024)
+        app.mount("/dist", PrecompressedStaticFiles(directory=tmpdirname), name="dist")
+        yield TestClient(app)
+
+def test_precompressed_brotli(client:TestClient):
+    response = client.get(f"/dist/{BUNDLE_NAME}", headers={"Accept-Encoding": "gzip, deflate, br"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["content-type"].startswith("text/javascript")
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["vary"] == "Accept-Encoding"
+    # sent as is, not compressed again
+    assert response.content == b"fake brotli content"
+
+def test_precompressed_gzip(client:TestClient):
+    response = client.get(f"/dist/{BUNDLE_NAME}", headers={"Accept-Encoding": "gzip, br;q=0"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == BUNDLE_CONTENT
+
+    response = client.get(f"/dist/{BUNDLE_NAME}", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.content == BUNDLE_CONTENT
+
+def test_not_hashed_file(client:TestClient):
+    # no precompressed file, compressed by middleware, may change so browser should not cache it forever
+    response = client.get("/dist/thread_page.js", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "cache-control" not in response.headers
+    assert response.content == BUNDLE_CONTENT
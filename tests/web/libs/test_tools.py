@@ -0,0 +1,127 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from datetime import datetime
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from webcli2.core.data import User, Thread, ThreadAction, Action, ActionResponseChunk
+from webcli2.web.libs.tools import ModelJSONResponse, ranged_response
+
+def create_large_thread(*, action_count:int, chunk_count:int) -> Thread:
+    user = User(id=1, is_active=True, email="foo@abc.com", password_version=1, password_hash="**")
+    thread_actions = []
+    for i in range(action_count):
+        action = Action(
+            id = i,
+            user = user,
+            handler_name = "system",
+            is_completed = True,
+            created_at = datetime.now(),
+            completed_at = datetime.now(),
+            request = {"type": "python", "command_text": "print('hello')", "args": ""},
+            title = f"action {i}",
+            raw_text = "%python%\nprint('hello')",
+            response_chunks = [
+                ActionResponseChunk(id=j, action_id=i, order=j, mime="text/plain", text_content="hello world\n" * 20)
+                for j in range(chunk_count)
+            ]
+        )
+        thread_actions.append(ThreadAction(
+            id = i, thread_id = 1, action = action, display_order = i, show_question = True, show_answer = True
+        ))
+    return Thread(
+        id = 1, user = user, created_at = datetime.now(), title = "foo", description = "bar", thread_actions = thread_actions
+    )
+
+############################################################################
+# Benchmark: serialize a large thread by FastAPI response_model vs
+# ModelJSONResponse, durations are logged, not asserted since wall-clock
+# time of a few requests is too noisy
+############################################################################
+def test_model_json_response_benchmark():
+    thread = create_large_thread(action_count=500, chunk_count=20)
+
+    app = FastAPI()
+    @app.get("/slow", response_model=Thread)
+    async def slow():
+        return thread
+
+    @app.get("/fast", response_model=Thread)
+    async def fast():
+        return ModelJSONResponse(thread)
+
+    client = TestClient(app)
+    durations = {}
+    bodies = {}
+    for path in ("/slow", "/fast"):
+        start_time = time.time()
+        for _ in range(5):
+            response = client.get(path)
+        durations[path] = time.time() - start_time
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        bodies[path] = response.json()
+    logger.info(f"serialize large thread 5 times: response_model={durations['/slow']:.3f}s, ModelJSONResponse={durations['/fast']:.3f}s")
+
+    assert bodies["/fast"] == bodies["/slow"]
+    # excluded fields are not sent
+    assert "password_hash" not in bodies["/fast"]["user"]
+
+def test_model_json_response_list():
+    user = User(id=1, is_active=True, email="foo@abc.com", password_version=1, password_hash="**")
+    response = ModelJSONResponse([user, user])
+    assert response.body == b'[{"id":1,"is_active":true,"email":"foo@abc.com"},{"id":1,"is_active":true,"email":"foo@abc.com"}]'
+
+def test_etag_matches():
+    from starlette.requests import Request
+    from webcli2.web.libs.tools import etag_matches, not_modified
+
+    def create_request(if_none_match):
+        headers = [] if if_none_match is None else [(b"if-none-match", if_none_match.encode("utf-8"))]
+        return Request({"type": "http", "headers": headers})
+
+    assert not etag_matches(create_request(None), '"thread-1-2"')
+    assert etag_matches(create_request('"thread-1-2"'), '"thread-1-2"')
+    assert etag_matches(create_request('"thread-1-1", W/"thread-1-2"'), '"thread-1-2"')
+    assert etag_matches(create_request('*'), '"thread-1-2"')
+    assert not etag_matches(create_request('"thread-1-1"'), '"thread-1-2"')
+
+    response = not_modified('"thread-1-2"')
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"thread-1-2"'
+
+def test_parse_byte_range():
+    import pytest
+    from webcli2.web.libs.tools import parse_byte_range, RangeNotSatisfiable
+
+    assert parse_byte_range(None, 100) is None
+    assert parse_byte_range("bytes=0-9", 100) == (0, 9)
+    assert parse_byte_range("bytes=90-", 100) == (90, 99)
+    assert parse_byte_range("bytes=90-200", 100) == (90, 99)
+    assert parse_byte_range("bytes=-10", 100) == (90, 99)
+    assert parse_byte_range("bytes=-200", 100) == (0, 99)
+    # not supported or invalid, whole content is returned
+    assert parse_byte_range("bytes=0-9,20-29", 100) is None
+    assert parse_byte_range("items=0-9", 100) is None
+    assert parse_byte_range("bytes=9-0", 100) is None
+    assert parse_byte_range("bytes=a-b", 100) is None
+    for range_header in ("bytes=100-", "bytes=-0"):
+        with pytest.raises(RangeNotSatisfiable):
+            parse_byte_range(range_header, 100)
+
+def test_ranged_response():
+    app = FastAPI()
+    @app.get("/content")
+    async def content(request:Request):
+        return ranged_response(request, "héllo".encode("utf-8"), media_type="text/plain; charset=utf-8")
+
+    client = TestClient(app)
+    response = client.get("/content")
+    assert (response.status_code, response.text, response.headers["accept-ranges"]) == (200, "héllo", "bytes")
+    response = client.get("/content", headers={"Range": "bytes=0-2"})
+    assert (response.status_code, response.text, response.headers["content-range"]) == (206, "hé", "bytes 0-2/6")
+    response = client.get("/content", headers={"Range": "bytes=6-"})
+    assert (response.status_code, response.headers["content-range"]) == (416, "bytes */6")